@@ -0,0 +1,272 @@
+"""
+Near-duplicate detection for the preprocessed corpus with MinHash and LSH.
+
+Story URLs repeat across listing pages, so the scraped corpus holds the same
+story several times, sometimes with small edits. Every document is reduced to
+a MinHash signature over its word shingles (computed in parallel); signatures
+are cut into bands, and only documents that share a band bucket are compared.
+Pairs whose estimated Jaccard similarity reaches the threshold are merged into
+clusters, and every cluster keeps its longest document. Hashing and bucketing
+are linear in the corpus size, so hundreds of thousands of stories are fine.
+
+Nothing is deleted: the removed documents are listed in a report, and their
+names alone in a separate exclusion list, which BPE training and the corpus
+store skip (the pipeline's `dedup` stage does this). The list holds no timing
+or parameters, so rerunning dedup with the same outcome leaves it unchanged.
+
+Usage:
+    python PreProcessing/dedup.py                    # writes PreProcessing/dedup_report.json
+                                                     # and PreProcessing/dedup_excluded.json
+    python PreProcessing/dedup.py --threshold 0.9 --workers 4
+
+    # BPE.load_dataset and corpus_store.build_store apply the list by default
+    from dedup import load_excluded
+    corpus = BPE.load_dataset(exclude=load_excluded())
+"""
+
+import os
+import sys
+import json
+import time
+import zlib
+import argparse
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from preprocessing import atomic_write, output_folder, base_dir
+
+report_path = os.path.join(base_dir, "PreProcessing", "dedup_report.json")
+excluded_path = os.path.join(base_dir, "PreProcessing", "dedup_excluded.json")
+
+REPORT_VERSION = 1
+DEFAULT_THRESHOLD = 0.8
+DEFAULT_NUM_PERM = 128
+DEFAULT_SHINGLE = 5
+
+SPECIAL_TOKENS = {"<EOS>", "<EOP>", "<EOT>"}
+MAX_HASH = np.uint64(2 ** 64 - 1)
+# Shingles hashed per block, bounding the (num_perm x block) temporary
+BLOCK = 4096
+
+
+def _mix(x):
+    """splitmix64 finalizer; arithmetic wraps modulo 2**64."""
+    x = x + np.uint64(0x9E3779B97F4A7C15)
+    x = (x ^ (x >> np.uint64(30))) * np.uint64(0xBF58476D1CE4E5B9)
+    x = (x ^ (x >> np.uint64(27))) * np.uint64(0x94D049BB133111EB)
+    return x ^ (x >> np.uint64(31))
+
+
+def shingle_hashes(text, size=DEFAULT_SHINGLE):
+    """Distinct 64-bit hashes of every run of `size` words (special tokens dropped)."""
+    words = [w for w in text.split() if w not in SPECIAL_TOKENS]
+    if not words:
+        return np.zeros(0, dtype=np.uint64)
+    values = np.array([zlib.crc32(w.encode("utf-8")) for w in words], dtype=np.uint64)
+    # Documents shorter than one shingle are a single shingle of all their words
+    size = min(size, len(values))
+    n = len(values) - size + 1
+    hashes = np.zeros(n, dtype=np.uint64)
+    for j in range(size):
+        hashes = _mix(hashes ^ values[j:j + n])
+    return np.unique(hashes)
+
+
+def permutation_seeds(num_perm):
+    return _mix(np.arange(1, num_perm + 1, dtype=np.uint64))
+
+
+def minhash(shingles, seeds):
+    """Minimum of each seeded hash function over the shingles (all ones when empty)."""
+    signature = np.full(len(seeds), MAX_HASH, dtype=np.uint64)
+    for i in range(0, len(shingles), BLOCK):
+        block = _mix(shingles[i:i + BLOCK][None, :] ^ seeds[:, None])
+        np.minimum(signature, block.min(axis=1), out=signature)
+    return signature
+
+
+def lsh_params(threshold, num_perm):
+    """
+        (bands, rows) whose candidate threshold (1/bands)**(1/rows) is the
+        closest one at or below `threshold`: borderline pairs become
+        candidates, and the exact check against the threshold drops the rest.
+    """
+    best, best_point = (num_perm, 1), 0.0
+    for rows in range(1, num_perm + 1):
+        bands = num_perm // rows
+        point = (1 / bands) ** (1 / rows)
+        if best_point < point <= threshold:
+            best, best_point = (bands, rows), point
+    return best
+
+
+def signature_chunk(job):
+    """
+        Worker: signatures of a chunk of documents.
+        Returns (names, signatures, shingle counts).
+    """
+    input_dir, names, num_perm, shingle = job
+    seeds = permutation_seeds(num_perm)
+    signatures = np.empty((len(names), num_perm), dtype=np.uint64)
+    sizes = []
+    for row, name in enumerate(names):
+        with open(os.path.join(input_dir, name), "r", encoding="utf-8") as f:
+            shingles = shingle_hashes(f.read(), shingle)
+        signatures[row] = minhash(shingles, seeds)
+        sizes.append(len(shingles))
+    return names, signatures, sizes
+
+
+class DisjointSet:
+    def __init__(self, n):
+        self.parent = list(range(n))
+
+    def find(self, i):
+        while self.parent[i] != i:
+            self.parent[i] = self.parent[self.parent[i]]
+            i = self.parent[i]
+        return i
+
+    def union(self, a, b):
+        a, b = self.find(a), self.find(b)
+        if a != b:
+            self.parent[max(a, b)] = min(a, b)
+
+
+def find_duplicates(signatures, sizes, threshold=DEFAULT_THRESHOLD, bands=None, rows=None):
+    """
+        Cluster near-duplicate documents.
+
+        Documents sharing a band bucket are compared with the first document
+        of that bucket only, so the work stays linear even for large buckets;
+        clusters are still found through any chain of similar pairs.
+        Returns {removed index: (kept index, estimated similarity)}.
+    """
+    num_docs, num_perm = signatures.shape
+    if bands is None or rows is None:
+        bands, rows = lsh_params(threshold, num_perm)
+    sets = DisjointSet(num_docs)
+    for band in range(bands):
+        chunk = np.ascontiguousarray(signatures[:, band * rows:(band + 1) * rows])
+        buckets = {}
+        for doc in range(num_docs):
+            if sizes[doc] == 0:
+                continue
+            key = chunk[doc].tobytes()
+            first = buckets.setdefault(key, doc)
+            if first != doc and sets.find(first) != sets.find(doc):
+                if np.mean(signatures[first] == signatures[doc]) >= threshold:
+                    sets.union(first, doc)
+
+    clusters = {}
+    for doc in range(num_docs):
+        clusters.setdefault(sets.find(doc), []).append(doc)
+
+    removed = {}
+    for members in clusters.values():
+        if len(members) < 2:
+            continue
+        # Keep the longest version of the story; ties go to the first document
+        keep = min(members, key=lambda d: (-sizes[d], d))
+        for doc in members:
+            if doc != keep:
+                removed[doc] = (keep, float(np.mean(signatures[doc] == signatures[keep])))
+    return removed
+
+
+def deduplicate(input_dir=None, report_file=None, threshold=DEFAULT_THRESHOLD,
+                num_perm=DEFAULT_NUM_PERM, shingle=DEFAULT_SHINGLE, workers=None, verbose=True,
+                excluded_file=None):
+    """
+        Find near-duplicate documents in input_dir and write the report and
+        the sorted list of removed names. Returns the report dict.
+    """
+    input_dir = input_dir or output_folder
+    report_file = report_file or report_path
+    excluded_file = excluded_file or excluded_path
+    start = time.perf_counter()
+
+    names = sorted(f for f in os.listdir(input_dir) if f.endswith(".txt"))
+    chunk = max(1, len(names) // ((workers or os.cpu_count() or 1) * 4))
+    jobs = [(input_dir, names[i:i + chunk], num_perm, shingle) for i in range(0, len(names), chunk)]
+
+    if len(jobs) > 1 and workers != 1:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            parts = list(pool.map(signature_chunk, jobs))
+    else:
+        parts = [signature_chunk(job) for job in jobs]
+
+    signatures = np.concatenate([p[1] for p in parts]) if parts else np.zeros((0, num_perm), np.uint64)
+    sizes = [s for p in parts for s in p[2]]
+    bands, rows = lsh_params(threshold, num_perm)
+    removed = find_duplicates(signatures, sizes, threshold, bands, rows)
+
+    report = {
+        "version": REPORT_VERSION,
+        "threshold": threshold,
+        "num_perm": num_perm,
+        "bands": bands,
+        "rows": rows,
+        "shingle": shingle,
+        "documents": len(names),
+        "kept": len(names) - len(removed),
+        "removed": [
+            {"document": names[doc], "duplicate_of": names[keep], "similarity": round(similarity, 4)}
+            for doc, (keep, similarity) in sorted(removed.items())
+        ],
+        "elapsed": round(time.perf_counter() - start, 3),
+    }
+    excluded = sorted(entry["document"] for entry in report["removed"])
+    for path, data in ((report_file, report), (excluded_file, excluded)):
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        atomic_write(path, json.dumps(data, ensure_ascii=False, indent=2))
+
+    if verbose:
+        for entry in report["removed"]:
+            print(f"Duplicate: {entry['document']} ~ {entry['duplicate_of']} ({entry['similarity']:.2f})")
+        print(f"{len(removed)} of {len(names)} documents removed as near-duplicates "
+              f"in {report['elapsed']:.2f}s")
+    return report
+
+
+def load_excluded(excluded_file=None):
+    """Names of the documents dedup removed (empty when it has not run)."""
+    try:
+        with open(excluded_file or excluded_path, "r", encoding="utf-8") as f:
+            excluded = json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return []
+    return excluded if isinstance(excluded, list) else []
+
+
+def excluded_for(data_dir):
+    """Default exclusions for data_dir: dedup's list covers only the preprocessed folder."""
+    if os.path.abspath(data_dir) != os.path.abspath(output_folder):
+        return []
+    return load_excluded()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Find near-duplicate preprocessed documents")
+    parser.add_argument("--input", default=output_folder, help="Folder of preprocessed documents")
+    parser.add_argument("--report", default=report_path, help="Report file of removed documents")
+    parser.add_argument("--excluded", default=excluded_path, help="File listing only the removed names")
+    parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD,
+                        help="Estimated Jaccard similarity at which documents are duplicates")
+    parser.add_argument("--num-perm", type=int, default=DEFAULT_NUM_PERM, help="MinHash signature length")
+    parser.add_argument("--shingle", type=int, default=DEFAULT_SHINGLE, help="Words per shingle")
+    parser.add_argument("--workers", type=int, default=None, help="Worker processes (default: all cores)")
+    parser.add_argument("--quiet", action="store_true", help="Only print the summary line")
+    args = parser.parse_args(argv)
+
+    report = deduplicate(args.input, args.report, args.threshold, args.num_perm, args.shingle,
+                         workers=args.workers, verbose=not args.quiet, excluded_file=args.excluded)
+    if args.quiet:
+        print(f"{report['documents'] - report['kept']} of {report['documents']} documents removed "
+              f"in {report['elapsed']:.2f}s")
+    return report
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
@@ -1,13 +1,24 @@
 import os
 import re
+import sys
+import json
+import time
+import hashlib
+import argparse
+import tempfile
 import unicodedata
+from concurrent.futures import ProcessPoolExecutor
 
 # ===== PATHS =====
-base_dir = os.path.dirname(os.path.dirname(__file__))
+base_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 input_folder = os.path.join(base_dir, "Scraping", "Documents")
-output_folder = os.path.join(base_dir, "Preprocessing", "Preprocessed_documents")
+output_folder = os.path.join(base_dir, "PreProcessing", "Preprocessed_documents")
 
-os.makedirs(output_folder, exist_ok=True)
+# Records the content hash of every processed input so unchanged documents are skipped
+manifest_path = os.path.join(base_dir, "PreProcessing", "manifest.json")
+
+# Bump when the cleaning rules change so every document is processed again
+PREPROCESS_VERSION = 1
 
 
 urdu_range = r"\u0600-\u06FF"
@@ -18,6 +29,13 @@ allowed_pattern = rf"[^{urdu_range}\s۔،؟!]+"
 # Sentence ending punctuation
 sentence_end_characters = r"[۔؟!]"
 
+# Compiled once, shared by every document
+allowed_re = re.compile(allowed_pattern)
+sentence_end_re = re.compile(sentence_end_characters)
+inline_spaces_re = re.compile(r"[ \t]+")
+blank_lines_re = re.compile(r"\n\s*\n+")
+multi_space_re = re.compile(r" +")
+
 
 # Some functions for cleaning
 def remove_writer_name(text):
@@ -46,7 +64,7 @@ def normalize_unicode(text):
 
 def remove_unwanted_chars(text):
     """Remove English, numbers, special symbols if any"""
-    text = re.sub(allowed_pattern, "", text)
+    text = allowed_re.sub("", text)
     return text
 
 
@@ -56,10 +74,10 @@ def normalize_spaces(text):
     """
 
     # remove extra spaces inside lines only
-    text = re.sub(r"[ \t]+", " ", text)
+    text = inline_spaces_re.sub(" ", text)
 
     # remove extra blank lines (keep paragraph structure)
-    text = re.sub(r"\n\s*\n+", "\n\n", text)
+    text = blank_lines_re.sub("\n\n", text)
 
     return text.strip()
 
@@ -74,7 +92,7 @@ def add_special_tokens(text):
     """
 
     # Add EOS after sentence endings (with spaces before AND after)
-    text = re.sub(sentence_end_characters, lambda m: m.group() + " <EOS> ", text)
+    text = sentence_end_re.sub(lambda m: m.group() + " <EOS> ", text)
 
     # Paragraph splitting
     paragraphs = text.split("\n\n")
@@ -84,7 +102,7 @@ def add_special_tokens(text):
     final_text += " <EOT>"
     
     # Normalize multiple spaces to single space
-    final_text = re.sub(r' +', ' ', final_text)
+    final_text = multi_space_re.sub(' ', final_text)
 
     return final_text
 
@@ -98,30 +116,160 @@ def preprocess_text(text):
     return text
 
 
-def process_files():
+def file_digest(path):
+    """SHA-256 of a file's raw bytes."""
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 16), b""):
+            h.update(block)
+    return h.hexdigest()
+
+
+def atomic_write(path, text):
+    """Write text to path via a temporary file so readers never see a partial file."""
+    directory = os.path.dirname(os.path.abspath(path))
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=".tmp-", suffix=".tmp")
+    try:
+        os.chmod(tmp_path, 0o644)
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            f.write(text)
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+
+def load_manifest(path):
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            manifest = json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return {}
+    if manifest.get("version") != PREPROCESS_VERSION:
+        return {}
+    return manifest.get("files", {})
+
+
+def save_manifest(path, files):
+    data = json.dumps({"version": PREPROCESS_VERSION, "files": files}, indent=2, sort_keys=True)
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    atomic_write(path, data)
+
+
+def process_one(job):
     """
-        Main function which will call all the functions,
-        for each of the document.
+        Worker: preprocess a single document and write it atomically.
+        Returns (file name, elapsed seconds).
     """
-    files = sorted(os.listdir(input_folder))
-    for file in files:
-        if not file.endswith(".txt"):
-            continue
+    file, input_path, output_path = job
+    start = time.perf_counter()
 
-        input_path = os.path.join(input_folder, file)
-        output_path = os.path.join(output_folder, file)
+    with open(input_path, "r", encoding="utf-8") as f:
+        text = f.read()
 
-        with open(input_path, "r", encoding="utf-8") as f:
-            text = f.read()
+    atomic_write(output_path, preprocess_text(text))
+    return file, time.perf_counter() - start
 
-        processed_text = preprocess_text(text)
 
-        with open(output_path, "w", encoding="utf-8") as f:
-            f.write(processed_text)
+def process_files(input_dir=None, output_dir=None, manifest_file=None,
+                  workers=None, force=False, verbose=True):
+    """
+        Main function which will call all the functions,
+        for each of the document.
 
-        print(f"Processed: {file}")
+        Documents whose content hash matches the manifest (and whose output
+        still exists) are skipped; the rest are processed in parallel over
+        a process pool. Returns a summary dict with per-file timings.
+    """
+    input_dir = input_dir or input_folder
+    output_dir = output_dir or output_folder
+    manifest_file = manifest_file or manifest_path
+    os.makedirs(output_dir, exist_ok=True)
+
+    start = time.perf_counter()
+    recorded = load_manifest(manifest_file)
+    previous = {} if force else recorded
+    current = {}
+    jobs = []
+    skipped = 0
+
+    for file in sorted(os.listdir(input_dir)):
+        if not file.endswith(".txt"):
+            continue
+        input_path = os.path.join(input_dir, file)
+        output_path = os.path.join(output_dir, file)
+        digest = file_digest(input_path)
+        current[file] = digest
+        if previous.get(file) == digest and os.path.exists(output_path):
+            skipped += 1
+        else:
+            jobs.append((file, input_path, output_path))
+
+    # Outputs whose source document has disappeared since the last run; a
+    # forced run rebuilds the folder from the sources, so it also drops
+    # outputs the manifest does not know about
+    stale = set(recorded)
+    if force:
+        stale.update(f for f in os.listdir(output_dir) if f.endswith(".txt"))
+    removed = sorted(stale - set(current))
+    for file in removed:
+        orphan = os.path.join(output_dir, file)
+        if os.path.exists(orphan):
+            os.remove(orphan)
+
+    timings = {}
+    done = {f: d for f, d in current.items() if previous.get(f) == d}
+    try:
+        if len(jobs) > 1 and workers != 1:
+            with ProcessPoolExecutor(max_workers=workers) as pool:
+                chunksize = max(1, len(jobs) // ((workers or os.cpu_count() or 1) * 4))
+                results = pool.map(process_one, jobs, chunksize=chunksize)
+                for file, elapsed in results:
+                    timings[file] = elapsed
+                    done[file] = current[file]
+                    if verbose:
+                        print(f"Processed: {file} ({elapsed * 1000:.1f} ms)")
+        else:
+            for job in jobs:
+                file, elapsed = process_one(job)
+                timings[file] = elapsed
+                done[file] = current[file]
+                if verbose:
+                    print(f"Processed: {file} ({elapsed * 1000:.1f} ms)")
+    finally:
+        # Record whatever finished, so an interrupted run resumes where it stopped
+        save_manifest(manifest_file, done)
+
+    summary = {
+        "processed": len(timings),
+        "skipped": skipped,
+        "removed": removed,
+        "timings": timings,
+        "elapsed": time.perf_counter() - start,
+    }
+    if verbose:
+        print(f"{summary['processed']} processed, {skipped} unchanged, "
+              f"{len(removed)} removed in {summary['elapsed']:.2f}s")
+    return summary
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Preprocess scraped Urdu stories")
+    parser.add_argument("--input", default=input_folder, help="Folder of scraped documents")
+    parser.add_argument("--output", default=output_folder, help="Folder for preprocessed documents")
+    parser.add_argument("--manifest", default=manifest_path, help="Content-hash manifest file")
+    parser.add_argument("--workers", type=int, default=None, help="Worker processes (default: all cores)")
+    parser.add_argument("--force", action="store_true", help="Reprocess every document")
+    parser.add_argument("--quiet", action="store_true", help="Only print the summary line")
+    args = parser.parse_args(argv)
+
+    summary = process_files(args.input, args.output, args.manifest,
+                            workers=args.workers, force=args.force, verbose=not args.quiet)
+    if args.quiet:
+        print(f"{summary['processed']} processed, {summary['skipped']} unchanged in {summary['elapsed']:.2f}s")
+    return summary
 
 
 if __name__ == "__main__":
-    process_files()
-    output_path = os.path.join(output_folder, 'doc1.txt')
\ No newline at end of file
+    main(sys.argv[1:])
@@ -1,8 +1,24 @@
-from botasaurus.browser import browser, Driver
-from botasaurus.browser import Wait
-import pandas as pd
+import os
+import csv
+import sys
 import time
+import random
+import argparse
+import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor
 
+import httpx
+from bs4 import BeautifulSoup
+
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+STORY_SELECTOR = "div.txt_detail"
+USER_AGENT = ("Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 "
+              "(KHTML, like Gecko) Chrome/120.0 Safari/537.36")
+
+# Status codes worth retrying; anything else 4xx is treated as permanent
+RETRY_STATUS = {429, 500, 502, 503, 504}
 
 
 def Get_Story_Url():
@@ -12,7 +28,9 @@ def Get_Story_Url():
     Returns:
         _1D list_: _of Url's of the stories_
     """
-    
+    from botasaurus.browser import Driver
+    import pandas as pd
+
     # visit to the website
     driver = Driver(headless=True)
     driver.get("https://www.urdupoint.com/kids/category/moral-stories-page1.html")
@@ -21,57 +39,270 @@ def Get_Story_Url():
         # find the url of the top 10 stories
         # go to the next page
         # repeat until the next button page is stopped working
-        
-        
+
+
         stories_anchor_tags = driver.select_all("a.sharp_box") # will fetch the urls of the stories
         urls = [i.get_attribute('href') for i in stories_anchor_tags ]
         story_url.extend(urls)
         next_page_button = driver.get_element_with_exact_text(" Next Page ")
         next_page_button.click()
-    
+
     df = pd.DataFrame({'Urls': story_url})
     df.to_csv("Scraping/Stories_Urls.csv", index=False)
-    
+
     #  store the links in the csv files
     return story_url
 
 
-# @browser (
-#     headless=True
-# )
-def Scrape_Data(folderPath = "Scraping"):
+def Read_Story_Urls(csv_path):
+    """
+        Reads (index, url) pairs from Stories_Urls.csv.
+        The index decides the document number, doc<index>.txt.
+    """
+    with open(csv_path, "r", encoding="utf-8", newline="") as f:
+        rows = list(csv.DictReader(f))
+    pairs = []
+    for position, row in enumerate(rows):
+        index = row.get("Indexes") or row.get("") or position
+        pairs.append((int(index), row["Urls"]))
+    return pairs
+
+
+def Extract_Story_Text(html):
+    """
+        Returns the story text from a story page,
+        or None when the page has no story body (e.g. rendered by JavaScript).
+    """
+    soup = BeautifulSoup(html, "html.parser")
+    node = soup.select_one(STORY_SELECTOR)
+    if node is None:
+        return None
+    for br in node.find_all("br"):
+        br.replace_with("\n")
+    text = node.get_text().strip()
+    return text or None
+
+
+# ============================================
+# FETCH ENGINE
+# ============================================
+
+class RateLimiter:
+    """Token bucket shared by all workers; rate is in requests per second."""
+
+    def __init__(self, rate=None, burst=1):
+        self.rate = rate
+        self.capacity = max(1, burst)
+        self.tokens = float(self.capacity)
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def acquire(self):
+        if not self.rate:
+            return
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait = (1 - self.tokens) / self.rate
+            time.sleep(wait)
+
+
+class Checkpoint:
+    """Append-only record of completed URLs, one 'url<TAB>document' line each."""
+
+    def __init__(self, path):
+        self.path = path
+        self.lock = threading.Lock()
+        self.done = {}
+        if os.path.exists(path):
+            with open(path, "r", encoding="utf-8") as f:
+                for line in f:
+                    url, _, doc = line.rstrip("\n").partition("\t")
+                    if url:
+                        self.done[url] = doc
+
+    def __contains__(self, url):
+        return url in self.done
+
+    def mark(self, url, doc):
+        with self.lock:
+            self.done[url] = doc
+            with open(self.path, "a", encoding="utf-8") as f:
+                f.write(f"{url}\t{doc}\n")
+                f.flush()
+                os.fsync(f.fileno())
+
+
+class ScrapeEngine:
+    """
+        Fetches story pages with a pool of worker threads sharing one pooled
+        HTTP client, retries with exponential backoff, falls back to a headless
+        browser for pages whose story body is not in the HTML, and writes each
+        document atomically before recording it in the checkpoint.
+    """
+
+    def __init__(self, output_dir, checkpoint_path, workers=8, rate=None,
+                 retries=4, backoff=0.5, timeout=30.0, browser_fallback=True,
+                 client=None):
+        self.output_dir = output_dir
+        self.checkpoint = Checkpoint(checkpoint_path)
+        self.workers = workers
+        self.limiter = RateLimiter(rate, burst=workers)
+        self.retries = retries
+        self.backoff = backoff
+        self.browser_fallback = browser_fallback
+        self.client = client or httpx.Client(
+            timeout=timeout,
+            follow_redirects=True,
+            headers={"User-Agent": USER_AGENT},
+            limits=httpx.Limits(max_connections=workers, max_keepalive_connections=workers),
+        )
+        self._driver = None
+        self._driver_lock = threading.Lock()
+        self.stats = {"fetched": 0, "skipped": 0, "failed": 0, "browser": 0, "retries": 0}
+        self._stats_lock = threading.Lock()
+
+    def _count(self, key):
+        with self._stats_lock:
+            self.stats[key] += 1
+
+    def fetch_html(self, url):
+        """GET with retry and exponential backoff plus jitter."""
+        for attempt in range(self.retries + 1):
+            self.limiter.acquire()
+            try:
+                response = self.client.get(url)
+                if response.status_code in RETRY_STATUS:
+                    raise httpx.HTTPStatusError(f"retryable status {response.status_code}",
+                                                request=response.request, response=response)
+                response.raise_for_status()
+                return response.text
+            except (httpx.TransportError, httpx.HTTPStatusError) as e:
+                retryable = not isinstance(e, httpx.HTTPStatusError) or e.response.status_code in RETRY_STATUS
+                if not retryable or attempt == self.retries:
+                    raise
+                self._count("retries")
+                time.sleep(self.backoff * (2 ** attempt) * (1 + random.random()))
+
+    def fetch_with_browser(self, url):
+        """Render the page in a single shared headless browser."""
+        with self._driver_lock:
+            if self._driver is None:
+                from botasaurus.browser import Driver
+                self._driver = Driver(headless=True)
+            self._driver.get(url)
+            return self._driver.select(STORY_SELECTOR).text
+
+    def write_document(self, index, text):
+        path = os.path.join(self.output_dir, f"doc{index}.txt")
+        fd, tmp_path = tempfile.mkstemp(dir=self.output_dir, prefix=".tmp-", suffix=".tmp")
+        try:
+            os.chmod(tmp_path, 0o644)
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                f.write(text)
+            os.replace(tmp_path, path)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+        return os.path.basename(path)
+
+    def scrape_one(self, index, url):
+        try:
+            text = Extract_Story_Text(self.fetch_html(url))
+            if text is None and self.browser_fallback:
+                text = self.fetch_with_browser(url)
+                self._count("browser")
+            if not text:
+                raise ValueError("no story text found")
+            doc = self.write_document(index, text)
+            self.checkpoint.mark(url, doc)
+            self._count("fetched")
+            print(f"Saved {doc} <- {url}")
+        except Exception as e:
+            self._count("failed")
+            print(f"Failed {url}: {e}")
+
+    def run(self, story_urls):
+        """Scrape every (index, url) pair not yet in the checkpoint."""
+        os.makedirs(self.output_dir, exist_ok=True)
+        pending = []
+        for index, url in story_urls:
+            if url in self.checkpoint:
+                self.stats["skipped"] += 1
+            else:
+                pending.append((index, url))
+
+        start = time.perf_counter()
+        try:
+            with ThreadPoolExecutor(max_workers=self.workers) as pool:
+                list(pool.map(lambda pair: self.scrape_one(*pair), pending))
+        finally:
+            if self._driver is not None:
+                self._driver.close()
+                self._driver = None
+        self.stats["elapsed"] = time.perf_counter() - start
+        return self.stats
+
+    def close(self):
+        self.client.close()
+
+
+def Scrape_Data(folderPath = "Scraping", start=0, workers=8, rate=None,
+                retries=4, browser_fallback=True):
     """
         This function extracts the text of the stories,
         Saves the text of each of the story to the doc#.txt
-    
+
+        Stories already recorded in the checkpoint file are skipped, so an
+        interrupted run can simply be started again.
 
     Args:
         Folder Path is the Scrapping Folder.
     """
-    
+
     print("Reading the Csv File...")
+    csv_path = os.path.join(folderPath, "Stories_Urls.csv")
     try:
-        story_urls = pd.read_csv(f"{folderPath}/Stories_Urls.csv")
-        
-        
+        story_urls = Read_Story_Urls(csv_path) if os.path.exists(csv_path) else []
         if (len(story_urls) == 0):
             print("File not found. Fetching Urls...")
-            story_urls = Get_Story_Url()
+            story_urls = list(enumerate(Get_Story_Url()))
     except Exception as e:
         print("Error: " ,e)
-        return    
+        return
     print("Getting Texts from each of the story...")
-    docNumber = 201
 
-    driver = Driver(headless=True)
-    for i in range(201, len(story_urls)):  
-        
-        text = driver.select('div.txt_detail', wait = Wait.SHORT)
-        driver.get(story_urls["Urls"][i])
-        text = driver.select('div.txt_detail').text
-        
-        with open(f"{folderPath}/Documents/doc{docNumber}.txt", 'w', encoding='utf-8') as f:
-            f.write(text)
-        docNumber += 1  
-        
-Scrape_Data()
\ No newline at end of file
+    engine = ScrapeEngine(
+        output_dir=os.path.join(folderPath, "Documents"),
+        checkpoint_path=os.path.join(folderPath, "checkpoint.txt"),
+        workers=workers,
+        rate=rate,
+        retries=retries,
+        browser_fallback=browser_fallback,
+    )
+    try:
+        stats = engine.run([(i, url) for i, url in story_urls if i >= start])
+    finally:
+        engine.close()
+    print(f"{stats['fetched']} fetched ({stats['browser']} via browser), {stats['skipped']} already done, "
+          f"{stats['failed']} failed, {stats['retries']} retries in {stats['elapsed']:.1f}s")
+    return stats
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Scrape UrduPoint moral stories")
+    parser.add_argument("--folder", default=BASE_DIR, help="Scraping folder with Stories_Urls.csv")
+    parser.add_argument("--start", type=int, default=0, help="First CSV index to scrape")
+    parser.add_argument("--workers", type=int, default=8, help="Concurrent fetches")
+    parser.add_argument("--rate", type=float, default=None, help="Max requests per second (default: unlimited)")
+    parser.add_argument("--retries", type=int, default=4)
+    parser.add_argument("--no-browser", action="store_true", help="Disable the headless-browser fallback")
+    args = parser.parse_args()
+    Scrape_Data(args.folder, start=args.start, workers=args.workers, rate=args.rate,
+                retries=args.retries, browser_fallback=not args.no_browser)
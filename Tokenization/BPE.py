@@ -1,24 +1,44 @@
 import os
 import re
+import sys
 from collections import Counter, defaultdict
 import json
 
-base_dir = os.path.dirname(os.path.dirname(__file__))
+base_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(base_dir, "PreProcessing"))
 DATA_FOLDER = os.path.join(
     base_dir,
-    "Preprocessing",
+    "PreProcessing",
     "Preprocessed_documents"
 )
 
 # Special tokens that should NOT be split into characters
 SPECIAL_TOKENS = {"<EOS>", "<EOP>", "<EOT>"}
 
-def load_dataset():
+def default_exclude(data_folder):
+    """
+    Near-duplicates dedup listed for data_folder. Images that ship only the
+    preprocessed documents, without PreProcessing's code, exclude nothing.
+    """
+    try:
+        from dedup import excluded_for
+    except ImportError:
+        return []
+    return excluded_for(data_folder)
+
+
+def load_dataset(data_folder=None, exclude=None):
+    """
+    Read the preprocessed documents in a stable order (keeps merges reproducible).
+    Without `exclude`, the near-duplicates listed by dedup are skipped.
+    """
+    data_folder = data_folder or DATA_FOLDER
+    exclude = set(default_exclude(data_folder) if exclude is None else exclude)
     corpus = []
 
-    for file in os.listdir(DATA_FOLDER):
-        if file.endswith(".txt"):
-            with open(os.path.join(DATA_FOLDER, file),
+    for file in sorted(os.listdir(data_folder)):
+        if file.endswith(".txt") and file not in exclude:
+            with open(os.path.join(data_folder, file),
                       "r", encoding="utf-8") as f:
                 corpus.append(f.read())
 
@@ -154,12 +174,14 @@ def merge_pair(pair, word_freqs):
     return new_word_freqs
 
 
-def train_bpe(vocab_size=1000):
+def train_bpe(vocab_size=1000, corpus=None):
     """
     Train BPE tokenizer with specified vocabulary size.
     Uses word frequencies for efficient training.
+    If no corpus is given, the preprocessed documents are loaded from disk.
     """
-    corpus = load_dataset()
+    if corpus is None:
+        corpus = load_dataset()
     word_freqs = get_word_freqs(corpus)
 
     print(f"Loaded {len(word_freqs)} unique words")
@@ -205,19 +227,20 @@ def train_bpe(vocab_size=1000):
 
 
 
-def save_results(vocab, merges):
+def save_results(vocab, merges, out_dir="Tokenization"):
     """Save vocabulary and merges to files."""
-    with open("Tokenization/vocab.json", "w", encoding="utf-8") as f:
-        json.dump(list(vocab), f, ensure_ascii=False, indent=2)
+    # Sorted so that retraining on the same corpus writes identical files
+    with open(os.path.join(out_dir, "vocab.json"), "w", encoding="utf-8") as f:
+        json.dump(sorted(vocab), f, ensure_ascii=False, indent=2)
 
-    with open("Tokenization/merges.txt", "w", encoding="utf-8") as f:
+    with open(os.path.join(out_dir, "merges.txt"), "w", encoding="utf-8") as f:
         for m in merges:
             f.write(f"{m[0]} {m[1]}\n")
 
 
-def save_encoded_dataset(word_freqs):
+def save_encoded_dataset(word_freqs, out_dir="Tokenization"):
     """Save the encoded dataset (unique words with frequencies)."""
-    with open("Tokenization/encoded_dataset.txt",
+    with open(os.path.join(out_dir, "encoded_dataset.txt"),
               "w", encoding="utf-8") as f:
 
         for word, freq in word_freqs.items():
@@ -226,10 +249,23 @@ def save_encoded_dataset(word_freqs):
 
 
 
+def config_vocab_size(default=250):
+    """Vocabulary size from the pipeline config (pipeline/config.json), if there is one."""
+    config_path = os.path.join(base_dir, "pipeline", "config.json")
+    try:
+        with open(config_path, "r", encoding="utf-8") as f:
+            return json.load(f).get("bpe", {}).get("vocab_size", default)
+    except FileNotFoundError:
+        return default
+
+
 if __name__ == "__main__":
-    # Train BPE with vocabulary size = 250 as per assignment requirement
-    vocab, merges, word_freqs = train_bpe(250)
+    # Same vocabulary size as the pipeline's bpe stage (250 as per assignment requirement)
+    vocab, merges, word_freqs = train_bpe(config_vocab_size())
     save_results(vocab, merges)
     save_encoded_dataset(word_freqs)
-    print("BPE training complete!")
+
+    # Encode the corpus once with the new merges so training reads token ids
+    from corpus_store import build_store
+    build_store(rebuild=True)
     print("BPE training complete!")
@@ -0,0 +1,271 @@
+"""
+Pre-tokenized corpus store.
+Encodes the preprocessed documents once with the BPE tokenizer and keeps them
+on disk as a single contiguous uint16 array of token ids, so the trainer,
+ensure_model and evaluation code can memory-map the ids instead of running
+BPE over the whole corpus again.
+
+Layout of the store directory (default: Tokenization/corpus/):
+    tokens.bin   - uint16 token ids of all documents, back to back
+    offsets.npy  - int64 document boundaries; document i is tokens[offsets[i]:offsets[i+1]]
+    header.json  - vocabulary (id -> token), document names and content hashes,
+                   token count and a fingerprint of the tokenizer files
+
+Usage:
+    # Build or incrementally update the store from PreProcessing/Preprocessed_documents,
+    # skipping the near-duplicates listed by PreProcessing/dedup.py
+    python Tokenization/corpus_store.py
+
+    # Force a full rebuild
+    python Tokenization/corpus_store.py --rebuild
+
+    from corpus_store import CorpusStore
+    store = CorpusStore.open()
+    ids = store.document(0)             # np.memmap slice of uint16 ids
+    tokens = store.document_tokens(0)   # the same document as token strings
+"""
+
+import os
+import sys
+import json
+import time
+import shutil
+import hashlib
+import argparse
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, List, Optional
+
+import numpy as np
+
+base_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(base_dir, "models"))
+
+from trigram_model import BPETokenizer  # noqa: E402
+from BPE import default_exclude  # noqa: E402
+
+DATA_FOLDER = os.path.join(base_dir, "PreProcessing", "Preprocessed_documents")
+STORE_DIR = os.path.join(base_dir, "Tokenization", "corpus")
+VOCAB_PATH = os.path.join(base_dir, "Tokenization", "vocab.json")
+MERGES_PATH = os.path.join(base_dir, "Tokenization", "merges.txt")
+
+STORE_VERSION = 1
+TOKEN_DTYPE = np.uint16
+MAX_VOCAB = np.iinfo(TOKEN_DTYPE).max + 1
+
+
+# ============================================
+# READING
+# ============================================
+
+class CorpusStore:
+    """Read-only view of an encoded corpus; token ids are memory-mapped."""
+
+    def __init__(self, path: str, header: dict, tokens: np.ndarray, offsets: np.ndarray):
+        self.path = path
+        self.header = header
+        self.tokens = tokens
+        self.offsets = offsets
+        self.vocab: List[str] = header["vocab"]
+        self.token_to_id: Dict[str, int] = {t: i for i, t in enumerate(self.vocab)}
+        self.names: List[str] = [d["name"] for d in header["documents"]]
+
+    @classmethod
+    def open(cls, path: str = STORE_DIR) -> "CorpusStore":
+        with open(os.path.join(path, "header.json"), "r", encoding="utf-8") as f:
+            header = json.load(f)
+        if header.get("version") != STORE_VERSION:
+            raise ValueError(f"unsupported corpus store version {header.get('version')}")
+
+        num_tokens = header["num_tokens"]
+        if num_tokens:
+            tokens = np.memmap(os.path.join(path, "tokens.bin"), dtype=TOKEN_DTYPE,
+                               mode="r", shape=(num_tokens,))
+        else:
+            tokens = np.zeros(0, dtype=TOKEN_DTYPE)
+        # offsets.npy only ever grows by appending, so slicing to the header's
+        # document count stays consistent even while an update is in progress
+        offsets = np.load(os.path.join(path, "offsets.npy"), mmap_mode="r")
+        offsets = offsets[:len(header["documents"]) + 1]
+        return cls(path, header, tokens, offsets)
+
+    def __len__(self) -> int:
+        return len(self.names)
+
+    @property
+    def num_tokens(self) -> int:
+        return int(self.header["num_tokens"])
+
+    def document(self, i: int) -> np.ndarray:
+        return self.tokens[self.offsets[i]:self.offsets[i + 1]]
+
+    def document_tokens(self, i: int) -> List[str]:
+        return [self.vocab[t] for t in self.document(i)]
+
+    def decode(self, ids) -> List[str]:
+        return [self.vocab[t] for t in ids]
+
+
+# ============================================
+# WRITING
+# ============================================
+
+def tokenizer_fingerprint(vocab_path: str = VOCAB_PATH, merges_path: str = MERGES_PATH) -> str:
+    h = hashlib.sha256()
+    for path in (vocab_path, merges_path):
+        with open(path, "rb") as f:
+            h.update(f.read())
+    return h.hexdigest()
+
+
+def _atomic_replace(path: str, write) -> None:
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), prefix=".tmp-")
+    os.close(fd)
+    try:
+        os.chmod(tmp_path, 0o644)
+        write(tmp_path)
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+
+_worker_tokenizer = None
+
+
+def _init_worker(vocab_path: str, merges_path: str) -> None:
+    global _worker_tokenizer
+    _worker_tokenizer = BPETokenizer(vocab_path, merges_path)
+
+
+def _tokenize_file(path: str) -> List[str]:
+    with open(path, "r", encoding="utf-8") as f:
+        return _worker_tokenizer.tokenize(f.read().strip())
+
+
+def _read_existing(store_dir: str) -> Optional[dict]:
+    try:
+        with open(os.path.join(store_dir, "header.json"), "r", encoding="utf-8") as f:
+            header = json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return None
+    return header if header.get("version") == STORE_VERSION else None
+
+
+def build_store(data_dir: str = DATA_FOLDER, store_dir: str = STORE_DIR,
+                vocab_path: str = VOCAB_PATH, merges_path: str = MERGES_PATH,
+                exclude=None, workers: Optional[int] = None, rebuild: bool = False,
+                verbose: bool = True) -> CorpusStore:
+    """
+    Build the store, or append only the new documents to an existing one.
+
+    Falls back to a full rebuild when the tokenizer files changed or when a
+    previously encoded document was modified or removed, since ids are stored
+    contiguously. Documents listed in `exclude` are left out; by default those
+    are the near-duplicates dedup listed for the preprocessed folder.
+    """
+    start = time.perf_counter()
+    exclude = set(default_exclude(data_dir) if exclude is None else exclude)
+    names = sorted(f for f in os.listdir(data_dir) if f.endswith(".txt") and f not in exclude)
+    hashes = {}
+    for name in names:
+        with open(os.path.join(data_dir, name), "rb") as f:
+            hashes[name] = hashlib.sha256(f.read()).hexdigest()
+    fingerprint = tokenizer_fingerprint(vocab_path, merges_path)
+
+    header = None if rebuild else _read_existing(store_dir)
+    if header is not None:
+        encoded = {d["name"]: d["sha256"] for d in header["documents"]}
+        if header["tokenizer"] != fingerprint or any(hashes.get(n) != h for n, h in encoded.items()):
+            header = None
+
+    if header is None:
+        # Full rebuild into a scratch directory, swapped in at the end
+        target = store_dir.rstrip(os.sep) + ".building"
+        shutil.rmtree(target, ignore_errors=True)
+        os.makedirs(target)
+        header = {"version": STORE_VERSION, "tokenizer": fingerprint, "dtype": "uint16",
+                  "vocab": [], "documents": [], "num_tokens": 0}
+        offsets = [0]
+        new_names = names
+    else:
+        target = store_dir
+        offsets = np.load(os.path.join(store_dir, "offsets.npy"))[:len(header["documents"]) + 1].tolist()
+        encoded = {d["name"] for d in header["documents"]}
+        new_names = [n for n in names if n not in encoded]
+
+    if not new_names and target == store_dir:
+        if verbose:
+            print(f"Corpus store up to date ({len(header['documents'])} documents)")
+        return CorpusStore.open(store_dir)
+
+    paths = [os.path.join(data_dir, n) for n in new_names]
+    if len(paths) > 1 and workers != 1:
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                                 initargs=(vocab_path, merges_path)) as pool:
+            chunksize = max(1, len(paths) // ((workers or os.cpu_count() or 1) * 4))
+            tokenized = list(pool.map(_tokenize_file, paths, chunksize=chunksize))
+    else:
+        _init_worker(vocab_path, merges_path)
+        tokenized = [_tokenize_file(p) for p in paths]
+
+    vocab = header["vocab"]
+    token_to_id = {t: i for i, t in enumerate(vocab)}
+    chunks = []
+    for name, tokens in zip(new_names, tokenized):
+        ids = []
+        for token in tokens:
+            tid = token_to_id.get(token)
+            if tid is None:
+                tid = token_to_id[token] = len(vocab)
+                vocab.append(token)
+            ids.append(tid)
+        if len(vocab) > MAX_VOCAB:
+            raise ValueError(f"vocabulary of {len(vocab)} tokens does not fit in uint16")
+        chunks.append(np.asarray(ids, dtype=TOKEN_DTYPE))
+        offsets.append(offsets[-1] + len(ids))
+        header["documents"].append({"name": name, "sha256": hashes[name]})
+
+    # Append ids first; anything past the header's num_tokens is ignored by readers
+    tokens_path = os.path.join(target, "tokens.bin")
+    with open(tokens_path, "ab") as f:
+        f.truncate(header["num_tokens"] * np.dtype(TOKEN_DTYPE).itemsize)
+        for chunk in chunks:
+            chunk.tofile(f)
+    header["num_tokens"] = offsets[-1]
+
+    def write_offsets(p):
+        with open(p, "wb") as f:
+            np.save(f, np.asarray(offsets, dtype=np.int64))
+
+    def write_header(p):
+        with open(p, "w", encoding="utf-8") as f:
+            json.dump(header, f, ensure_ascii=False)
+
+    _atomic_replace(os.path.join(target, "offsets.npy"), write_offsets)
+    _atomic_replace(os.path.join(target, "header.json"), write_header)
+
+    if target != store_dir:
+        shutil.rmtree(store_dir, ignore_errors=True)
+        os.replace(target, store_dir)
+
+    if verbose:
+        print(f"Encoded {len(new_names)} documents ({sum(len(c) for c in chunks)} tokens) "
+              f"in {time.perf_counter() - start:.2f}s; store has {len(header['documents'])} "
+              f"documents, {header['num_tokens']} tokens, {len(vocab)} token types")
+    return CorpusStore.open(store_dir)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Build the pre-tokenized corpus store")
+    parser.add_argument("--data", default=DATA_FOLDER, help="Folder of preprocessed documents")
+    parser.add_argument("--store", default=STORE_DIR, help="Output store directory")
+    parser.add_argument("--workers", type=int, default=None, help="Tokenizer processes (default: all cores)")
+    parser.add_argument("--rebuild", action="store_true", help="Re-encode every document")
+    args = parser.parse_args(argv)
+    build_store(args.data, args.store, workers=args.workers, rebuild=args.rebuild)
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
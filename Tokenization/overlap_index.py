@@ -0,0 +1,328 @@
+"""
+Hashed k-token window index over the training corpus, for memorization checks.
+
+Every window of `window` consecutive tokens in every document of the corpus
+store gets a 64-bit polynomial rolling hash. The (hash, document, offset)
+postings are sorted by hash and saved as flat .npy arrays that are
+memory-mapped on load, so finding where a generated story copies the corpus
+costs one binary search per story window instead of a scan over every
+document. <EOS>/<EOP>/<EOT> are left out of the indexed token stream because
+the rendered stories the index is queried with no longer contain them.
+
+Layout of the index directory (default: Tokenization/overlap_index/):
+    hashes.npy     - uint64 window hashes, sorted
+    documents.npy  - uint32 document number of each posting
+    offsets.npy    - uint32 token offset of each posting in its document
+                     (counted without special tokens)
+    meta.json      - window size, document names, vocabulary and the
+                     fingerprint of the corpus store it was built from
+
+Usage:
+    # Build (or rebuild after the corpus store changed)
+    python Tokenization/overlap_index.py
+
+    # Longest span of a story that also appears in the corpus
+    python Tokenization/overlap_index.py --check "ایک دن ایک لڑکا ..."
+
+    from overlap_index import OverlapIndex
+    index = OverlapIndex.open()
+    match = index.longest_overlap(tokenizer.tokenize(story))
+"""
+
+import os
+import sys
+import json
+import time
+import shutil
+import hashlib
+import argparse
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+from typing import List, Optional, Sequence, Tuple
+
+import numpy as np
+
+base_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(base_dir, "models"))
+sys.path.insert(0, os.path.join(base_dir, "Tokenization"))
+
+from trigram_model import BPETokenizer, SPECIAL_TOKENS  # noqa: E402
+from corpus_store import CorpusStore, STORE_DIR  # noqa: E402
+
+INDEX_DIR = os.path.join(base_dir, "Tokenization", "overlap_index")
+INDEX_VERSION = 1
+DEFAULT_WINDOW = 8
+# Odd 64-bit multiplier of the polynomial hash; arithmetic wraps modulo 2**64
+HASH_BASE = np.uint64(0x9E3779B97F4A7C15)
+# Postings looked at per story window; windows more common than this are stock phrases
+MAX_POSTINGS = 256
+
+
+def store_fingerprint(store: CorpusStore) -> str:
+    header = {k: store.header[k] for k in ("tokenizer", "vocab", "documents", "num_tokens")}
+    return hashlib.sha256(json.dumps(header, sort_keys=True).encode("utf-8")).hexdigest()
+
+
+def window_hashes(ids: np.ndarray, window: int) -> np.ndarray:
+    """Hash of every `window`-token window of `ids` (len(ids) - window + 1 values)."""
+    n = len(ids) - window + 1
+    if n <= 0:
+        return np.zeros(0, dtype=np.uint64)
+    values = np.asarray(ids, dtype=np.uint64) + np.uint64(1)
+    hashes = np.zeros(n, dtype=np.uint64)
+    for j in range(window):
+        hashes = hashes * HASH_BASE + values[j:j + n]
+    return hashes
+
+
+def _content_ids(store: CorpusStore, doc: int, special: np.ndarray) -> np.ndarray:
+    ids = np.asarray(store.document(doc))
+    return ids[~special[ids]]
+
+
+def _special_mask(vocab: Sequence[str]) -> np.ndarray:
+    return np.array([t in SPECIAL_TOKENS for t in vocab] + [False], dtype=bool)
+
+
+# ============================================
+# BUILD
+# ============================================
+
+def _hash_documents(job: Tuple[str, int, int, int]) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """Postings of documents [first, last) of the store, sorted by hash."""
+    store_dir, first, last, window = job
+    store = CorpusStore.open(store_dir)
+    special = _special_mask(store.vocab)
+    hashes, documents, offsets = [], [], []
+    for doc in range(first, last):
+        h = window_hashes(_content_ids(store, doc, special), window)
+        hashes.append(h)
+        documents.append(np.full(len(h), doc, dtype=np.uint32))
+        offsets.append(np.arange(len(h), dtype=np.uint32))
+    if not hashes:
+        return np.zeros(0, np.uint64), np.zeros(0, np.uint32), np.zeros(0, np.uint32)
+    hashes, documents, offsets = np.concatenate(hashes), np.concatenate(documents), np.concatenate(offsets)
+    order = np.argsort(hashes, kind="stable")
+    return hashes[order], documents[order], offsets[order]
+
+
+def build_index(store_dir: str = STORE_DIR, index_dir: str = INDEX_DIR, window: int = DEFAULT_WINDOW,
+                workers: Optional[int] = None, verbose: bool = True) -> "OverlapIndex":
+    """Hash every document of the corpus store, in parallel chunks, and write the index."""
+    start = time.perf_counter()
+    store = CorpusStore.open(store_dir)
+    num_docs = len(store)
+    workers = workers or os.cpu_count() or 1
+    chunk = max(1, -(-num_docs // (workers * 4)))
+    jobs = [(store_dir, i, min(i + chunk, num_docs), window) for i in range(0, num_docs, chunk)]
+
+    if len(jobs) > 1 and workers > 1:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            parts = list(pool.map(_hash_documents, jobs))
+    else:
+        parts = [_hash_documents(job) for job in jobs]
+
+    hashes = np.concatenate([p[0] for p in parts]) if parts else np.zeros(0, np.uint64)
+    order = np.argsort(hashes, kind="stable")
+    arrays = {
+        "hashes": hashes[order],
+        "documents": np.concatenate([p[1] for p in parts])[order] if parts else np.zeros(0, np.uint32),
+        "offsets": np.concatenate([p[2] for p in parts])[order] if parts else np.zeros(0, np.uint32),
+    }
+    meta = {
+        "version": INDEX_VERSION,
+        "window": window,
+        "store": store_fingerprint(store),
+        "vocab": store.vocab,
+        "documents": store.names,
+        "postings": int(len(hashes)),
+    }
+
+    # Written to a scratch directory and swapped in, so readers never see a partial index
+    parent = os.path.dirname(os.path.abspath(index_dir))
+    os.makedirs(parent, exist_ok=True)
+    tmp_dir = tempfile.mkdtemp(dir=parent, prefix=".overlap-")
+    try:
+        for name, array in arrays.items():
+            np.save(os.path.join(tmp_dir, name + ".npy"), array)
+        with open(os.path.join(tmp_dir, "meta.json"), "w", encoding="utf-8") as f:
+            json.dump(meta, f, ensure_ascii=False)
+        os.chmod(tmp_dir, 0o755)
+        shutil.rmtree(index_dir, ignore_errors=True)
+        os.replace(tmp_dir, index_dir)
+    finally:
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+
+    if verbose:
+        print(f"Indexed {meta['postings']} {window}-token windows from {num_docs} documents "
+              f"in {time.perf_counter() - start:.2f}s")
+    return OverlapIndex.open(index_dir, store_dir)
+
+
+# ============================================
+# QUERY
+# ============================================
+
+class OverlapIndex:
+    """Read-only window index; postings are memory-mapped."""
+
+    def __init__(self, path: str, meta: dict, arrays: dict, store: Optional[CorpusStore]):
+        self.path = path
+        self.meta = meta
+        self.window: int = meta["window"]
+        self.vocab: List[str] = meta["vocab"]
+        self.token_to_id = {t: i for i, t in enumerate(self.vocab)}
+        self.names: List[str] = meta["documents"]
+        self.hashes = arrays["hashes"]
+        self.documents = arrays["documents"]
+        self.offsets = arrays["offsets"]
+        self.store = store
+        self._special = _special_mask(self.vocab)
+
+    @classmethod
+    def open(cls, path: str = INDEX_DIR, store_dir: Optional[str] = STORE_DIR) -> "OverlapIndex":
+        """
+        Attach to an index. With `store_dir`, matches are checked token by token
+        against the corpus store, which rules out hash collisions, and the store
+        must be the one the index was built from.
+        """
+        with open(os.path.join(path, "meta.json"), "r", encoding="utf-8") as f:
+            meta = json.load(f)
+        if meta.get("version") != INDEX_VERSION:
+            raise ValueError(f"unsupported overlap index version {meta.get('version')}")
+        arrays = {name: np.load(os.path.join(path, name + ".npy"), mmap_mode="r")
+                  for name in ("hashes", "documents", "offsets")}
+        store = None
+        if store_dir is not None:
+            store = CorpusStore.open(store_dir)
+            if store_fingerprint(store) != meta["store"]:
+                raise ValueError("overlap index is out of date with the corpus store; rebuild it")
+        return cls(path, meta, arrays, store)
+
+    def _ids(self, tokens: Sequence[str]) -> np.ndarray:
+        # Tokens missing from the corpus vocabulary get an id no document contains
+        unknown = len(self.vocab)
+        ids = np.array([self.token_to_id.get(t, unknown) for t in tokens if t not in SPECIAL_TOKENS],
+                       dtype=np.int64)
+        return ids
+
+    def _verify(self, story_ids: np.ndarray, doc: int, doc_start: int, story_start: int, length: int) -> bool:
+        if self.store is None:
+            return True
+        doc_ids = _content_ids(self.store, doc, self._special)
+        return np.array_equal(doc_ids[doc_start:doc_start + length], story_ids[story_start:story_start + length])
+
+    def longest_overlap(self, tokens: Sequence[str]) -> dict:
+        """
+        Longest run of `tokens` (special tokens ignored) that appears verbatim in
+        one corpus document, found from runs of consecutive matching windows.
+        Spans shorter than the window size are not detected.
+        """
+        ids = self._ids(tokens)
+        result = {"length": 0, "fraction": 0.0, "document": None, "document_offset": None,
+                  "story_offset": None, "tokens": [], "window": self.window}
+        query = window_hashes(ids, self.window)
+        if len(query) == 0 or len(self.hashes) == 0:
+            return result
+
+        lo = np.searchsorted(self.hashes, query, side="left")
+        hi = np.searchsorted(self.hashes, query, side="right")
+        counts = np.minimum(hi - lo, MAX_POSTINGS)
+        if counts.sum() == 0:
+            return result
+
+        # One row per (story window, posting) hit
+        story_pos = np.repeat(np.arange(len(query)), counts)
+        first = np.repeat(lo - np.concatenate([[0], np.cumsum(counts)[:-1]]), counts)
+        posting = first + np.arange(counts.sum())
+        docs = np.asarray(self.documents[posting], dtype=np.int64)
+        diagonal = np.asarray(self.offsets[posting], dtype=np.int64) - story_pos
+
+        # Hits on the same document and diagonal at consecutive story positions form one span
+        order = np.lexsort((story_pos, diagonal, docs))
+        docs, diagonal, story_pos = docs[order], diagonal[order], story_pos[order]
+        new_run = np.ones(len(order), dtype=bool)
+        new_run[1:] = (docs[1:] != docs[:-1]) | (diagonal[1:] != diagonal[:-1]) | (story_pos[1:] != story_pos[:-1] + 1)
+        starts = np.nonzero(new_run)[0]
+        ends = np.append(starts[1:], len(order)) - 1
+        lengths = story_pos[ends] - story_pos[starts] + self.window
+
+        for run in np.argsort(-lengths, kind="stable"):
+            s = starts[run]
+            doc, story_start, length = int(docs[s]), int(story_pos[s]), int(lengths[run])
+            doc_start = story_start + int(diagonal[s])
+            if self._verify(ids, doc, doc_start, story_start, length):
+                result.update({
+                    "length": length,
+                    "fraction": length / len(ids),
+                    "document": self.names[doc],
+                    "document_offset": doc_start,
+                    "story_offset": story_start,
+                    "tokens": [self.vocab[t] for t in ids[story_start:story_start + length]],
+                })
+                break
+        return result
+
+    def check_text(self, text: str, tokenizer: BPETokenizer) -> dict:
+        """longest_overlap of a rendered story, with the copied span as text."""
+        match = self.longest_overlap(tokenizer.tokenize(text))
+        match["text"] = tokenizer.detokenize(match.pop("tokens"))
+        return match
+
+
+_shared_indexes = {}
+
+
+def _file_stamp(path: str) -> Optional[Tuple[int, int]]:
+    try:
+        st = os.stat(path)
+    except FileNotFoundError:
+        return None
+    return st.st_ino, st.st_mtime_ns
+
+
+def shared_index(path: str = INDEX_DIR, store_dir: Optional[str] = STORE_DIR) -> OverlapIndex:
+    """
+    Open an index once per process and reuse it for later requests. Both the
+    index and the store replace their metadata file atomically when rebuilt,
+    so one stat of each per call is enough to notice a rebuild and reopen
+    (which checks the store fingerprint again).
+    """
+    key = (os.path.abspath(path), store_dir and os.path.abspath(store_dir))
+    stamp = (_file_stamp(os.path.join(path, "meta.json")),
+             store_dir and _file_stamp(os.path.join(store_dir, "header.json")))
+    cached = _shared_indexes.get(key)
+    if cached is None or cached[0] != stamp:
+        _shared_indexes.pop(key, None)
+        _shared_indexes[key] = (stamp, OverlapIndex.open(path, store_dir))
+    return _shared_indexes[key][1]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Build or query the corpus overlap index")
+    parser.add_argument("--store", default=STORE_DIR, help="Corpus store directory")
+    parser.add_argument("--index", default=INDEX_DIR, help="Index directory")
+    parser.add_argument("--window", type=int, default=DEFAULT_WINDOW, help="Tokens per hashed window")
+    parser.add_argument("--workers", type=int, default=None, help="Hashing processes (default: all cores)")
+    parser.add_argument("--check", help="Report the longest corpus overlap of this text instead of building")
+    args = parser.parse_args(argv)
+
+    if args.check is None:
+        build_index(args.store, args.index, args.window, args.workers)
+        return
+
+    index = OverlapIndex.open(args.index, args.store)
+    tokenizer = BPETokenizer()
+    start = time.perf_counter()
+    match = index.check_text(args.check, tokenizer)
+    elapsed = (time.perf_counter() - start) * 1000
+    if match["length"]:
+        print(f"Longest overlap: {match['length']} tokens ({match['fraction']:.0%} of the text) "
+              f"from {match['document']} at token {match['document_offset']} [{elapsed:.1f} ms]")
+        print(match["text"])
+    else:
+        print(f"No overlap of {index.window}+ tokens [{elapsed:.1f} ms]")
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
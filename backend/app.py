@@ -4,8 +4,11 @@ Exposes the Trigram Language Model via a REST API.
 
 Endpoints:
     GET  /health    - Health check
-    POST /generate  - Generate an Urdu story (Input: prefix, max_length, temperature)
+    POST /generate  - Generate an Urdu story (Input: prefix, max_length, temperature,
+                      optional stop conditions, constraints and overlap check)
     GET  /model-info - Model statistics and metadata
+    GET  /debug/memory - Memory used by each model structure (+ tracemalloc snapshot);
+                         only served when DEBUG_MEMORY=1
 
 Run:
     uvicorn app:app --host 0.0.0.0 --port 5000 --reload
@@ -13,25 +16,31 @@ Run:
 
 import os
 import sys
-import pickle
 from contextlib import asynccontextmanager
 
 from fastapi import FastAPI, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
 from pydantic import BaseModel, Field
-from typing import Optional
+from typing import Dict, List, Optional
 
 # ---------------------------------------------------------------------------
 # Import model classes from Phase III
 # ---------------------------------------------------------------------------
 sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'models'))
-from trigram_model import StoryGeneratorAPI, TrigramLanguageModel
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'Tokenization'))
+from trigram_model import StoryGeneratorAPI, TrigramLanguageModel, save_model
+from memory_report import debug_memory_report, debug_endpoint_enabled
+from corpus_store import build_store
+from overlap_index import shared_index
 
 # ---------------------------------------------------------------------------
 # Configuration
 # ---------------------------------------------------------------------------
 PORT = 5000
 MODEL_PATH = os.path.join(os.path.dirname(__file__), '..', 'models', 'trigram_model.pkl')
+# "pickle" loads private dicts per process; "mmap" attaches every worker to one
+# read-only memory-mapped copy of the count tables (see models/mapped_model.py)
+SERVING_MODE = os.environ.get("MODEL_SERVING_MODE", "pickle")
 
 # ---------------------------------------------------------------------------
 # FastAPI app
@@ -58,12 +67,21 @@ class GenerateRequest(BaseModel):
     prefix: str = Field("", description="Starting phrase in Urdu")
     max_length: int = Field(500, ge=1, le=5000, description="Maximum tokens to generate")
     temperature: float = Field(0.8, ge=0.1, le=2.0, description="Sampling temperature")
+    max_sentences: Optional[int] = Field(None, ge=1, description="Stop after this many sentences (<EOS>)")
+    max_paragraphs: Optional[int] = Field(None, ge=1, description="Stop after this many paragraphs (<EOP>)")
+    stop_tokens: List[str] = Field(default_factory=list, description="Tokens that end the story when sampled, e.g. \"<EOP>\"")
+    min_length: int = Field(0, ge=0, le=5000, description="Tokens to generate before the story may end (<EOT>)")
+    banned_tokens: List[str] = Field(default_factory=list, description="BPE tokens that must not be generated")
+    banned_words: List[str] = Field(default_factory=list, description="Words or phrases that must not appear in the story")
+    boosts: Dict[str, float] = Field(default_factory=dict, description="Logit boost per token; negative values make it rarer")
+    check_overlap: bool = Field(False, description="Report the longest span copied from the training corpus")
 
 class GenerateResponse(BaseModel):
     success: bool
     story: Optional[str] = None
     prefix: str
     error: Optional[str] = None
+    overlap: Optional[dict] = None
 
 class ModelInfoResponse(BaseModel):
     model_type: str
@@ -77,54 +95,34 @@ class ModelInfoResponse(BaseModel):
 # ---------------------------------------------------------------------------
 
 def ensure_model() -> StoryGeneratorAPI:
-    """Load the pre-trained model or train one from preprocessed documents."""
+    """Load the pre-trained model or train one from the pre-tokenized corpus store."""
     if os.path.exists(MODEL_PATH):
-        return StoryGeneratorAPI(model_path=MODEL_PATH)
+        return StoryGeneratorAPI(model_path=MODEL_PATH, shared=SERVING_MODE == "mmap")
 
     print("Model not found — training from PreProcessing/Preprocessed_documents...")
     data_dir = os.path.join(os.path.dirname(__file__), '..', 'PreProcessing', 'Preprocessed_documents')
-    corpus = []
-    if os.path.isdir(data_dir):
-        for fname in sorted(os.listdir(data_dir)):
-            if fname.endswith('.txt'):
-                path = os.path.join(data_dir, fname)
-                try:
-                    with open(path, 'r', encoding='utf-8') as f:
-                        text = f.read().strip()
-                        if text:
-                            corpus.append(text)
-                except Exception as e:
-                    print(f"Warning: failed to read {path}: {e}")
-
-    if not corpus:
+    if not os.path.isdir(data_dir) or not any(f.endswith('.txt') for f in os.listdir(data_dir)):
+        print("No preprocessed documents found — creating empty API instance.")
+        return StoryGeneratorAPI(model_path=None)
+
+    # Encodes only documents the store has not seen yet (skipping dedup's near-duplicates);
+    # later runs reuse the ids
+    store = build_store(data_dir)
+    if store.num_tokens == 0:
         print("No preprocessed documents found — creating empty API instance.")
         return StoryGeneratorAPI(model_path=None)
 
     model = TrigramLanguageModel()
-    model.train(corpus)
-
-    model_data = {
-        'lambda1': model.lambda1,
-        'lambda2': model.lambda2,
-        'lambda3': model.lambda3,
-        'unigram_counts': dict(model.unigram_counts),
-        'bigram_counts': {k: dict(v) for k, v in model.bigram_counts.items()},
-        'trigram_counts': {k: dict(v) for k, v in model.trigram_counts.items()},
-        'total_unigrams': model.total_unigrams,
-        'bigram_context_counts': dict(model.bigram_context_counts),
-        'trigram_context_counts': dict(model.trigram_context_counts),
-        'vocabulary': model.vocabulary,
-    }
+    model.train_from_store(store)
 
     try:
         os.makedirs(os.path.dirname(MODEL_PATH), exist_ok=True)
-        with open(MODEL_PATH, 'wb') as f:
-            pickle.dump(model_data, f)
+        save_model(model, MODEL_PATH)
         print(f"Saved trained model to {MODEL_PATH}")
     except Exception as e:
         print(f"Warning: failed to save model: {e}")
 
-    return StoryGeneratorAPI(model_path=MODEL_PATH)
+    return StoryGeneratorAPI(model_path=MODEL_PATH, shared=SERVING_MODE == "mmap")
 
 
 # ---------------------------------------------------------------------------
@@ -149,6 +147,14 @@ def root():
     return {"status": "ok", "message": "Urdu Story Generator API — visit /docs for Swagger UI"}
 
 
+def story_overlap(story: str) -> dict:
+    """Longest span of the story found verbatim in a training document."""
+    try:
+        return shared_index().check_text(story, api_instance.bpe_tokenizer)
+    except (FileNotFoundError, ValueError) as e:
+        return {"error": f"overlap index unavailable ({e}); build it with python Tokenization/overlap_index.py"}
+
+
 @app.post("/generate", response_model=GenerateResponse)
 def generate(req: GenerateRequest):
     """
@@ -157,11 +163,24 @@ def generate(req: GenerateRequest):
     - **prefix**: starting phrase in Urdu (empty string for no prompt)
     - **max_length**: maximum number of tokens to generate (1–5000)
     - **temperature**: sampling temperature; higher = more creative (0.1–2.0)
+    - **max_sentences** / **max_paragraphs**: stop once this many have been generated
+    - **stop_tokens**: tokens that end the story when sampled
+    - **min_length**: tokens to generate before the story may end
+    - **banned_tokens** / **banned_words**: tokens and whole words kept out of the story
+    - **boosts**: logit boost per token
+    - **check_overlap**: attach the longest span the story shares with a training document
     """
     result = api_instance.generate(
         prefix=req.prefix,
         max_length=req.max_length,
         temperature=req.temperature,
+        max_sentences=req.max_sentences,
+        max_paragraphs=req.max_paragraphs,
+        stop_tokens=req.stop_tokens,
+        min_length=req.min_length,
+        banned_tokens=req.banned_tokens,
+        banned_words=req.banned_words,
+        boosts=req.boosts,
     )
     if not result.get("success"):
         raise HTTPException(status_code=500, detail=result.get("error", "Generation failed"))
@@ -169,6 +188,7 @@ def generate(req: GenerateRequest):
         success=True,
         story=result["story"],
         prefix=req.prefix,
+        overlap=story_overlap(result["story"]) if req.check_overlap else None,
     )
 
 
@@ -189,6 +209,24 @@ def model_info():
     )
 
 
+@app.get("/debug/memory")
+def debug_memory(tracemalloc: bool = False, top: int = 10, stop: bool = False):
+    """
+    Report bytes and entry counts per model structure.
+
+    - **tracemalloc**: also return the top allocation sites; the first request
+      starts tracing, later requests return snapshots
+    - **top**: number of allocation sites to return
+    - **stop**: stop tracing after taking the snapshot
+
+    Only served when the DEBUG_MEMORY=1 environment variable is set.
+    """
+    if not debug_endpoint_enabled():
+        raise HTTPException(status_code=404, detail="Not Found")
+    report = debug_memory_report(api_instance.model, api_instance.bpe_tokenizer, tracemalloc, top, stop)
+    return report
+
+
 # ---------------------------------------------------------------------------
 # Entry-point for `python app.py`
 # ---------------------------------------------------------------------------
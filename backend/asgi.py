@@ -1,23 +1,87 @@
-from fastapi import FastAPI, Request
+from fastapi import FastAPI, Query, Request, WebSocket, WebSocketDisconnect
 from fastapi.responses import JSONResponse, StreamingResponse
 from fastapi.middleware.cors import CORSMiddleware
 import os
 import json
 import sys
+import asyncio
+from typing import List, Optional
 
 sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'models'))
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'Tokenization'))
 from trigram_model import StoryGeneratorAPI
+from memory_report import debug_memory_report, debug_endpoint_enabled
+from overlap_index import shared_index
 
 ROOT = os.path.dirname(__file__)
 MODEL_PATH = os.path.join(os.path.dirname(__file__), '..', 'models', 'trigram_model.pkl')
+SERVING_MODE = os.environ.get('MODEL_SERVING_MODE', 'pickle')
+
+# /ws flow control: chunks a stream may send before the client grants more credit
+WS_DEFAULT_CREDIT = 32
+WS_MAX_STREAMS = 16
+
+
+def generation_options(params):
+    """
+    Stop conditions and constraints from a request body, query string or
+    WebSocket start message. Boosts may be a {token: boost} object or, in a
+    query string, a list of "token:boost" strings. Raises ValueError or
+    TypeError on malformed or out-of-range values, matching the limits of
+    app.GenerateRequest.
+    """
+    def at_least_one(name):
+        value = params.get(name)
+        if value is None:
+            return None
+        if int(value) < 1:
+            raise ValueError(f'{name} must be at least 1')
+        return int(value)
+
+    def min_length():
+        value = int(params.get('min_length') or 0)
+        if not 0 <= value <= 5000:
+            raise ValueError('min_length must be between 0 and 5000')
+        return value
+
+    def string_list(name):
+        value = params.get(name) or []
+        return [str(v) for v in ([value] if isinstance(value, str) else value)]
+
+    def boost_pair(item):
+        token, sep, value = item.rpartition(':')
+        if not sep:
+            raise ValueError(f'boost {item!r} is not "token:value"')
+        return token, value
+
+    boosts = params.get('boosts') or {}
+    if not isinstance(boosts, dict):
+        boosts = dict(boost_pair(b) for b in string_list('boosts'))
+    return {
+        'max_sentences': at_least_one('max_sentences'),
+        'max_paragraphs': at_least_one('max_paragraphs'),
+        'stop_tokens': string_list('stop_tokens'),
+        'min_length': min_length(),
+        'banned_tokens': string_list('banned_tokens'),
+        'banned_words': string_list('banned_words'),
+        'boosts': {str(k): float(v) for k, v in boosts.items()},
+    }
 
 
 def ensure_model():
     if os.path.exists(MODEL_PATH):
-        return StoryGeneratorAPI(model_path=MODEL_PATH)
+        return StoryGeneratorAPI(model_path=MODEL_PATH, shared=SERVING_MODE == 'mmap')
     return StoryGeneratorAPI()
 
 
+def story_overlap(story):
+    """Longest span of the story found verbatim in a training document."""
+    try:
+        return shared_index().check_text(story, api.bpe_tokenizer)
+    except (FileNotFoundError, ValueError) as e:
+        return {'error': f'overlap index unavailable ({e}); build it with python Tokenization/overlap_index.py'}
+
+
 api = ensure_model()
 app = FastAPI()
 
@@ -35,10 +99,33 @@ async def health():
     return JSONResponse({'status': 'ok', 'message': 'Backend is running'})
 
 
+@app.get('/debug/memory')
+def debug_memory(tracemalloc: bool = False, top: int = 10, stop: bool = False):
+    # Sync handler: the model walk runs in the threadpool, not on the event loop
+    if not debug_endpoint_enabled():
+        return JSONResponse({'detail': 'Not Found'}, status_code=404)
+    report = debug_memory_report(api.model, api.bpe_tokenizer, tracemalloc, top, stop)
+    return JSONResponse(report)
+
+
 @app.get('/generate')
-async def generate_get(prefix: str = '', max_length: int = 500, temperature: float = 0.8):
+async def generate_get(prefix: str = '', max_length: int = 500, temperature: float = 0.8,
+                       max_sentences: Optional[int] = None, max_paragraphs: Optional[int] = None,
+                       stop_tokens: Optional[List[str]] = Query(None), min_length: int = 0,
+                       banned_tokens: Optional[List[str]] = Query(None),
+                       banned_words: Optional[List[str]] = Query(None),
+                       boosts: Optional[List[str]] = Query(None), check_overlap: bool = False):
+    try:
+        options = generation_options({'max_sentences': max_sentences, 'max_paragraphs': max_paragraphs,
+                                      'stop_tokens': stop_tokens, 'min_length': min_length,
+                                      'banned_tokens': banned_tokens, 'banned_words': banned_words,
+                                      'boosts': boosts})
+    except (TypeError, ValueError) as e:
+        return JSONResponse({'success': False, 'error': f'invalid options: {e}'}, status_code=400)
     try:
-        result = api.generate(prefix=prefix, max_length=max_length, temperature=temperature)
+        result = api.generate(prefix=prefix, max_length=max_length, temperature=temperature, **options)
+        if check_overlap and result.get('success'):
+            result['overlap'] = story_overlap(result['story'])
         return JSONResponse(result)
     except Exception as e:
         return JSONResponse({'success': False, 'error': str(e)}, status_code=500)
@@ -47,24 +134,186 @@ async def generate_get(prefix: str = '', max_length: int = 500, temperature: flo
 @app.post('/generate')
 async def generate_post(request: Request):
     body = await request.json()
-    prefix = body.get('prefix', '')
-    max_length = int(body.get('max_length', 500))
-    temperature = float(body.get('temperature', 0.8))
     try:
-        result = api.generate(prefix=prefix, max_length=max_length, temperature=temperature)
+        if not isinstance(body, dict):
+            raise TypeError('request body must be a JSON object')
+        prefix = body.get('prefix', '')
+        max_length = int(body.get('max_length', 500))
+        temperature = float(body.get('temperature', 0.8))
+        options = generation_options(body)
+    except (TypeError, ValueError) as e:
+        return JSONResponse({'success': False, 'error': f'invalid options: {e}'}, status_code=400)
+    try:
+        result = api.generate(prefix=prefix, max_length=max_length, temperature=temperature, **options)
+        if body.get('check_overlap') and result.get('success'):
+            result['overlap'] = story_overlap(result['story'])
         return JSONResponse(result)
     except Exception as e:
         return JSONResponse({'success': False, 'error': str(e)}, status_code=500)
 
 
 @app.get('/stream')
-async def stream(prefix: str = '', max_length: int = 500, temperature: float = 0.8):
+async def stream(prefix: str = '', max_length: int = 500, temperature: float = 0.8,
+                 max_sentences: Optional[int] = None, max_paragraphs: Optional[int] = None,
+                 stop_tokens: Optional[List[str]] = Query(None), min_length: int = 0,
+                 banned_tokens: Optional[List[str]] = Query(None),
+                 banned_words: Optional[List[str]] = Query(None),
+                 boosts: Optional[List[str]] = Query(None)):
+    try:
+        options = generation_options({'max_sentences': max_sentences, 'max_paragraphs': max_paragraphs,
+                                      'stop_tokens': stop_tokens, 'min_length': min_length,
+                                      'banned_tokens': banned_tokens, 'banned_words': banned_words,
+                                      'boosts': boosts})
+    except (TypeError, ValueError) as e:
+        return JSONResponse({'success': False, 'error': f'invalid options: {e}'}, status_code=400)
+
     async def event_generator():
         try:
-            for token in api.generate_stream(prefix=prefix, max_length=max_length, temperature=temperature):
-                yield f"data: {token}\n\n"
+            for token in api.generate_stream(prefix=prefix, max_length=max_length,
+                                             temperature=temperature, **options):
+                # JSON-encode each piece so paragraph breaks cannot end the SSE event
+                yield f"data: {json.dumps(token, ensure_ascii=False)}\n\n"
             yield "event: done\ndata: \n\n"
         except Exception as e:
             yield f"event: error\ndata: {str(e)}\n\n"
 
     return StreamingResponse(event_generator(), media_type='text/event-stream')
+
+
+def is_count(value):
+    """A JSON integer: bools and floats are not accepted as credit."""
+    return isinstance(value, int) and not isinstance(value, bool)
+
+
+class StreamCredit:
+    """Credit counter for one multiplexed stream; generation waits while it is zero."""
+
+    def __init__(self, credit):
+        self.credit = credit
+        self.available = asyncio.Event()
+        if credit > 0:
+            self.available.set()
+
+    def grant(self, n):
+        self.credit += n
+        if self.credit > 0:
+            self.available.set()
+
+    async def take(self):
+        while self.credit <= 0:
+            self.available.clear()
+            await self.available.wait()
+        self.credit -= 1
+
+
+@app.websocket('/ws')
+async def ws(websocket: WebSocket):
+    """
+    Multiplexes several generations over one connection.
+
+    Client -> server (JSON):
+        {"type": "start",  "id": "a", "prefix": "...", "max_length": 500, "temperature": 0.8, "credit": 32}
+            optional: "max_sentences", "max_paragraphs", "stop_tokens", "min_length",
+                      "banned_tokens", "banned_words", "boosts"
+        {"type": "credit", "id": "a", "n": 16}   allow 16 more chunks on stream "a" (n >= 1)
+        {"type": "cancel", "id": "a"}            stop sampling stream "a"
+        {"type": "ping"}
+    Server -> client:
+        {"type": "chunk", "id": "a", "text": "..."}
+        {"type": "done",  "id": "a", "reason": "finished" | "cancelled"}
+        {"type": "error", "id": "a", "error": "..."}
+        {"type": "pong"}
+
+    Each chunk uses one credit; a stream without credit stops sampling until
+    the client sends more, so a slow reader never makes the server buffer.
+    """
+    await websocket.accept()
+    loop = asyncio.get_running_loop()
+    send_lock = asyncio.Lock()
+    streams = {}
+
+    async def send(message):
+        async with send_lock:
+            await websocket.send_json(message)
+
+    async def run_stream(stream_id, credit, pieces):
+        try:
+            while True:
+                await credit.take()
+                # Sample off the event loop so other streams keep flowing
+                piece = await loop.run_in_executor(None, next, pieces, None)
+                if piece is None:
+                    break
+                await send({'type': 'chunk', 'id': stream_id, 'text': piece})
+            await send({'type': 'done', 'id': stream_id, 'reason': 'finished'})
+        except asyncio.CancelledError:
+            pass
+        except Exception as e:
+            try:
+                await send({'type': 'error', 'id': stream_id, 'error': str(e)})
+            except Exception:
+                pass
+        finally:
+            # A cancelled stream's id may already belong to a newer stream
+            if streams.get(stream_id, (None, None))[1] is asyncio.current_task():
+                del streams[stream_id]
+
+    try:
+        while True:
+            try:
+                message = json.loads(await websocket.receive_text())
+            except json.JSONDecodeError:
+                await send({'type': 'error', 'id': None, 'error': 'invalid JSON'})
+                continue
+            if not isinstance(message, dict):
+                await send({'type': 'error', 'id': None, 'error': 'message must be a JSON object'})
+                continue
+            kind = message.get('type')
+            stream_id = message.get('id')
+            if not isinstance(stream_id, (str, int, type(None))) or isinstance(stream_id, bool):
+                await send({'type': 'error', 'id': None, 'error': 'stream id must be a string or integer'})
+                continue
+
+            if kind == 'ping':
+                await send({'type': 'pong'})
+            elif kind == 'start':
+                if stream_id is None or stream_id in streams:
+                    await send({'type': 'error', 'id': stream_id, 'error': 'missing or duplicate stream id'})
+                    continue
+                if len(streams) >= WS_MAX_STREAMS:
+                    await send({'type': 'error', 'id': stream_id, 'error': f'at most {WS_MAX_STREAMS} concurrent streams'})
+                    continue
+                try:
+                    max_length = min(max(int(message.get('max_length', 500)), 1), 5000)
+                    temperature = min(max(float(message.get('temperature', 0.8)), 0.1), 2.0)
+                    options = generation_options(message)
+                    initial = message.get('credit', WS_DEFAULT_CREDIT)
+                    if not is_count(initial) or initial < 0:
+                        raise ValueError('credit must be a non-negative integer')
+                    credit = StreamCredit(initial)
+                    # Compiles the constraints now, so bad ones are reported before the stream exists
+                    pieces = api.generate_stream(prefix=str(message.get('prefix', '')), max_length=max_length,
+                                                 temperature=temperature, **options)
+                except (TypeError, ValueError) as e:
+                    await send({'type': 'error', 'id': stream_id, 'error': str(e)})
+                    continue
+                streams[stream_id] = (credit, asyncio.create_task(run_stream(stream_id, credit, pieces)))
+            elif kind == 'credit' and stream_id in streams:
+                n = message.get('n', 1)
+                if not is_count(n) or n < 1:
+                    await send({'type': 'error', 'id': stream_id, 'error': 'credit n must be a positive integer'})
+                    continue
+                streams[stream_id][0].grant(n)
+            elif kind == 'cancel' and stream_id in streams:
+                _, task = streams.pop(stream_id)
+                task.cancel()
+                await send({'type': 'done', 'id': stream_id, 'reason': 'cancelled'})
+            elif kind in ('credit', 'cancel'):
+                await send({'type': 'error', 'id': stream_id, 'error': 'unknown stream id'})
+            else:
+                await send({'type': 'error', 'id': stream_id, 'error': f'unknown message type {kind!r}'})
+    except WebSocketDisconnect:
+        pass
+    finally:
+        for _, task in list(streams.values()):
+            task.cancel()
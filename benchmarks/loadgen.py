@@ -0,0 +1,314 @@
+"""
+Load-generation harness for the Urdu Story Generator service.
+Replays a configurable mix of POST /generate, GET /generate and GET /stream
+requests with varied prefixes, lengths and temperatures, either at a fixed
+concurrency (closed loop) or at a fixed arrival rate (open loop), and reports
+throughput, latency percentiles, time-to-first-chunk for streams and error rates.
+
+Usage:
+    # In-process against backend.asgi:app, 8 concurrent clients for 200 requests
+    python benchmarks/loadgen.py --concurrency 8 --requests 200
+
+    # Against a running server at 5 requests/s for 60 seconds
+    python benchmarks/loadgen.py --url http://localhost:5000 --rate 5 --duration 60
+
+    # Only streams, with custom lengths
+    python benchmarks/loadgen.py --mix stream=1 --lengths 100,400 --output load.json
+
+Note: the in-process ASGI transport buffers the whole response body, so
+time-to-first-chunk is only meaningful when targeting a running server (--url).
+"""
+
+import os
+import io
+import sys
+import json
+import time
+import random
+import asyncio
+import argparse
+import contextlib
+import statistics
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional
+
+import httpx
+
+from run_benchmarks import percentile
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+
+DEFAULT_PREFIXES = ["", "ایک دن", "ایک بادشاہ", "پرانے زمانے میں", "ایک لڑکا", "جنگل میں"]
+DEFAULT_MIX = "generate_post=5,generate_get=3,stream=2"
+REQUEST_KINDS = ("generate_post", "generate_get", "stream")
+
+
+@dataclass
+class RequestResult:
+    kind: str
+    start: float
+    latency: float
+    ok: bool
+    ttfc: Optional[float] = None
+    error: Optional[str] = None
+
+
+@dataclass
+class LoadConfig:
+    mix: Dict[str, float]
+    prefixes: List[str]
+    lengths: List[int]
+    temperatures: List[float]
+    concurrency: int = 4
+    rate: Optional[float] = None
+    requests: Optional[int] = None
+    duration: Optional[float] = None
+    timeout: float = 120.0
+    seed: int = 0
+    results: List[RequestResult] = field(default_factory=list)
+
+
+# ---------------------------------------------------------------------------
+# Parsing helpers
+# ---------------------------------------------------------------------------
+
+def parse_mix(spec: str) -> Dict[str, float]:
+    """Parse 'generate_post=5,stream=2' into normalized weights."""
+    mix = {}
+    for part in spec.split(','):
+        if not part.strip():
+            continue
+        name, _, weight = part.partition('=')
+        name = name.strip()
+        if name not in REQUEST_KINDS:
+            raise ValueError(f"unknown request kind '{name}' (expected one of {', '.join(REQUEST_KINDS)})")
+        mix[name] = float(weight or 1)
+    total = sum(mix.values())
+    if total <= 0:
+        raise ValueError("request mix must have a positive total weight")
+    return {k: v / total for k, v in mix.items()}
+
+
+def load_prefixes(path: Optional[str]) -> List[str]:
+    if not path:
+        return list(DEFAULT_PREFIXES)
+    with open(path, 'r', encoding='utf-8') as f:
+        return [line.rstrip('\n') for line in f]
+
+
+# ---------------------------------------------------------------------------
+# Request execution
+# ---------------------------------------------------------------------------
+
+async def send_one(client: httpx.AsyncClient, rng: random.Random, config: LoadConfig) -> RequestResult:
+    kind = rng.choices(list(config.mix), weights=list(config.mix.values()))[0]
+    params = {
+        "prefix": rng.choice(config.prefixes),
+        "max_length": rng.choice(config.lengths),
+        "temperature": rng.choice(config.temperatures),
+    }
+    start = time.perf_counter()
+    ttfc = None
+    try:
+        if kind == "stream":
+            async with client.stream("GET", "/stream", params=params) as response:
+                response.raise_for_status()
+                event = None
+                async for line in response.aiter_lines():
+                    if ttfc is None and line.startswith("data:"):
+                        ttfc = time.perf_counter() - start
+                    if line.startswith("event:"):
+                        event = line[len("event:"):].strip()
+                        if event == "error":
+                            raise RuntimeError("server reported a stream error")
+                if event != "done":
+                    raise RuntimeError("stream ended without a done event")
+        else:
+            if kind == "generate_post":
+                response = await client.post("/generate", json=params)
+            else:
+                response = await client.get("/generate", params=params)
+            response.raise_for_status()
+            if not response.json().get("success", False):
+                raise RuntimeError(response.json().get("error", "generation failed"))
+        return RequestResult(kind, start, time.perf_counter() - start, True, ttfc)
+    except Exception as e:
+        return RequestResult(kind, start, time.perf_counter() - start, False, ttfc, f"{type(e).__name__}: {e}")
+
+
+async def run_closed_loop(client: httpx.AsyncClient, config: LoadConfig) -> None:
+    """Fixed concurrency: each worker sends its next request as soon as the last one returns."""
+    deadline = time.perf_counter() + config.duration if config.duration else None
+    remaining = [config.requests] if config.requests else None
+
+    async def worker(worker_id: int):
+        rng = random.Random(config.seed * 1000 + worker_id)
+        while True:
+            if deadline and time.perf_counter() >= deadline:
+                return
+            if remaining is not None:
+                if remaining[0] <= 0:
+                    return
+                remaining[0] -= 1
+            config.results.append(await send_one(client, rng, config))
+
+    await asyncio.gather(*(worker(i) for i in range(config.concurrency)))
+
+
+async def run_open_loop(client: httpx.AsyncClient, config: LoadConfig) -> None:
+    """Fixed arrival rate: requests start on a Poisson schedule regardless of completions."""
+    rng = random.Random(config.seed)
+    deadline = time.perf_counter() + config.duration if config.duration else None
+    tasks = []
+
+    async def fire(task_rng: random.Random):
+        config.results.append(await send_one(client, task_rng, config))
+
+    while True:
+        if deadline and time.perf_counter() >= deadline:
+            break
+        if config.requests and len(tasks) >= config.requests:
+            break
+        tasks.append(asyncio.create_task(fire(random.Random(rng.random()))))
+        await asyncio.sleep(rng.expovariate(config.rate))
+    await asyncio.gather(*tasks)
+
+
+def make_client(url: Optional[str], timeout: float, concurrency: int) -> httpx.AsyncClient:
+    if url:
+        limits = httpx.Limits(max_connections=max(concurrency, 10), max_keepalive_connections=max(concurrency, 10))
+        return httpx.AsyncClient(base_url=url, timeout=timeout, limits=limits)
+
+    sys.path.insert(0, ROOT)
+    with contextlib.redirect_stdout(io.StringIO()):
+        from backend.asgi import app
+    return httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://loadgen", timeout=timeout)
+
+
+async def run_load(url: Optional[str], config: LoadConfig) -> float:
+    """Run the configured load and return the wall-clock duration in seconds."""
+    async with make_client(url, config.timeout, config.concurrency) as client:
+        start = time.perf_counter()
+        if config.rate:
+            await run_open_loop(client, config)
+        else:
+            await run_closed_loop(client, config)
+        return time.perf_counter() - start
+
+
+# ---------------------------------------------------------------------------
+# Reporting
+# ---------------------------------------------------------------------------
+
+def summarize(results: List[RequestResult], elapsed: float) -> dict:
+    def stats(subset: List[RequestResult]) -> dict:
+        ok = [r for r in subset if r.ok]
+        latencies = [r.latency * 1000 for r in ok]
+        ttfcs = [r.ttfc * 1000 for r in ok if r.ttfc is not None]
+        summary = {
+            "requests": len(subset),
+            "errors": len(subset) - len(ok),
+            "error_rate": (len(subset) - len(ok)) / len(subset) if subset else 0.0,
+            "throughput_rps": len(ok) / elapsed if elapsed > 0 else 0.0,
+            "latency_ms": {
+                "mean": statistics.mean(latencies) if latencies else None,
+                "p50": percentile(latencies, 50),
+                "p95": percentile(latencies, 95),
+                "p99": percentile(latencies, 99),
+            },
+        }
+        if ttfcs:
+            summary["ttfc_ms"] = {
+                "p50": percentile(ttfcs, 50),
+                "p95": percentile(ttfcs, 95),
+                "p99": percentile(ttfcs, 99),
+            }
+        return summary
+
+    errors = {}
+    for r in results:
+        if not r.ok:
+            errors[r.error] = errors.get(r.error, 0) + 1
+
+    return {
+        "elapsed_s": elapsed,
+        "overall": stats(results),
+        "by_kind": {kind: stats([r for r in results if r.kind == kind])
+                    for kind in REQUEST_KINDS if any(r.kind == kind for r in results)},
+        "errors": errors,
+    }
+
+
+def print_summary(report: dict) -> None:
+    def fmt(value):
+        return "-" if value is None else f"{value:.1f}"
+
+    print(f"Elapsed: {report['elapsed_s']:.2f}s")
+    header = f"{'kind':<15} {'reqs':>6} {'err%':>6} {'rps':>8} {'p50ms':>9} {'p95ms':>9} {'p99ms':>9} {'ttfc50':>8} {'ttfc95':>8}"
+    print(header)
+    print("-" * len(header))
+    rows = list(report["by_kind"].items()) + [("overall", report["overall"])]
+    for name, s in rows:
+        ttfc = s.get("ttfc_ms", {})
+        print(f"{name:<15} {s['requests']:>6} {s['error_rate'] * 100:>5.1f}% {s['throughput_rps']:>8.2f} "
+              f"{fmt(s['latency_ms']['p50']):>9} {fmt(s['latency_ms']['p95']):>9} {fmt(s['latency_ms']['p99']):>9} "
+              f"{fmt(ttfc.get('p50')):>8} {fmt(ttfc.get('p95')):>8}")
+    for error, count in report["errors"].items():
+        print(f"  {count} x {error}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load generator for the Urdu Story Generator service")
+    parser.add_argument("--url", help="Base URL of a running server (default: in-process backend.asgi:app)")
+    parser.add_argument("--mix", default=DEFAULT_MIX, help=f"Request mix (default: {DEFAULT_MIX})")
+    parser.add_argument("--prefixes", help="File with one prefix per line")
+    parser.add_argument("--lengths", default="50,100,200", help="Comma-separated max_length values")
+    parser.add_argument("--temperatures", default="0.5,0.8,1.2", help="Comma-separated temperatures")
+    mode = parser.add_mutually_exclusive_group()
+    mode.add_argument("--concurrency", type=int, default=4, help="Concurrent clients (closed loop)")
+    mode.add_argument("--rate", type=float, help="Arrival rate in requests/s (open loop)")
+    parser.add_argument("--requests", type=int, help="Total requests to send")
+    parser.add_argument("--duration", type=float, help="Run for this many seconds")
+    parser.add_argument("--timeout", type=float, default=120.0)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="Write the JSON report to this path")
+    args = parser.parse_args()
+
+    if not args.requests and not args.duration:
+        args.requests = 100
+
+    try:
+        config = LoadConfig(
+            mix=parse_mix(args.mix),
+            prefixes=load_prefixes(args.prefixes),
+            lengths=[int(x) for x in args.lengths.split(',') if x.strip()],
+            temperatures=[float(x) for x in args.temperatures.split(',') if x.strip()],
+            concurrency=args.concurrency,
+            rate=args.rate,
+            requests=args.requests,
+            duration=args.duration,
+            timeout=args.timeout,
+            seed=args.seed,
+        )
+    except ValueError as e:
+        parser.error(str(e))
+
+    elapsed = asyncio.run(run_load(args.url, config))
+    report = summarize(config.results, elapsed)
+    report["config"] = {
+        "target": args.url or "in-process",
+        "mix": config.mix,
+        "concurrency": None if args.rate else args.concurrency,
+        "rate": args.rate,
+        "lengths": config.lengths,
+        "temperatures": config.temperatures,
+    }
+    print_summary(report)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2, ensure_ascii=False)
+        print(f"Wrote report to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
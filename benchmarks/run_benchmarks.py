@@ -0,0 +1,331 @@
+"""
+Benchmark suite for the Urdu Story Generator.
+Runs offline against the checked-in corpus and model and writes the results
+to JSON, so that changes to the tokenizer, trainer or sampler can be compared
+against a stored baseline.
+
+Usage:
+    # Run all benchmarks and write results
+    python benchmarks/run_benchmarks.py run --output benchmarks/results.json
+
+    # Run a subset on fewer documents
+    python benchmarks/run_benchmarks.py run --only tokenize,sampling --docs 20
+
+    # Compare against the stored baseline (exit code 1 on regression)
+    python benchmarks/run_benchmarks.py compare benchmarks/baseline.json benchmarks/results.json
+"""
+
+import os
+import io
+import sys
+import json
+import time
+import random
+import argparse
+import platform
+import tracemalloc
+import contextlib
+import statistics
+from typing import Callable, Dict, List, Optional
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.insert(0, os.path.join(ROOT, 'models'))
+sys.path.insert(0, os.path.join(ROOT, 'Tokenization'))
+sys.path.insert(0, os.path.join(ROOT, 'backend'))
+
+from trigram_model import (  # noqa: E402
+    BPETokenizer, TrigramLanguageModel, StoryGeneratorAPI, START_TOKEN,
+)
+
+DATA_DIR = os.path.join(ROOT, 'PreProcessing', 'Preprocessed_documents')
+MODEL_PATH = os.path.join(ROOT, 'models', 'trigram_model.pkl')
+
+# Relative change above which a metric counts as a regression
+DEFAULT_THRESHOLD = 0.15
+# Run parameters that must match for two result files to be comparable
+COMPARABLE_META = ("docs", "repeat", "samples", "requests", "max_length", "vocab_size")
+SAMPLING_TEMPERATURES = (0.5, 0.8, 1.2)
+
+
+# ---------------------------------------------------------------------------
+# Helpers
+# ---------------------------------------------------------------------------
+
+def load_corpus(limit: int = None) -> List[str]:
+    """Read the preprocessed documents in a stable order."""
+    files = sorted(f for f in os.listdir(DATA_DIR) if f.endswith('.txt'))
+    if limit:
+        files = files[:limit]
+    corpus = []
+    for fname in files:
+        with open(os.path.join(DATA_DIR, fname), 'r', encoding='utf-8') as f:
+            text = f.read().strip()
+            if text:
+                corpus.append(text)
+    return corpus
+
+
+def timed(fn: Callable, repeat: int = 1) -> List[float]:
+    """Call fn `repeat` times and return the wall-clock durations in seconds."""
+    durations = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        durations.append(time.perf_counter() - start)
+    return durations
+
+
+def percentile(values: List[float], pct: float) -> Optional[float]:
+    """Nearest-rank percentile; None for an empty list."""
+    if not values:
+        return None
+    ordered = sorted(values)
+    idx = min(len(ordered) - 1, int(round(pct / 100.0 * (len(ordered) - 1))))
+    return ordered[idx]
+
+
+def metric(value: float, unit: str, better: str = "lower") -> dict:
+    return {"value": value, "unit": unit, "better": better}
+
+
+# ---------------------------------------------------------------------------
+# Benchmarks
+# ---------------------------------------------------------------------------
+# Each benchmark takes the shared context dict and returns {name: metric}.
+
+def bench_tokenize(ctx: dict) -> Dict[str, dict]:
+    tokenizer = BPETokenizer()
+    corpus = ctx['corpus']
+    n_chars = sum(len(doc) for doc in corpus)
+    n_tokens = 0
+
+    def run():
+        nonlocal n_tokens
+        n_tokens = sum(len(tokenizer.tokenize(doc)) for doc in corpus)
+
+    best = min(timed(run, ctx['repeat']))
+    return {
+        "tokenize.tokens_per_sec": metric(n_tokens / best, "tokens/s", "higher"),
+        "tokenize.chars_per_sec": metric(n_chars / best, "chars/s", "higher"),
+    }
+
+
+def bench_train_bpe(ctx: dict) -> Dict[str, dict]:
+    import BPE
+    corpus = ctx['corpus']
+
+    def run():
+        with contextlib.redirect_stdout(io.StringIO()):
+            BPE.train_bpe(ctx['vocab_size'], corpus=corpus)
+
+    return {"train_bpe.seconds": metric(min(timed(run, 1)), "s")}
+
+
+def bench_train_trigram(ctx: dict) -> Dict[str, dict]:
+    tokenizer = BPETokenizer()
+    corpus = ctx['corpus']
+
+    def run():
+        TrigramLanguageModel().train(corpus, tokenizer)
+
+    return {"train_trigram.seconds": metric(min(timed(run, ctx['repeat'])), "s")}
+
+
+def bench_model_load(ctx: dict) -> Dict[str, dict]:
+    durations = timed(lambda: StoryGeneratorAPI(model_path=MODEL_PATH), ctx['repeat'])
+    tracemalloc.start()
+    StoryGeneratorAPI(model_path=MODEL_PATH)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return {
+        "model_load.seconds": metric(min(durations), "s"),
+        "model_load.peak_mb": metric(peak / (1024 * 1024), "MB"),
+    }
+
+
+def bench_sampling(ctx: dict) -> Dict[str, dict]:
+    model = ctx['api'].model
+    rng = random.Random(0)
+    # Real contexts drawn from the trained trigram table
+    contexts = rng.sample(sorted(model.trigram_counts.keys()), min(200, len(model.trigram_counts)))
+    contexts.append((START_TOKEN, START_TOKEN))
+
+    results = {}
+    for temperature in SAMPLING_TEMPERATURES:
+        random.seed(42)
+        latencies = []
+        for _ in range(ctx['samples']):
+            context = rng.choice(contexts)
+            start = time.perf_counter()
+            model.sample_next_token(context, temperature)
+            latencies.append((time.perf_counter() - start) * 1e6)
+        key = f"sampling.t{temperature:g}"
+        results[f"{key}.p50_us"] = metric(statistics.median(latencies), "us")
+        results[f"{key}.p95_us"] = metric(percentile(latencies, 95), "us")
+    return results
+
+
+def bench_http_generate(ctx: dict) -> Dict[str, dict]:
+    from fastapi.testclient import TestClient
+    with contextlib.redirect_stdout(io.StringIO()):
+        from app import app
+    client = TestClient(app)
+    payload = {"prefix": "ایک دن", "max_length": ctx['max_length'], "temperature": 0.8}
+
+    random.seed(42)
+    latencies = []
+    for _ in range(ctx['requests']):
+        start = time.perf_counter()
+        response = client.post("/generate", json=payload)
+        latencies.append((time.perf_counter() - start) * 1000)
+        response.raise_for_status()
+    return {
+        "http_generate.p50_ms": metric(statistics.median(latencies), "ms"),
+        "http_generate.p95_ms": metric(percentile(latencies, 95), "ms"),
+    }
+
+
+BENCHMARKS = {
+    "tokenize": bench_tokenize,
+    "train_bpe": bench_train_bpe,
+    "train_trigram": bench_train_trigram,
+    "model_load": bench_model_load,
+    "sampling": bench_sampling,
+    "http_generate": bench_http_generate,
+}
+
+
+# ---------------------------------------------------------------------------
+# Run / compare
+# ---------------------------------------------------------------------------
+
+def run_benchmarks(names: List[str], docs: int, repeat: int, samples: int,
+                   requests: int, max_length: int, vocab_size: int) -> dict:
+    ctx = {
+        'corpus': load_corpus(docs),
+        'repeat': repeat,
+        'samples': samples,
+        'requests': requests,
+        'max_length': max_length,
+        'vocab_size': vocab_size,
+    }
+    if 'sampling' in names:
+        ctx['api'] = StoryGeneratorAPI(model_path=MODEL_PATH)
+
+    results = {}
+    for name in names:
+        print(f"Running {name}...")
+        start = time.perf_counter()
+        results.update(BENCHMARKS[name](ctx))
+        print(f"  done in {time.perf_counter() - start:.2f}s")
+
+    return {
+        "meta": {
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "docs": len(ctx['corpus']),
+            "repeat": repeat,
+            "samples": samples,
+            "requests": requests,
+            "max_length": max_length,
+            "vocab_size": vocab_size,
+        },
+        "results": results,
+    }
+
+
+def meta_mismatches(baseline: dict, current: dict) -> List[str]:
+    """Run parameters that differ between two result files, as "name: baseline != current"."""
+    base_meta, cur_meta = baseline.get("meta", {}), current.get("meta", {})
+    return [f"{key}: {base_meta.get(key)} != {cur_meta.get(key)}"
+            for key in COMPARABLE_META if base_meta.get(key) != cur_meta.get(key)]
+
+
+def compare_results(baseline: dict, current: dict, threshold: float = DEFAULT_THRESHOLD) -> List[dict]:
+    """
+    Compare two result files metric by metric.
+    Returns one row per shared metric; rows whose relative change is worse
+    than `threshold` in the metric's "better" direction are marked regressed.
+    """
+    rows = []
+    base_results = baseline.get("results", {})
+    for name, cur in sorted(current.get("results", {}).items()):
+        base = base_results.get(name)
+        if base is None or not base["value"]:
+            continue
+        change = (cur["value"] - base["value"]) / base["value"]
+        worse = change if cur.get("better", "lower") == "lower" else -change
+        rows.append({
+            "metric": name,
+            "baseline": base["value"],
+            "current": cur["value"],
+            "unit": cur["unit"],
+            "change": change,
+            "regressed": worse > threshold,
+        })
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Urdu Story Generator benchmarks")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    run_p = sub.add_parser("run", help="Run benchmarks and write JSON results")
+    run_p.add_argument("--output", default=os.path.join(ROOT, 'benchmarks', 'results.json'))
+    run_p.add_argument("--only", default=",".join(BENCHMARKS), help="Comma-separated benchmark names")
+    run_p.add_argument("--docs", type=int, default=100, help="Number of corpus documents to use (0 = all)")
+    run_p.add_argument("--repeat", type=int, default=3)
+    run_p.add_argument("--samples", type=int, default=300, help="Sampling calls per temperature")
+    run_p.add_argument("--requests", type=int, default=20, help="HTTP requests for /generate")
+    run_p.add_argument("--max-length", type=int, default=100)
+    run_p.add_argument("--vocab-size", type=int, default=250)
+
+    cmp_p = sub.add_parser("compare", help="Compare results against a baseline")
+    cmp_p.add_argument("baseline")
+    cmp_p.add_argument("current")
+    cmp_p.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD)
+    cmp_p.add_argument("--allow-mismatch", action="store_true",
+                       help="Compare even if the runs used different parameters")
+
+    args = parser.parse_args()
+
+    if args.command == "run":
+        names = [n.strip() for n in args.only.split(",") if n.strip()]
+        unknown = [n for n in names if n not in BENCHMARKS]
+        if unknown:
+            parser.error(f"unknown benchmarks: {', '.join(unknown)}")
+        report = run_benchmarks(names, args.docs or None, args.repeat, args.samples,
+                                args.requests, args.max_length, args.vocab_size)
+        os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2)
+        print(f"Wrote {len(report['results'])} metrics to {args.output}")
+        return
+
+    with open(args.baseline, 'r', encoding='utf-8') as f:
+        baseline = json.load(f)
+    with open(args.current, 'r', encoding='utf-8') as f:
+        current = json.load(f)
+    mismatches = meta_mismatches(baseline, current)
+    if mismatches:
+        print("Runs used different parameters:")
+        for mismatch in mismatches:
+            print(f"  {mismatch}")
+        if not args.allow_mismatch:
+            print("Refusing to compare; rerun with matching parameters or pass --allow-mismatch")
+            sys.exit(2)
+        print("Comparing anyway (--allow-mismatch)\n")
+    rows = compare_results(baseline, current, args.threshold)
+    for row in rows:
+        flag = "REGRESSION" if row["regressed"] else "ok"
+        print(f"{row['metric']:<32} {row['baseline']:>14.3f} -> {row['current']:>14.3f} "
+              f"{row['unit']:<9} {row['change']:+8.1%}  {flag}")
+    regressions = [r for r in rows if r["regressed"]]
+    print(f"\n{len(regressions)} regression(s) out of {len(rows)} metrics "
+          f"(threshold {args.threshold:.0%})")
+    sys.exit(1 if regressions else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,268 @@
+"""
+Offline bulk story generation.
+Fans generation out over a process pool (each worker loads the model once),
+writes results in input order to JSONL or Parquet with bounded memory, and
+resumes after an interruption from the last completed story.
+
+Every story is generated with its own seed, so the output is the same no
+matter how many workers are used.
+
+Usage:
+    # 10,000 stories with seeds 0..9999 and no prefix
+    python models/bulk_generate.py --count 10000 --output stories.jsonl
+
+    # One story per prompt line, seeds starting at 500
+    python models/bulk_generate.py --prompts prompts.txt --seed-start 500 --output stories.jsonl
+
+    # Parquet output (a directory of part files; needs pyarrow)
+    python models/bulk_generate.py --count 10000 --format parquet --output stories_parquet/
+
+Re-running the same command continues after the last story already written.
+"""
+
+import os
+import sys
+import json
+import time
+import random
+import argparse
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from typing import Iterator, List, Optional, Tuple
+
+BASE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, BASE)
+
+from trigram_model import StoryGeneratorAPI  # noqa: E402
+
+DEFAULT_MODEL = os.path.join(BASE, "trigram_model.pkl")
+
+# (index, seed, prefix)
+Job = Tuple[int, int, str]
+
+
+# ============================================
+# WORKER
+# ============================================
+
+_worker_api = None
+
+
+def _init_worker(model_path: str, shared: bool) -> None:
+    global _worker_api
+    _worker_api = StoryGeneratorAPI(model_path=model_path, shared=shared)
+
+
+def generate_one(job: Job, max_length: int, temperature: float) -> dict:
+    index, seed, prefix = job
+    generator = _worker_api.generator
+    start = time.perf_counter()
+    random.seed(seed)
+    prefix_tokens = generator._prefix_tokens(prefix)
+    generated = list(generator.sample_tokens(prefix_tokens, max_length, temperature))
+    return {
+        "index": index,
+        "seed": seed,
+        "prefix": prefix,
+        "story": generator.render(prefix_tokens + generated),
+        "tokens": len(generated),
+        "seconds": round(time.perf_counter() - start, 4),
+    }
+
+
+def _generate_job(args) -> dict:
+    return generate_one(*args)
+
+
+# ============================================
+# JOBS AND WRITERS
+# ============================================
+
+def make_jobs(prompts: Optional[List[str]], count: int, seed_start: int, prefix: str) -> List[Job]:
+    if prompts is not None:
+        return [(i, seed_start + i, p) for i, p in enumerate(prompts)]
+    return [(i, seed_start + i, prefix) for i in range(count)]
+
+
+class JsonlWriter:
+    def __init__(self, path: str, resume: bool):
+        self.path = path
+        self.completed = 0
+        if resume and os.path.exists(path):
+            self.completed = self._recover()
+        self.f = open(path, "a" if resume else "w", encoding="utf-8")
+
+    def _recover(self) -> int:
+        """Count complete lines and cut off a partially written last line."""
+        completed, good_bytes = 0, 0
+        with open(self.path, "rb") as f:
+            for line in f:
+                if not line.endswith(b"\n"):
+                    break
+                try:
+                    json.loads(line)
+                except ValueError:
+                    break
+                completed += 1
+                good_bytes += len(line)
+        with open(self.path, "r+b") as f:
+            f.truncate(good_bytes)
+        return completed
+
+    def write(self, record: dict) -> None:
+        self.f.write(json.dumps(record, ensure_ascii=False) + "\n")
+
+    def flush(self) -> None:
+        self.f.flush()
+
+    def close(self) -> None:
+        self.f.close()
+
+
+class ParquetWriter:
+    """Writes a directory of numbered part files, each holding `rows_per_part` stories."""
+
+    def __init__(self, path: str, resume: bool, rows_per_part: int = 1000):
+        try:
+            import pyarrow  # noqa: F401
+            import pyarrow.parquet  # noqa: F401
+        except ImportError:
+            raise SystemExit("Parquet output needs pyarrow: pip install pyarrow")
+        import pyarrow.parquet as pq
+
+        self.path = path
+        self.rows_per_part = rows_per_part
+        self.buffer = []
+        os.makedirs(path, exist_ok=True)
+        parts = sorted(f for f in os.listdir(path) if f.startswith("part-") and f.endswith(".parquet"))
+        if not resume:
+            for part in parts:
+                os.remove(os.path.join(path, part))
+            parts = []
+        self.part = len(parts)
+        self.completed = sum(pq.ParquetFile(os.path.join(path, p)).metadata.num_rows for p in parts)
+
+    def write(self, record: dict) -> None:
+        self.buffer.append(record)
+        if len(self.buffer) >= self.rows_per_part:
+            self.flush()
+
+    def flush(self) -> None:
+        if not self.buffer:
+            return
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+        table = pa.Table.from_pylist(self.buffer)
+        final = os.path.join(self.path, f"part-{self.part:05d}.parquet")
+        tmp = final + ".tmp"
+        pq.write_table(table, tmp)
+        os.replace(tmp, final)
+        self.part += 1
+        self.buffer = []
+
+    def close(self) -> None:
+        self.flush()
+
+
+# ============================================
+# DRIVER
+# ============================================
+
+def ordered_results(jobs: List[Job], workers: int, model_path: str, shared: bool,
+                    max_length: int, temperature: float) -> Iterator[dict]:
+    """
+    Yield results in job order while keeping at most `workers * 4` jobs in
+    flight, so memory stays bounded however many stories are requested.
+    """
+    if workers == 1:
+        _init_worker(model_path, shared)
+        for job in jobs:
+            yield generate_one(job, max_length, temperature)
+        return
+
+    window = workers * 4
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                             initargs=(model_path, shared)) as pool:
+        pending = deque()
+        job_iter = iter(jobs)
+        for job in job_iter:
+            pending.append(pool.submit(_generate_job, (job, max_length, temperature)))
+            if len(pending) >= window:
+                break
+        while pending:
+            yield pending.popleft().result()
+            job = next(job_iter, None)
+            if job is not None:
+                pending.append(pool.submit(_generate_job, (job, max_length, temperature)))
+
+
+def run(jobs: List[Job], writer, workers: int, model_path: str, shared: bool,
+        max_length: int, temperature: float, report_every: int = 100) -> dict:
+    remaining = jobs[writer.completed:]
+    if writer.completed:
+        print(f"Resuming after {writer.completed} completed stories")
+
+    start = time.perf_counter()
+    stories = tokens = 0
+    try:
+        for record in ordered_results(remaining, workers, model_path, shared, max_length, temperature):
+            writer.write(record)
+            stories += 1
+            tokens += record["tokens"]
+            if stories % report_every == 0:
+                writer.flush()
+                elapsed = time.perf_counter() - start
+                print(f"{writer.completed + stories}/{len(jobs)} stories | "
+                      f"{stories / elapsed:.1f} stories/s | {tokens / elapsed:.0f} tokens/s")
+    finally:
+        writer.close()
+
+    elapsed = time.perf_counter() - start
+    return {
+        "stories": stories,
+        "tokens": tokens,
+        "seconds": elapsed,
+        "stories_per_sec": stories / elapsed if elapsed > 0 else 0.0,
+        "tokens_per_sec": tokens / elapsed if elapsed > 0 else 0.0,
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Generate many stories offline")
+    source = parser.add_mutually_exclusive_group(required=True)
+    source.add_argument("--prompts", help="File with one prefix per line")
+    source.add_argument("--count", type=int, help="Number of stories to generate")
+    parser.add_argument("--prefix", default="", help="Prefix used with --count")
+    parser.add_argument("--seed-start", type=int, default=0, help="Seed of the first story")
+    parser.add_argument("--output", required=True)
+    parser.add_argument("--format", choices=("jsonl", "parquet"), default="jsonl")
+    parser.add_argument("--parquet-rows", type=int, default=1000, help="Stories per Parquet part file")
+    parser.add_argument("--model", default=DEFAULT_MODEL)
+    parser.add_argument("--no-shared", action="store_true",
+                        help="Unpickle the model in every worker instead of sharing a memory-mapped copy")
+    parser.add_argument("--max-length", type=int, default=500)
+    parser.add_argument("--temperature", type=float, default=0.8)
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--no-resume", action="store_true", help="Overwrite existing output")
+    args = parser.parse_args(argv)
+
+    prompts = None
+    if args.prompts:
+        with open(args.prompts, "r", encoding="utf-8") as f:
+            prompts = [line.rstrip("\n") for line in f]
+    jobs = make_jobs(prompts, args.count or 0, args.seed_start, args.prefix)
+
+    resume = not args.no_resume
+    if args.format == "parquet":
+        writer = ParquetWriter(args.output, resume, args.parquet_rows)
+    else:
+        writer = JsonlWriter(args.output, resume)
+
+    summary = run(jobs, writer, args.workers, args.model, not args.no_shared,
+                  args.max_length, args.temperature)
+    print(f"Generated {summary['stories']} stories ({summary['tokens']} tokens) in {summary['seconds']:.1f}s: "
+          f"{summary['stories_per_sec']:.2f} stories/s, {summary['tokens_per_sec']:.0f} tokens/s")
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
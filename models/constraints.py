@@ -0,0 +1,197 @@
+"""
+Per-request sampling constraints for story generation.
+
+A request may ban individual BPE tokens, ban whole words and boost tokens.
+TokenConstraints compiles all of this once per request into a single factor
+vector over the model's vocabulary (0 bans a token, exp(boost) scales it),
+which the sampler multiplies into the next-token weights in one vectorized
+step.
+
+Banned words can span several tokens and be spelled by different token
+splits, so they are matched on the generated text: an Aho-Corasick automaton
+runs over the characters of the sampled tokens, and for each automaton state
+the tokens that would complete a banned word are found once and cached. Every
+step then costs one table lookup, plus a masked copy of the factor vector only
+in the (rare) states where some token is blocked.
+
+Usage:
+    from constraints import TokenConstraints
+
+    constraints = TokenConstraints(model.vocab, model.token_to_id,
+                                   banned_tokens=["ری"], banned_words=["بری بات"],
+                                   boosts={"▁بادشاہ": 1.5})
+    story = generator.generate("ایک دن", constraints=constraints)
+"""
+
+import math
+import unicodedata
+from collections import deque
+from functools import lru_cache
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+from trigram_model import EOS_TOKEN, EOP_TOKEN, EOT_TOKEN, START_TOKEN
+
+# Boosts are clipped to this magnitude so exp(boost) stays finite
+MAX_BOOST = 50.0
+
+
+def match_text(token: str) -> str:
+    """Text a token adds to the story, with every non-letter turned into a space."""
+    if token in (EOS_TOKEN, EOP_TOKEN, EOT_TOKEN):
+        return ' '
+    if token == START_TOKEN:
+        return ''
+    if token.startswith('▁'):
+        token = ' ' + token[1:]
+    return ''.join(c if unicodedata.category(c)[0] in 'LMN' else ' ' for c in token)
+
+
+def word_pattern(word: str) -> str:
+    """Banned word as matched on the story text: whole words, surrounded by spaces."""
+    return ' ' + ' '.join(match_text(word).split()) + ' '
+
+
+# ============================================
+# WORD AUTOMATON
+# ============================================
+
+class WordAutomaton:
+    """
+    Aho-Corasick automaton over characters, with a lazily built table per
+    state of where each vocabulary token leads and whether it completes a
+    banned word on the way.
+    """
+
+    def __init__(self, token_texts: Tuple[str, ...], patterns: Tuple[str, ...]):
+        self.token_texts = token_texts
+        self.goto: List[Dict[str, int]] = [{}]
+        self.fail = [0]
+        self.match = [False]
+        for pattern in patterns:
+            state = 0
+            for ch in pattern:
+                if ch not in self.goto[state]:
+                    self.goto.append({})
+                    self.fail.append(0)
+                    self.match.append(False)
+                    self.goto[state][ch] = len(self.goto) - 1
+                state = self.goto[state][ch]
+            self.match[state] = True
+
+        queue = deque(self.goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for ch, child in self.goto[state].items():
+                queue.append(child)
+                fallback = self.fail[state]
+                while fallback and ch not in self.goto[fallback]:
+                    fallback = self.fail[fallback]
+                self.fail[child] = self.goto[fallback].get(ch, 0) if state else 0
+                self.match[child] = self.match[child] or self.match[self.fail[child]]
+
+        self._tables: Dict[int, Tuple[np.ndarray, np.ndarray, np.ndarray]] = {}
+
+    def step(self, state: int, ch: str) -> int:
+        while state and ch not in self.goto[state]:
+            state = self.fail[state]
+        return self.goto[state].get(ch, 0)
+
+    def feed(self, state: int, text: str) -> Tuple[int, bool]:
+        """State after `text`, and whether a banned word was completed inside it."""
+        hit = False
+        for ch in text:
+            state = self.step(state, ch)
+            hit = hit or self.match[state]
+        return state, hit
+
+    def table(self, state: int) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """
+        (next state, blocked, blocked if the story ends right after) for every
+        token from `state`; a word at the very end has no following space, so
+        the last case also checks the token's text followed by one.
+        """
+        if state not in self._tables:
+            size = len(self.token_texts)
+            next_state = np.zeros(size, dtype=np.int32)
+            blocked = np.zeros(size, dtype=bool)
+            blocked_at_end = np.zeros(size, dtype=bool)
+            for tid, text in enumerate(self.token_texts):
+                next_state[tid], blocked[tid] = self.feed(state, text)
+                blocked_at_end[tid] = blocked[tid] or self.feed(int(next_state[tid]), ' ')[1]
+            self._tables[state] = (next_state, blocked, blocked_at_end)
+        return self._tables[state]
+
+
+@lru_cache(maxsize=32)
+def compile_automaton(token_texts: Tuple[str, ...], patterns: Tuple[str, ...]) -> WordAutomaton:
+    """Automata are shared between requests banning the same words, so their tables are built once."""
+    return WordAutomaton(token_texts, patterns)
+
+
+# ============================================
+# CONSTRAINTS
+# ============================================
+
+class TokenConstraints:
+    """
+    Banned tokens, banned words and boosts compiled against one vocabulary.
+    Boosts are clipped to +-MAX_BOOST; non-finite boosts raise ValueError.
+    """
+
+    def __init__(self, vocab: List[str], token_to_id: Dict[str, int],
+                 banned_tokens: Iterable[str] = (), banned_words: Iterable[str] = (),
+                 boosts: Optional[Dict[str, float]] = None):
+        self.token_to_id = token_to_id
+        self.factors = np.ones(len(vocab), dtype=np.float64)
+        for token, boost in (boosts or {}).items():
+            if not math.isfinite(boost):
+                raise ValueError(f"boost for {token!r} must be a finite number")
+            if token in token_to_id:
+                self.factors[token_to_id[token]] *= math.exp(min(max(boost, -MAX_BOOST), MAX_BOOST))
+        for token in banned_tokens:
+            if token in token_to_id:
+                self.factors[token_to_id[token]] = 0.0
+
+        patterns = tuple(sorted({word_pattern(w) for w in banned_words if w.strip()}))
+        self.automaton = compile_automaton(tuple(match_text(t) for t in vocab), patterns) if patterns else None
+
+    def start(self, prefix_tokens: Iterable[str] = ()) -> "ConstraintState":
+        """Per-story state, advanced past the prefix so words spanning it are caught."""
+        state = ConstraintState(self)
+        for token in prefix_tokens:
+            state.advance(token)
+        return state
+
+
+class ConstraintState:
+    """Tracks the automaton through one generated story."""
+
+    def __init__(self, constraints: TokenConstraints):
+        self.constraints = constraints
+        self.automaton = constraints.automaton
+        # Every story starts at a word boundary
+        self.state = self.automaton.step(0, ' ') if self.automaton else 0
+
+    def mask(self, final: bool = False) -> np.ndarray:
+        """Factor vector for the next step; `final` when the story ends after this token."""
+        factors = self.constraints.factors
+        if self.automaton is None:
+            return factors
+        _, blocked, blocked_at_end = self.automaton.table(self.state)
+        blocked = blocked_at_end if final else blocked
+        if not blocked.any():
+            return factors
+        masked = factors.copy()
+        masked[blocked] = 0.0
+        return masked
+
+    def advance(self, token: str) -> None:
+        if self.automaton is None:
+            return
+        tid = self.constraints.token_to_id.get(token)
+        if tid is None:
+            self.state = self.automaton.feed(self.state, match_text(token))[0]
+        else:
+            self.state = int(self.automaton.table(self.state)[0][tid])
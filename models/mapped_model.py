@@ -0,0 +1,249 @@
+"""
+Memory-mapped Trigram Language Model for multi-worker serving.
+
+The count tables of a trained TrigramLanguageModel are exported once into flat
+numpy arrays (CSR layout: per-context row pointers, next-token ids and counts)
+in a directory next to the pickle. Every worker process then opens those files
+read-only with mmap, so the operating system keeps a single copy of the pages
+in its page cache no matter how many uvicorn/gunicorn workers attach, and no
+Python objects (and therefore no refcount writes) exist per n-gram.
+
+Usage:
+    from mapped_model import load_shared_model
+
+    # Builds models/trigram_model.mmap/ from the pickle on first use, then attaches
+    model = load_shared_model("models/trigram_model.pkl")
+    token = model.sample_next_token(("<START>", "<START>"), temperature=0.8)
+
+    # Or through the API wrapper
+    api = StoryGeneratorAPI(model_path="models/trigram_model.pkl", shared=True)
+"""
+
+import os
+import json
+import shutil
+import hashlib
+import tempfile
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from trigram_model import TrigramLanguageModel, START_TOKEN, WeightedSampler
+
+try:
+    import fcntl
+except ImportError:  # Windows: fall back to racing builders, the rename stays atomic
+    fcntl = None
+
+MAPPED_VERSION = 1
+
+ARRAYS = (
+    "unigram", "bigram_indptr", "bigram_next", "bigram_count", "bigram_ctx_count",
+    "trigram_keys", "trigram_indptr", "trigram_next", "trigram_count", "trigram_ctx_count",
+)
+
+
+def default_mapped_dir(model_path: str) -> str:
+    return os.path.splitext(model_path)[0] + ".mmap"
+
+
+def file_fingerprint(path: str) -> str:
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            h.update(block)
+    return h.hexdigest()
+
+
+# ============================================
+# EXPORT
+# ============================================
+
+def export_mapped(model: TrigramLanguageModel, out_dir: str, source: str = "") -> None:
+    """
+    Write the model's count tables as .npy arrays plus meta.json.
+    Token ids follow the sorted vocabulary; <START> gets the id after the last
+    vocabulary token since it only ever appears as context.
+    """
+    vocab = sorted(model.vocabulary)
+    token_to_id = {t: i for i, t in enumerate(vocab)}
+    start_id = len(vocab)
+    base = start_id + 1
+
+    def tid(token):
+        return start_id if token == START_TOKEN else token_to_id[token]
+
+    unigram = np.array([model.unigram_counts[t] for t in vocab], dtype=np.int64)
+
+    # Bigram rows are indexed directly by context id
+    bigram_indptr = np.zeros(base + 1, dtype=np.int64)
+    next_ids, counts = [], []
+    for ctx_id in range(base):
+        ctx = START_TOKEN if ctx_id == start_id else vocab[ctx_id]
+        # (<START>, <START>) is counted in the context total but is never sampled
+        row = [(token_to_id[t], c) for t, c in model.bigram_counts.get(ctx, {}).items() if t in token_to_id]
+        for token_id, count in sorted(row):
+            next_ids.append(token_id)
+            counts.append(count)
+        bigram_indptr[ctx_id + 1] = len(next_ids)
+    bigram_next = np.array(next_ids, dtype=np.int32)
+    bigram_count = np.array(counts, dtype=np.int32)
+    bigram_ctx_count = np.array([model.bigram_context_counts.get(START_TOKEN if i == start_id else vocab[i], 0)
+                                 for i in range(base)], dtype=np.int64)
+
+    # Trigram contexts are packed pairs, sorted so rows can be found by binary search
+    contexts = sorted(model.trigram_counts, key=lambda c: tid(c[0]) * base + tid(c[1]))
+    trigram_keys = np.array([tid(c[0]) * base + tid(c[1]) for c in contexts], dtype=np.int64)
+    trigram_indptr = np.zeros(len(contexts) + 1, dtype=np.int64)
+    next_ids, counts = [], []
+    for i, ctx in enumerate(contexts):
+        for token, count in sorted(model.trigram_counts[ctx].items(), key=lambda kv: token_to_id[kv[0]]):
+            next_ids.append(token_to_id[token])
+            counts.append(count)
+        trigram_indptr[i + 1] = len(next_ids)
+    trigram_next = np.array(next_ids, dtype=np.int32)
+    trigram_count = np.array(counts, dtype=np.int32)
+    trigram_ctx_count = np.array([model.trigram_context_counts[c] for c in contexts], dtype=np.int64)
+
+    arrays = {
+        "unigram": unigram,
+        "bigram_indptr": bigram_indptr,
+        "bigram_next": bigram_next,
+        "bigram_count": bigram_count,
+        "bigram_ctx_count": bigram_ctx_count,
+        "trigram_keys": trigram_keys,
+        "trigram_indptr": trigram_indptr,
+        "trigram_next": trigram_next,
+        "trigram_count": trigram_count,
+        "trigram_ctx_count": trigram_ctx_count,
+    }
+    os.makedirs(out_dir, exist_ok=True)
+    for name in ARRAYS:
+        np.save(os.path.join(out_dir, name + ".npy"), arrays[name])
+    meta = {
+        "version": MAPPED_VERSION,
+        "source": source,
+        "vocab": vocab,
+        "lambda1": model.lambda1,
+        "lambda2": model.lambda2,
+        "lambda3": model.lambda3,
+        "total_unigrams": model.total_unigrams,
+    }
+    with open(os.path.join(out_dir, "meta.json"), "w", encoding="utf-8") as f:
+        json.dump(meta, f, ensure_ascii=False)
+
+
+# ============================================
+# MAPPED MODEL
+# ============================================
+
+class MappedTrigramModel(WeightedSampler):
+    """
+    Read-only trigram model over memory-mapped count arrays.
+    Exposes the attributes and sampling methods the generator and API use.
+    """
+
+    def __init__(self, path: str):
+        with open(os.path.join(path, "meta.json"), "r", encoding="utf-8") as f:
+            meta = json.load(f)
+        if meta.get("version") != MAPPED_VERSION:
+            raise ValueError(f"unsupported mapped model version {meta.get('version')}")
+        self.path = path
+        self.lambda1 = meta["lambda1"]
+        self.lambda2 = meta["lambda2"]
+        self.lambda3 = meta["lambda3"]
+        self.total_unigrams = meta["total_unigrams"]
+        self.vocab: List[str] = meta["vocab"]
+        self.vocabulary = set(self.vocab)
+        self.token_to_id: Dict[str, int] = {t: i for i, t in enumerate(self.vocab)}
+        self.start_id = len(self.vocab)
+        self.base = self.start_id + 1
+        self.is_trained = True
+        self.tokenizer = None
+
+        self.arrays = {name: np.load(os.path.join(path, name + ".npy"), mmap_mode="r") for name in ARRAYS}
+        for name, array in self.arrays.items():
+            setattr(self, name, array)
+        total = self.total_unigrams or 1
+        self.unigram_probs = np.asarray(self.unigram, dtype=np.float64) / total
+
+    def _id(self, token: str) -> Optional[int]:
+        if token == START_TOKEN:
+            return self.start_id
+        return self.token_to_id.get(token)
+
+    def _trigram_row(self, a: Optional[int], b: Optional[int]) -> Optional[int]:
+        if a is None or b is None or len(self.trigram_keys) == 0:
+            return None
+        key = a * self.base + b
+        row = int(np.searchsorted(self.trigram_keys, key))
+        if row < len(self.trigram_keys) and self.trigram_keys[row] == key:
+            return row
+        return None
+
+    def next_token_weights(self, context: Tuple[str, str]) -> np.ndarray:
+        """Interpolated probability of every vocabulary token after `context`."""
+        weights = self.lambda1 * self.unigram_probs
+        a, b = self._id(context[0]), self._id(context[1])
+
+        if b is not None and self.bigram_ctx_count[b] > 0:
+            lo, hi = self.bigram_indptr[b], self.bigram_indptr[b + 1]
+            weights[self.bigram_next[lo:hi]] += self.lambda2 * self.bigram_count[lo:hi] / self.bigram_ctx_count[b]
+
+        row = self._trigram_row(a, b)
+        if row is not None:
+            lo, hi = self.trigram_indptr[row], self.trigram_indptr[row + 1]
+            weights[self.trigram_next[lo:hi]] += self.lambda3 * self.trigram_count[lo:hi] / self.trigram_ctx_count[row]
+        return weights
+
+    def get_interpolated_probability(self, context: Tuple[str, str], token: str) -> float:
+        tid = self.token_to_id.get(token)
+        if tid is None:
+            return 0.0
+        return float(self.next_token_weights(context)[tid])
+
+
+# ============================================
+# SHARED LOADING
+# ============================================
+
+def load_shared_model(model_path: str, mapped_dir: str = None) -> MappedTrigramModel:
+    """
+    Attach to the memory-mapped copy of `model_path`, exporting it first if it
+    is missing or was built from a different pickle. Only one process builds;
+    concurrent workers wait on a lock file and then attach to the result.
+    """
+    mapped_dir = mapped_dir or default_mapped_dir(model_path)
+    source = file_fingerprint(model_path)
+
+    def is_current() -> bool:
+        try:
+            with open(os.path.join(mapped_dir, "meta.json"), "r", encoding="utf-8") as f:
+                meta = json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return False
+        return meta.get("version") == MAPPED_VERSION and meta.get("source") == source
+
+    if not is_current():
+        parent = os.path.dirname(os.path.abspath(mapped_dir))
+        os.makedirs(parent, exist_ok=True)
+        with open(os.path.join(parent, os.path.basename(mapped_dir) + ".lock"), "w") as lock:
+            if fcntl:
+                fcntl.flock(lock, fcntl.LOCK_EX)
+            try:
+                if not is_current():
+                    from trigram_model import StoryGeneratorAPI
+                    model = StoryGeneratorAPI(model_path=model_path).model
+                    tmp_dir = tempfile.mkdtemp(dir=parent, prefix=".mmap-")
+                    try:
+                        export_mapped(model, tmp_dir, source)
+                        os.chmod(tmp_dir, 0o755)
+                        shutil.rmtree(mapped_dir, ignore_errors=True)
+                        os.replace(tmp_dir, mapped_dir)
+                    finally:
+                        shutil.rmtree(tmp_dir, ignore_errors=True)
+            finally:
+                if fcntl:
+                    fcntl.flock(lock, fcntl.LOCK_UN)
+
+    return MappedTrigramModel(mapped_dir)
@@ -0,0 +1,252 @@
+"""
+Memory accounting for the Urdu Story Generator model.
+Walks the model's count tables, vocabulary and tokenizer to report bytes per
+structure, entry counts and average bytes per n-gram, and can take tracemalloc
+snapshots of where memory was allocated.
+
+Usage:
+    # Report for the pickled model
+    python models/memory_report.py
+
+    # Memory-mapped serving mode, with the top allocation sites while loading
+    python models/memory_report.py --shared --tracemalloc --top 15
+
+    from memory_report import model_memory_report
+    report = model_memory_report(api.model)
+"""
+
+import os
+import sys
+import json
+import argparse
+import tracemalloc
+from typing import Optional
+
+import numpy as np
+
+# Structures reported for the dict-based model, in report order
+MODEL_STRUCTURES = (
+    "unigram_counts", "bigram_counts", "trigram_counts",
+    "bigram_context_counts", "trigram_context_counts", "vocabulary",
+)
+NGRAM_TABLES = {"unigram_counts": 1, "bigram_counts": 2, "trigram_counts": 3}
+# Sampling cache of the dict-based model (its `_index`), reported once it is built
+SAMPLING_CACHE = ("vocab", "token_to_id", "unigram_probs")
+
+# Arrays that make up each n-gram order of the memory-mapped model
+ARRAY_GROUPS = {
+    2: ("bigram_indptr", "bigram_next", "bigram_count", "bigram_ctx_count"),
+    3: ("trigram_keys", "trigram_indptr", "trigram_next", "trigram_count", "trigram_ctx_count"),
+}
+
+
+def deep_sizeof(obj, seen: Optional[set] = None) -> int:
+    """
+    Total size in bytes of obj and everything reachable from it through
+    containers, instance dicts and slots. Objects already in `seen` are not
+    counted again, so passing one set across calls deduplicates shared objects.
+    numpy arrays count their buffer only when they own it (views and
+    memory-mapped arrays contribute just their header).
+    """
+    seen = set() if seen is None else seen
+    total = 0
+    stack = [obj]
+    while stack:
+        item = stack.pop()
+        if id(item) in seen:
+            continue
+        seen.add(id(item))
+
+        total += sys.getsizeof(item)
+        if isinstance(item, np.ndarray):
+            continue
+
+        if isinstance(item, (str, bytes, bytearray, int, float, bool, type(None))):
+            continue
+        if isinstance(item, dict):
+            stack.extend(item.keys())
+            stack.extend(item.values())
+        elif isinstance(item, (list, tuple, set, frozenset)):
+            stack.extend(item)
+        else:
+            if hasattr(item, "__dict__"):
+                stack.append(item.__dict__)
+            for slot in getattr(type(item), "__slots__", ()):
+                if hasattr(item, slot):
+                    stack.append(getattr(item, slot))
+    return total
+
+
+def _entries(name: str, value) -> int:
+    if name in ("bigram_counts", "trigram_counts"):
+        return sum(len(row) for row in value.values())
+    return len(value)
+
+
+def model_memory_report(model, tokenizer=None) -> dict:
+    """
+    Bytes and entry counts per model structure.
+
+    "bytes" for each structure includes the strings it references, so token
+    strings shared between tables appear in several rows; "total_bytes" walks
+    everything once and counts each object a single time.
+    """
+    tokenizer = tokenizer if tokenizer is not None else getattr(model, "tokenizer", None)
+    structures = {}
+    shared_seen = set()
+    total = 0
+
+    if hasattr(model, "arrays"):
+        # Memory-mapped model: tables are file-backed arrays shared between processes
+        for name, array in model.arrays.items():
+            structures[name] = {
+                "bytes": int(array.nbytes),
+                "entries": int(array.size),
+                "mapped": isinstance(array, np.memmap),
+            }
+        for name in ("vocab", "vocabulary", "token_to_id", "unigram_probs"):
+            value = getattr(model, name)
+            structures[name] = {"bytes": deep_sizeof(value), "entries": len(value), "mapped": False}
+            total += deep_sizeof(value, shared_seen)
+        ngrams = {
+            1: len(model.vocab),
+            2: int(model.bigram_next.size),
+            3: int(model.trigram_next.size),
+        }
+        table_bytes = {
+            1: model.unigram.nbytes,
+            2: sum(model.arrays[n].nbytes for n in ARRAY_GROUPS[2]),
+            3: sum(model.arrays[n].nbytes for n in ARRAY_GROUPS[3]),
+        }
+    else:
+        for name in MODEL_STRUCTURES:
+            value = getattr(model, name)
+            structures[name] = {"bytes": deep_sizeof(value), "entries": _entries(name, value)}
+            total += deep_sizeof(value, shared_seen)
+        # Read the cache directly: the vocab property would build it just to report it
+        index = getattr(model, "_index", None)
+        if index is not None:
+            for name, value in zip(SAMPLING_CACHE, index[1:]):
+                structures[name] = {"bytes": deep_sizeof(value), "entries": len(value)}
+                total += deep_sizeof(value, shared_seen)
+        ngrams = {order: structures[name]["entries"] for name, order in NGRAM_TABLES.items()}
+        table_bytes = {order: structures[name]["bytes"] for name, order in NGRAM_TABLES.items()}
+
+    if tokenizer is not None:
+        for name in ("vocab", "merges"):
+            value = getattr(tokenizer, name, None)
+            if value is not None:
+                structures[f"tokenizer.{name}"] = {"bytes": deep_sizeof(value), "entries": len(value)}
+                total += deep_sizeof(value, shared_seen)
+
+    mapped_bytes = sum(s["bytes"] for s in structures.values() if s.get("mapped"))
+    return {
+        "model_class": type(model).__name__,
+        "structures": structures,
+        "total_bytes": total,
+        "mapped_bytes": mapped_bytes,
+        "ngrams": {str(order): count for order, count in ngrams.items()},
+        "avg_bytes_per_ngram": {
+            str(order): (table_bytes[order] / count if count else None) for order, count in ngrams.items()
+        },
+    }
+
+
+def tracemalloc_report(top: int = 10, start: bool = True, stop: bool = False) -> dict:
+    """
+    Snapshot of the top allocation sites. If tracing is off it is started (when
+    `start` is true), and only allocations made after that point are visible.
+    Tracing slows allocation down, so pass `stop` to end it after the snapshot.
+    """
+    if not tracemalloc.is_tracing():
+        if start:
+            tracemalloc.start()
+        return {"tracing": tracemalloc.is_tracing(), "started": tracemalloc.is_tracing(),
+                "message": "tracemalloc started; request again to see allocations since now"}
+
+    current, peak = tracemalloc.get_traced_memory()
+    stats = tracemalloc.take_snapshot().statistics("lineno")
+    if stop:
+        tracemalloc.stop()
+    return {
+        "tracing": True,
+        "started": False,
+        "current_bytes": current,
+        "peak_bytes": peak,
+        "top": [
+            {"location": f"{s.traceback[0].filename}:{s.traceback[0].lineno}", "bytes": s.size, "count": s.count}
+            for s in stats[:top]
+        ],
+    }
+
+
+def debug_endpoint_enabled() -> bool:
+    """
+    The /debug/memory endpoints are off unless DEBUG_MEMORY=1: tracing slows
+    every later request of the serving process, so clients must not reach it.
+    """
+    return os.environ.get("DEBUG_MEMORY") == "1"
+
+
+def debug_memory_report(model, tokenizer=None, trace: bool = False, top: int = 10, stop: bool = False) -> dict:
+    """
+    Model report plus, when `trace` is set, a tracemalloc snapshot. The snapshot
+    is taken before walking the model (and tracing is started only after it),
+    so the walk itself neither appears in nor is slowed down by tracing.
+    """
+    snapshot = tracemalloc_report(top, start=False, stop=stop) if trace and tracemalloc.is_tracing() else None
+    report = model_memory_report(model, tokenizer)
+    if trace:
+        report["tracemalloc"] = snapshot if snapshot is not None else tracemalloc_report(top)
+    return report
+
+
+def print_report(report: dict) -> None:
+    print(f"Model: {report['model_class']}")
+    print(f"{'structure':<26} {'bytes':>14} {'entries':>10}")
+    print("-" * 52)
+    for name, s in report["structures"].items():
+        suffix = "  (mmap)" if s.get("mapped") else ""
+        print(f"{name:<26} {s['bytes']:>14,} {s['entries']:>10,}{suffix}")
+    print("-" * 52)
+    print(f"{'total (deduplicated)':<26} {report['total_bytes']:>14,}")
+    if report["mapped_bytes"]:
+        print(f"{'memory-mapped':<26} {report['mapped_bytes']:>14,}")
+    for order, avg in report["avg_bytes_per_ngram"].items():
+        if avg is not None:
+            print(f"avg bytes per {order}-gram: {avg:.1f} ({report['ngrams'][order]:,} entries)")
+
+
+def main(argv=None):
+    base = os.path.dirname(os.path.abspath(__file__))
+    parser = argparse.ArgumentParser(description="Report model memory usage")
+    parser.add_argument("--model", default=os.path.join(base, "trigram_model.pkl"))
+    parser.add_argument("--shared", action="store_true", help="Load the memory-mapped serving copy")
+    parser.add_argument("--tracemalloc", action="store_true", help="Trace allocations made while loading")
+    parser.add_argument("--top", type=int, default=10, help="Allocation sites to show with --tracemalloc")
+    parser.add_argument("--json", action="store_true", help="Print the report as JSON")
+    args = parser.parse_args(argv)
+
+    sys.path.insert(0, base)
+    from trigram_model import StoryGeneratorAPI
+
+    if args.tracemalloc:
+        tracemalloc.start()
+    api = StoryGeneratorAPI(model_path=args.model, shared=args.shared)
+    report = model_memory_report(api.model, api.bpe_tokenizer)
+    if args.tracemalloc:
+        report["tracemalloc"] = tracemalloc_report(args.top, stop=True)
+
+    if args.json:
+        print(json.dumps(report, indent=2))
+        return
+    print_report(report)
+    if args.tracemalloc:
+        t = report["tracemalloc"]
+        print(f"\ntracemalloc: current {t['current_bytes']:,} bytes, peak {t['peak_bytes']:,} bytes")
+        for site in t["top"]:
+            print(f"  {site['bytes']:>12,}  {site['count']:>8,}  {site['location']}")
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
@@ -0,0 +1,252 @@
+"""
+N-gram Language Model of any order on sorted packed-context arrays.
+
+For every order k the model keeps the observed k-grams in CSR form: a sorted
+array of packed (k-1)-token context keys, row pointers into flat next-token
+and count arrays, and the total count of each context. Looking up a context is
+one binary search, and each added order costs a few bytes per distinct k-gram
+instead of a tuple-keyed dict entry.
+
+Two ways to turn counts into next-token weights:
+    backoff      - stupid backoff: sample from the longest context that was
+                   observed, and stop there (cost does not grow with order)
+    interpolate  - weighted sum of the maximum-likelihood estimates of every
+                   order, as TrigramLanguageModel does for order 3
+
+Usage:
+    # Memory and per-token sampling time for orders 2 to 5 on the corpus store
+    python models/ngram_model.py --orders 2 3 4 5
+
+    from ngram_model import NGramLanguageModel
+    model = NGramLanguageModel(order=4)
+    model.train_from_store(CorpusStore.open())
+    story = UrduStoryGenerator(model).generate("ایک دن")
+"""
+
+import os
+import sys
+import time
+import random
+import argparse
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from trigram_model import BPETokenizer, UrduStoryGenerator, START_TOKEN, WeightedSampler
+
+SMOOTHING_MODES = ("backoff", "interpolate")
+
+
+def default_lambdas(order: int) -> Tuple[float, ...]:
+    """Interpolation weights for orders 1..order; order 3 matches TrigramLanguageModel."""
+    if order == 3:
+        return (0.1, 0.3, 0.6)
+    weights = [2.0 ** k for k in range(order)]
+    total = sum(weights)
+    return tuple(w / total for w in weights)
+
+
+class NGramLanguageModel(WeightedSampler):
+    """N-gram Language Model with stupid backoff or interpolation."""
+
+    def __init__(self, order: int = 3, smoothing: str = "backoff", alpha: float = 0.4,
+                 lambdas: Sequence[float] = None):
+        if order < 1:
+            raise ValueError("order must be at least 1")
+        if smoothing not in SMOOTHING_MODES:
+            raise ValueError(f"smoothing must be one of {SMOOTHING_MODES}")
+        lambdas = tuple(lambdas) if lambdas is not None else default_lambdas(order)
+        assert len(lambdas) == order and abs(sum(lambdas) - 1.0) < 1e-6
+        self.order = order
+        self.smoothing = smoothing
+        self.alpha = alpha
+        self.lambdas = lambdas
+        # Codes: 0 is <START>, vocabulary token i is code i + 1
+        self.vocab: List[str] = []
+        self.token_to_id: Dict[str, int] = {}
+        self.base = 1
+        self.unigram = np.zeros(0, dtype=np.int64)
+        self.total_unigrams = 0
+        # Per order k >= 2: {"keys", "indptr", "next", "count", "total"}
+        self.tables: Dict[int, Dict[str, np.ndarray]] = {}
+        self.vocabulary = set()
+        self.is_trained = False
+        self.tokenizer = None
+
+    @property
+    def nbytes(self) -> int:
+        return int(self.unigram.nbytes + sum(a.nbytes for t in self.tables.values() for a in t.values()))
+
+    # ── Training ──────────────────────────────────────
+    def _fit(self, vocab: List[str], docs: List[np.ndarray]) -> None:
+        """Count every order from documents given as arrays of codes."""
+        self.vocab = list(vocab)
+        self.token_to_id = {t: i for i, t in enumerate(self.vocab)}
+        self.base = len(self.vocab) + 1
+        if self.base ** self.order >= 2 ** 63:
+            raise ValueError(f"order {self.order} with {len(self.vocab)} tokens does not fit 64-bit keys")
+
+        pad = self.order - 1
+        lengths = np.array([len(d) for d in docs], dtype=np.int64)
+        ids = np.concatenate(docs).astype(np.int64) if docs else np.zeros(0, dtype=np.int64)
+        starts = np.concatenate([[0], np.cumsum(lengths)[:-1]]).astype(np.int64)
+        # Prefix every document with order - 1 <START> codes
+        padded = np.insert(ids, np.repeat(starts, pad), 0)
+        doc_of = np.repeat(np.arange(len(docs)), lengths + pad)
+
+        self.unigram = np.bincount(ids - 1, minlength=len(self.vocab)).astype(np.int64)
+        self.total_unigrams = int(ids.size)
+        self.vocabulary = {self.vocab[i] for i in np.nonzero(self.unigram)[0]}
+
+        self.tables = {}
+        for k in range(2, self.order + 1):
+            n = len(padded) - k + 1
+            if n <= 0:
+                break
+            same = doc_of[:n] == doc_of[k - 1:]
+            keys = np.zeros(int(same.sum()), dtype=np.int64)
+            for j in range(k):
+                keys = keys * self.base + padded[j:j + n][same]
+            keys, counts = np.unique(keys, return_counts=True)
+            contexts, row_starts = np.unique(keys // self.base, return_index=True)
+            self.tables[k] = {
+                "keys": contexts,
+                "indptr": np.append(row_starts, len(keys)).astype(np.int64),
+                "next": (keys % self.base).astype(np.int32),
+                "count": counts.astype(np.int32),
+                "total": np.add.reduceat(counts, row_starts).astype(np.int64) if len(keys) else counts,
+            }
+        self.is_trained = True
+
+    def train(self, corpus: List[str], bpe_tokenizer: BPETokenizer = None):
+        """Train on document strings using BPE tokenization."""
+        self.tokenizer = bpe_tokenizer if bpe_tokenizer else BPETokenizer()
+        tokenized = [self.tokenizer.tokenize(document) for document in corpus]
+        vocab = sorted({t for tokens in tokenized for t in tokens})
+        codes = {t: i + 1 for i, t in enumerate(vocab)}
+        self._fit(vocab, [np.array([codes[t] for t in tokens], dtype=np.int64) for tokens in tokenized])
+
+    def train_from_store(self, store, bpe_tokenizer: BPETokenizer = None):
+        """Train from a pre-tokenized corpus store (Tokenization/corpus_store.py)."""
+        self.tokenizer = bpe_tokenizer if bpe_tokenizer else BPETokenizer()
+        ids = np.asarray(store.tokens, dtype=np.int64) + 1
+        offsets = np.asarray(store.offsets, dtype=np.int64)
+        self._fit(store.vocab, [ids[offsets[i]:offsets[i + 1]] for i in range(len(offsets) - 1)])
+
+    # ── Lookup ────────────────────────────────────────
+    def _codes(self, context: Sequence[str]) -> List[Optional[int]]:
+        return [0 if t == START_TOKEN else (self.token_to_id[t] + 1 if t in self.token_to_id else None)
+                for t in context]
+
+    def _row(self, codes: List[Optional[int]], k: int) -> Optional[Tuple[int, int, int]]:
+        """(lo, hi, total) of the order-k row for the last k-1 context codes, if observed."""
+        table = self.tables.get(k)
+        ctx = codes[len(codes) - (k - 1):]
+        if table is None or len(ctx) < k - 1 or None in ctx:
+            return None
+        key = 0
+        for code in ctx:
+            key = key * self.base + code
+        row = int(np.searchsorted(table["keys"], key))
+        if row < len(table["keys"]) and table["keys"][row] == key:
+            return int(table["indptr"][row]), int(table["indptr"][row + 1]), int(table["total"][row])
+        return None
+
+    def _row_weights(self, k: int, lo: int, hi: int, total: int, weights: np.ndarray, scale: float) -> None:
+        """Add scale * count / total of the row's next tokens into dense `weights` (indexed by code)."""
+        table = self.tables[k]
+        weights[table["next"][lo:hi]] += scale * table["count"][lo:hi] / total
+
+    def next_token_weights(self, context: Sequence[str]) -> np.ndarray:
+        """
+        Weight of every vocabulary token after `context` (the last order - 1
+        tokens are used). Interpolation gives probabilities; backoff gives the
+        distribution of the longest observed context only.
+        """
+        codes = self._codes(context)
+        weights = np.zeros(self.base, dtype=np.float64)
+        total = self.total_unigrams or 1
+
+        if self.smoothing == "interpolate":
+            weights[1:] = self.lambdas[0] * self.unigram / total
+            for k in range(2, self.order + 1):
+                row = self._row(codes, k)
+                if row is not None:
+                    self._row_weights(k, *row, weights, self.lambdas[k - 1])
+            return weights[1:]
+
+        for k in range(self.order, 1, -1):
+            row = self._row(codes, k)
+            if row is not None:
+                self._row_weights(k, *row, weights, 1.0)
+                # A row whose only continuation is <START> has nothing to sample
+                if weights[1:].any():
+                    return weights[1:]
+                weights[:] = 0.0
+        return self.unigram / total
+
+    def get_probability(self, context: Sequence[str], token: str) -> float:
+        """
+        Interpolated probability, or with backoff the stupid-backoff score: the
+        relative frequency under the longest context in which `token` was seen,
+        times alpha for every order backed off (a score, not normalized).
+        """
+        tid = self.token_to_id.get(token)
+        if tid is None:
+            return 0.0
+        if self.smoothing == "interpolate":
+            return float(self.next_token_weights(context)[tid])
+
+        codes = self._codes(context)
+        scale = 1.0
+        for k in range(self.order, 1, -1):
+            row = self._row(codes, k)
+            if row is not None:
+                lo, hi, total = row
+                table = self.tables[k]
+                pos = lo + int(np.searchsorted(table["next"][lo:hi], tid + 1))
+                if pos < hi and table["next"][pos] == tid + 1:
+                    return scale * int(table["count"][pos]) / total
+            scale *= self.alpha
+        return scale * int(self.unigram[tid]) / (self.total_unigrams or 1)
+
+    get_interpolated_probability = get_probability
+
+
+def main(argv=None):
+    base_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    parser = argparse.ArgumentParser(description="Compare memory and sampling speed across n-gram orders")
+    parser.add_argument("--store", default=os.path.join(base_dir, "Tokenization", "corpus"),
+                        help="Corpus store directory")
+    parser.add_argument("--orders", type=int, nargs="+", default=[2, 3, 4, 5])
+    parser.add_argument("--smoothing", choices=SMOOTHING_MODES, default="backoff")
+    parser.add_argument("--tokens", type=int, default=2000, help="Tokens to sample per order")
+    parser.add_argument("--prefix", default="ایک دن", help="Prefix of the sample story")
+    args = parser.parse_args(argv)
+
+    sys.path.insert(0, os.path.join(base_dir, "Tokenization"))
+    from corpus_store import CorpusStore, build_store
+
+    store = CorpusStore.open(args.store) if os.path.exists(args.store) else build_store(store_dir=args.store)
+    print(f"{'order':>5} {'n-grams':>10} {'bytes':>12} {'train s':>8} {'us/token':>9}")
+    for order in args.orders:
+        model = NGramLanguageModel(order=order, smoothing=args.smoothing)
+        start = time.perf_counter()
+        model.train_from_store(store)
+        train_seconds = time.perf_counter() - start
+
+        generator = UrduStoryGenerator(model)
+        random.seed(0)
+        start = time.perf_counter()
+        sampled = 0
+        while sampled < args.tokens:
+            sampled += sum(1 for _ in generator.sample_tokens([], min(500, args.tokens - sampled)))
+        per_token = (time.perf_counter() - start) / sampled * 1e6
+
+        ngrams = len(model.vocabulary) + sum(len(t["next"]) for t in model.tables.values())
+        print(f"{order:>5} {ngrams:>10,} {model.nbytes:>12,} {train_seconds:>8.2f} {per_token:>9.1f}")
+    print("\nSample:", generator.generate(args.prefix, max_length=150))
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
@@ -0,0 +1,377 @@
+"""
+Bounded-memory streaming training for the Trigram Language Model.
+
+TrigramLanguageModel keeps an exact Counter entry for every bigram and trigram,
+so its memory grows with the corpus. SketchTrigramModel instead reads documents
+one at a time and keeps bigram, trigram and trigram-context counts in
+count-min sketches whose total size is fixed up front by `memory_mb`. Only the
+unigram counts and bigram context totals (one integer per vocabulary token) are
+exact. Estimates never undercount, and are further capped by the exact
+lower-order counts, so unseen tokens keep zero probability.
+
+Usage:
+    # Train on the corpus store with a 16 MB cap and compare perplexity with exact training
+    python models/sketch_model.py --memory-mb 16
+
+    from sketch_model import SketchTrigramModel, iter_documents
+    model = SketchTrigramModel(memory_mb=16)
+    model.train(iter_documents("PreProcessing/Preprocessed_documents"))
+    generator = UrduStoryGenerator(model)
+"""
+
+import os
+import sys
+import math
+import time
+import argparse
+from types import SimpleNamespace
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+import numpy as np
+
+from trigram_model import (
+    BPETokenizer, TrigramLanguageModel, UrduStoryGenerator, START_TOKEN, WeightedSampler,
+)
+
+SKETCH_DEPTH = 4
+# Token codes are packed into 64-bit keys; code 0 is <START>, vocabulary token i is code i + 1
+CODE_BITS = 20
+MAX_CODES = 1 << CODE_BITS
+# Share of the memory cap given to each sketch
+SKETCH_SHARES = {"trigrams": 0.6, "bigrams": 0.25, "contexts": 0.15}
+
+
+def _mix(keys: np.ndarray) -> np.ndarray:
+    """splitmix64 finalizer, so structured packed keys spread over the whole hash range."""
+    x = keys.astype(np.uint64)
+    x ^= x >> np.uint64(30)
+    x *= np.uint64(0xBF58476D1CE4E5B9)
+    x ^= x >> np.uint64(27)
+    x *= np.uint64(0x94D049BB133111EB)
+    x ^= x >> np.uint64(31)
+    return x
+
+
+# ============================================
+# COUNT-MIN SKETCH
+# ============================================
+
+class CountMinSketch:
+    """
+    Count-min sketch over uint64 keys with conservative update.
+    `width` is rounded down to a power of two; each row uses multiply-shift hashing.
+    """
+
+    def __init__(self, width: int, depth: int = SKETCH_DEPTH, seed: int = 0):
+        bits = max(1, int(width).bit_length() - 1)
+        self.width = 1 << bits
+        self.depth = depth
+        self.shift = np.uint64(64 - bits)
+        rng = np.random.default_rng(seed)
+        self.multipliers = rng.integers(1, 2 ** 63, size=depth, dtype=np.uint64) * np.uint64(2) + np.uint64(1)
+        self.table = np.zeros((depth, self.width), dtype=np.uint32)
+
+    @classmethod
+    def for_bytes(cls, nbytes: float, depth: int = SKETCH_DEPTH, seed: int = 0) -> "CountMinSketch":
+        return cls(max(2, int(nbytes) // (depth * 4)), depth, seed)
+
+    @property
+    def nbytes(self) -> int:
+        return int(self.table.nbytes)
+
+    def _cells(self, keys: np.ndarray) -> np.ndarray:
+        """Flat table index of every key in every row, shape (depth, len(keys))."""
+        mixed = _mix(keys)
+        cols = (mixed[None, :] * self.multipliers[:, None]) >> self.shift
+        rows = np.arange(self.depth, dtype=np.uint64)[:, None] * np.uint64(self.width)
+        return (rows + cols).astype(np.int64)
+
+    def add(self, keys: np.ndarray, counts: np.ndarray) -> None:
+        """
+        Add counts for distinct keys. Conservative update only raises the cells
+        a key maps to as far as its new minimum estimate, which keeps every
+        estimate an upper bound while adding less collision noise.
+        """
+        if len(keys) == 0:
+            return
+        cells = self._cells(keys)
+        flat = self.table.reshape(-1)
+        target = flat[cells].min(axis=0).astype(np.int64) + np.asarray(counts, dtype=np.int64)
+        target = np.minimum(target, np.iinfo(np.uint32).max).astype(np.uint32)
+        np.maximum.at(flat, cells.reshape(-1), np.broadcast_to(target, cells.shape).reshape(-1))
+
+    def query(self, keys: np.ndarray) -> np.ndarray:
+        if len(keys) == 0:
+            return np.zeros(0, dtype=np.int64)
+        return self.table.reshape(-1)[self._cells(keys)].min(axis=0).astype(np.int64)
+
+
+# ============================================
+# SKETCH MODEL
+# ============================================
+
+class SketchTrigramModel(WeightedSampler):
+    """
+    Trigram model with interpolation whose n-gram counts live in count-min
+    sketches under a fixed memory cap. Exposes the attributes and sampling
+    methods the generator and API use.
+    """
+
+    def __init__(self, memory_mb: float = 64, lambda1: float = 0.1, lambda2: float = 0.3,
+                 lambda3: float = 0.6, depth: int = SKETCH_DEPTH, seed: int = 0):
+        assert abs(lambda1 + lambda2 + lambda3 - 1.0) < 1e-6
+        self.lambda1 = lambda1
+        self.lambda2 = lambda2
+        self.lambda3 = lambda3
+        self.memory_mb = memory_mb
+        budget = memory_mb * (1 << 20)
+        self.sketches = {
+            name: CountMinSketch.for_bytes(budget * share, depth, seed + i)
+            for i, (name, share) in enumerate(SKETCH_SHARES.items())
+        }
+        self.vocab: List[str] = []
+        self.token_to_id: Dict[str, int] = {}
+        self.unigram = np.zeros(0, dtype=np.int64)
+        self.bigram_ctx_count = np.zeros(1, dtype=np.int64)   # indexed by code, 0 = <START>
+        self.total_unigrams = 0
+        self.vocabulary = set()
+        self.is_trained = False
+        self.tokenizer = None
+
+    @property
+    def nbytes(self) -> int:
+        exact = self.unigram.nbytes + self.bigram_ctx_count.nbytes
+        return sum(s.nbytes for s in self.sketches.values()) + exact
+
+    # ── Token codes ───────────────────────────────────
+    def _codes(self, tokens: Iterable[str]) -> np.ndarray:
+        """Codes of `tokens`, adding unseen tokens to the vocabulary."""
+        codes = []
+        for token in tokens:
+            tid = self.token_to_id.get(token)
+            if tid is None:
+                if len(self.vocab) + 1 >= MAX_CODES:
+                    raise ValueError(f"vocabulary larger than {MAX_CODES - 1} tokens")
+                tid = len(self.vocab)
+                self.token_to_id[token] = tid
+                self.vocab.append(token)
+            codes.append(tid + 1)
+        if len(self.vocab) > len(self.unigram):
+            grow = len(self.vocab) - len(self.unigram)
+            self.unigram = np.concatenate([self.unigram, np.zeros(grow, dtype=np.int64)])
+            self.bigram_ctx_count = np.concatenate([self.bigram_ctx_count, np.zeros(grow, dtype=np.int64)])
+        return np.asarray(codes, dtype=np.int64)
+
+    def _code(self, token: str) -> Optional[int]:
+        if token == START_TOKEN:
+            return 0
+        tid = self.token_to_id.get(token)
+        return None if tid is None else tid + 1
+
+    # ── Training ──────────────────────────────────────
+    def _add_batch(self, docs: List[np.ndarray]) -> None:
+        """Count the n-grams of a batch of documents (arrays of codes)."""
+        lengths = np.array([len(d) for d in docs], dtype=np.int64)
+        ids = np.concatenate(docs) if docs else np.zeros(0, dtype=np.int64)
+        starts = np.concatenate([[0], np.cumsum(lengths)[:-1]])
+        # Prefix every document with two <START> codes, exactly as TrigramLanguageModel pads
+        padded = np.insert(ids, np.repeat(starts, 2), 0)
+        doc_of = np.repeat(np.arange(len(docs)), lengths + 2)
+
+        self.unigram += np.bincount(ids - 1, minlength=len(self.unigram))[:len(self.unigram)]
+        self.total_unigrams += int(ids.size)
+
+        same = doc_of[:-1] == doc_of[1:]
+        ctx, nxt = padded[:-1][same], padded[1:][same]
+        self.bigram_ctx_count += np.bincount(ctx, minlength=len(self.bigram_ctx_count))
+        keys, counts = np.unique((ctx << CODE_BITS) | nxt, return_counts=True)
+        self.sketches["bigrams"].add(keys, counts)
+
+        same = doc_of[:-2] == doc_of[2:]
+        context = (padded[:-2][same] << CODE_BITS) | padded[1:-1][same]
+        keys, counts = np.unique((context << CODE_BITS) | padded[2:][same], return_counts=True)
+        self.sketches["trigrams"].add(keys, counts)
+        keys, counts = np.unique(context, return_counts=True)
+        self.sketches["contexts"].add(keys, counts)
+
+    def _consume(self, token_docs: Iterable[List[str]], batch_tokens: int) -> None:
+        batch, size = [], 0
+        for tokens in token_docs:
+            batch.append(self._codes(tokens))
+            size += len(tokens)
+            if size >= batch_tokens:
+                self._add_batch(batch)
+                batch, size = [], 0
+        if batch:
+            self._add_batch(batch)
+        self.vocabulary = {t for t, c in zip(self.vocab, self.unigram) if c > 0}
+        self.is_trained = True
+
+    def train(self, documents: Iterable[str], bpe_tokenizer: BPETokenizer = None,
+              batch_tokens: int = 1 << 18):
+        """
+        Train on an iterable of document strings, e.g. iter_documents(). Documents
+        are tokenized and counted in batches of about `batch_tokens` tokens, so
+        only one batch is held in memory at a time.
+        """
+        self.tokenizer = bpe_tokenizer if bpe_tokenizer else BPETokenizer()
+        self._consume((self.tokenizer.tokenize(doc) for doc in documents), batch_tokens)
+
+    def train_from_store(self, store, bpe_tokenizer: BPETokenizer = None,
+                         documents: Iterable[int] = None, batch_tokens: int = 1 << 18):
+        """Train from a corpus store, reading the memory-mapped documents one at a time."""
+        self.tokenizer = bpe_tokenizer if bpe_tokenizer else BPETokenizer()
+        documents = range(len(store)) if documents is None else documents
+        self._consume((store.document_tokens(i) for i in documents), batch_tokens)
+
+    # ── Scoring and sampling ──────────────────────────
+    def next_token_weights(self, context: Tuple[str, str]) -> np.ndarray:
+        """Interpolated weight of every vocabulary token after `context` (not normalized)."""
+        total = self.total_unigrams or 1
+        weights = self.lambda1 * self.unigram / total
+        a, b = self._code(context[0]), self._code(context[1])
+        if b is None or self.bigram_ctx_count[b] == 0:
+            return weights
+
+        candidates = np.arange(1, len(self.vocab) + 1, dtype=np.int64)
+        ctx_count = self.bigram_ctx_count[b]
+        # A bigram cannot occur more often than its last token or its context
+        bigram = np.minimum(self.sketches["bigrams"].query((b << CODE_BITS) | candidates), self.unigram)
+        bigram = np.minimum(bigram, ctx_count)
+        weights += self.lambda2 * bigram / ctx_count
+
+        if a is not None:
+            context_key = (a << CODE_BITS) | b
+            tri_count = min(int(self.sketches["contexts"].query(np.array([context_key]))[0]), ctx_count)
+            if tri_count > 0:
+                trigram = self.sketches["trigrams"].query((context_key << CODE_BITS) | candidates)
+                trigram = np.minimum(np.minimum(trigram, bigram), tri_count)
+                weights += self.lambda3 * trigram / tri_count
+        return weights
+
+    def get_interpolated_probability(self, context: Tuple[str, str], token: str) -> float:
+        """
+        Probability of `token` after `context`. Sketch estimates are upper bounds,
+        so the weights are renormalized to keep this a proper distribution.
+        """
+        tid = self.token_to_id.get(token)
+        if tid is None:
+            return 0.0
+        weights = self.next_token_weights(context)
+        total = weights.sum()
+        return float(weights[tid] / total) if total > 0 else 0.0
+
+
+# ============================================
+# EVALUATION
+# ============================================
+
+def iter_documents(data_dir: str) -> Iterator[str]:
+    """Yield the text of each .txt document in `data_dir`, reading one file at a time."""
+    for name in sorted(os.listdir(data_dir)):
+        if name.endswith(".txt"):
+            with open(os.path.join(data_dir, name), "r", encoding="utf-8") as f:
+                yield f.read()
+
+
+def perplexity(model, documents: Iterable[List[str]]) -> dict:
+    """
+    Per-token perplexity of `model` on tokenized documents. Tokens the model
+    gives zero probability (never seen in training) are skipped and counted.
+    """
+    log_sum, scored, skipped = 0.0, 0, 0
+    for tokens in documents:
+        padded = [START_TOKEN, START_TOKEN] + list(tokens)
+        for i, token in enumerate(tokens):
+            p = model.get_interpolated_probability((padded[i], padded[i + 1]), token)
+            if p <= 0:
+                skipped += 1
+                continue
+            log_sum += math.log(p)
+            scored += 1
+    return {
+        "perplexity": math.exp(-log_sum / scored) if scored else float("inf"),
+        "tokens": scored,
+        "skipped": skipped,
+    }
+
+
+def _store_subset(store, documents: List[int]):
+    """The parts of a corpus store train_from_store reads, restricted to `documents`."""
+    parts = [np.asarray(store.document(i), dtype=np.int64) for i in documents]
+    lengths = [len(p) for p in parts]
+    return SimpleNamespace(
+        vocab=store.vocab,
+        tokens=np.concatenate(parts) if parts else np.zeros(0, dtype=np.int64),
+        offsets=np.concatenate([[0], np.cumsum(lengths)]).astype(np.int64),
+    )
+
+
+def compare_with_exact(store, memory_mb: float = 64, holdout_every: int = 10,
+                       bpe_tokenizer: BPETokenizer = None) -> Tuple[dict, "SketchTrigramModel"]:
+    """
+    Train exact and sketch models on the same documents (every `holdout_every`-th
+    document held out). Returns a report of both held-out perplexities and the
+    gap, and the trained sketch model.
+    """
+    from memory_report import deep_sizeof
+
+    tokenizer = bpe_tokenizer if bpe_tokenizer else BPETokenizer()
+    heldout = [i for i in range(len(store)) if i % holdout_every == 0]
+    training = [i for i in range(len(store)) if i % holdout_every != 0]
+
+    start = time.perf_counter()
+    exact = TrigramLanguageModel()
+    exact.train_from_store(_store_subset(store, training), tokenizer)
+    exact_seconds = time.perf_counter() - start
+
+    start = time.perf_counter()
+    sketch = SketchTrigramModel(memory_mb=memory_mb)
+    sketch.train_from_store(store, tokenizer, documents=training)
+    sketch_seconds = time.perf_counter() - start
+
+    exact_bytes = sum(deep_sizeof(getattr(exact, name)) for name in (
+        "unigram_counts", "bigram_counts", "trigram_counts", "bigram_context_counts", "trigram_context_counts"))
+    exact_ppl = perplexity(exact, (store.document_tokens(i) for i in heldout))
+    sketch_ppl = perplexity(sketch, (store.document_tokens(i) for i in heldout))
+    gap = sketch_ppl["perplexity"] - exact_ppl["perplexity"]
+    return {
+        "train_documents": len(training),
+        "heldout_documents": len(heldout),
+        "heldout_tokens": exact_ppl["tokens"],
+        "exact": {"perplexity": exact_ppl["perplexity"], "bytes": exact_bytes, "seconds": exact_seconds},
+        "sketch": {"perplexity": sketch_ppl["perplexity"], "bytes": sketch.nbytes, "seconds": sketch_seconds,
+                   "memory_mb": memory_mb},
+        "perplexity_gap": gap,
+        "perplexity_gap_pct": 100.0 * gap / exact_ppl["perplexity"],
+    }, sketch
+
+
+def main(argv=None):
+    base_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    parser = argparse.ArgumentParser(description="Train a sketch-based trigram model and compare it with exact counts")
+    parser.add_argument("--store", default=os.path.join(base_dir, "Tokenization", "corpus"),
+                        help="Corpus store directory")
+    parser.add_argument("--memory-mb", type=float, default=64, help="Memory cap for the sketches")
+    parser.add_argument("--holdout-every", type=int, default=10, help="Hold out every n-th document")
+    parser.add_argument("--prefix", default="ایک دن", help="Prefix of the sample story")
+    args = parser.parse_args(argv)
+
+    sys.path.insert(0, os.path.join(base_dir, "Tokenization"))
+    from corpus_store import CorpusStore, build_store
+
+    store = CorpusStore.open(args.store) if os.path.exists(args.store) else build_store(store_dir=args.store)
+    report, sketch = compare_with_exact(store, args.memory_mb, args.holdout_every)
+
+    print(f"Trained on {report['train_documents']} documents, scored {report['heldout_tokens']} "
+          f"tokens in {report['heldout_documents']} held-out documents")
+    print(f"{'':<8} {'perplexity':>12} {'bytes':>14} {'train s':>9}")
+    for name in ("exact", "sketch"):
+        r = report[name]
+        print(f"{name:<8} {r['perplexity']:>12.3f} {r['bytes']:>14,} {r['seconds']:>9.2f}")
+    print(f"Perplexity gap: {report['perplexity_gap']:+.3f} ({report['perplexity_gap_pct']:+.2f}%)")
+    print("\nSample:", UrduStoryGenerator(sketch).generate(args.prefix, max_length=150))
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
@@ -21,7 +21,9 @@ import pickle
 import math
 import json
 from collections import defaultdict, Counter
-from typing import List, Dict, Tuple, Optional
+
+import numpy as np
+from typing import List, Dict, Tuple, Optional, Iterator, Set
 
 # Set random seed
 random.seed(42)
@@ -118,7 +120,51 @@ class BPETokenizer:
         return re.sub(r' +', ' ', ''.join(parts)).strip()
 
 
-class TrigramLanguageModel:
+def sample_from_weights(weights: np.ndarray, vocab: List[str], token_to_id: Dict[str, int],
+                        temperature: float = 1.0, suppress: Optional[Set[str]] = None,
+                        mask: Optional[np.ndarray] = None) -> str:
+    """
+    Sample a token from next-token weights over `vocab`. Temperature is applied
+    first, then `mask` multiplies the result (0 bans a token, values above 1
+    boost it, as compiled by constraints.TokenConstraints), and tokens in
+    `suppress` get zero weight. When that leaves no weight, a token the mask
+    allows is drawn uniformly; if it allows none, <EOT> ends the story, since
+    a ban is never broken.
+    """
+    positive = weights > 0
+    weights = np.where(positive, weights, 0.0) ** (1.0 / temperature)
+    if mask is not None:
+        weights = weights * mask
+    suppressed = [token_to_id[t] for t in suppress if t in token_to_id] if suppress else []
+    weights[suppressed] = 0.0
+    if not (weights > 0).any():
+        allowed = np.ones(len(vocab), dtype=bool) if mask is None else mask > 0
+        allowed[suppressed] = False
+        if not allowed.any():
+            return EOT_TOKEN
+        return vocab[int(random.choice(np.nonzero(allowed)[0]))]
+    cumulative = np.cumsum(weights)
+    idx = int(np.searchsorted(cumulative, random.random() * cumulative[-1], side="right"))
+    return vocab[min(idx, len(vocab) - 1)]
+
+
+class WeightedSampler:
+    """
+    Sampling shared by every model that provides `vocab`, `token_to_id` and
+    `next_token_weights(context)`; each model only defines the weights.
+    """
+
+    def sample_next_token(self, context: Tuple[str, ...], temperature: float = 1.0,
+                          suppress: Optional[Set[str]] = None, mask: Optional[np.ndarray] = None) -> str:
+        """Sample from next_token_weights(context); see sample_from_weights for suppress and mask."""
+        vocab = self.vocab
+        if not vocab:
+            raise ValueError("model has no vocabulary; train or load it first")
+        return sample_from_weights(self.next_token_weights(context), vocab, self.token_to_id,
+                                   temperature, suppress, mask)
+
+
+class TrigramLanguageModel(WeightedSampler):
     """Trigram Language Model using MLE with Interpolation and BPE tokenization."""
 
     def __init__(self, lambda1: float = 0.1, lambda2: float = 0.3, lambda3: float = 0.6):
@@ -135,6 +181,7 @@ class TrigramLanguageModel:
         self.vocabulary = set()
         self.is_trained = False
         self.tokenizer = None  # BPE tokenizer set during training or loading
+        self._index = None     # sorted vocabulary for vectorized sampling, built on first use
 
     def train(self, corpus: List[str], bpe_tokenizer: BPETokenizer = None):
         """Train on corpus using BPE tokenization (subword-level)."""
@@ -158,6 +205,53 @@ class TrigramLanguageModel:
                 self.trigram_context_counts[ctx] += 1
         self.is_trained = True
 
+    def train_from_store(self, store, bpe_tokenizer: BPETokenizer = None):
+        """
+        Train from a pre-tokenized corpus store (Tokenization/corpus_store.py).
+        Produces the same counts as train() on the same documents, but counts
+        n-grams with vectorized numpy operations on packed token ids.
+        """
+        self.tokenizer = bpe_tokenizer if bpe_tokenizer else BPETokenizer()
+        vocab = list(store.vocab)
+        start_id = len(vocab)
+        base = start_id + 1
+        ids = np.asarray(store.tokens, dtype=np.int64)
+        offsets = np.asarray(store.offsets, dtype=np.int64)
+        lengths = np.diff(offsets)
+
+        # Prefix every document with two <START> ids, exactly as train() pads
+        padded = np.insert(ids, np.repeat(offsets[:-1], 2), start_id)
+        doc_of = np.repeat(np.arange(len(lengths)), lengths + 2)
+
+        unigram = np.bincount(ids, minlength=start_id)
+        for tid in np.nonzero(unigram)[0]:
+            self.unigram_counts[vocab[tid]] += int(unigram[tid])
+        self.total_unigrams += int(ids.size)
+        self.vocabulary.update(vocab[tid] for tid in np.nonzero(unigram)[0])
+
+        names = vocab + [START_TOKEN]
+
+        # Bigrams: pairs that do not cross a document boundary
+        same = doc_of[:-1] == doc_of[1:]
+        keys, counts = np.unique(padded[:-1][same] * base + padded[1:][same], return_counts=True)
+        for key, count in zip(keys.tolist(), counts.tolist()):
+            ctx, nxt = names[key // base], names[key % base]
+            self.bigram_counts[ctx][nxt] += count
+            self.bigram_context_counts[ctx] += count
+
+        # Trigrams: triples within one document
+        same = doc_of[:-2] == doc_of[2:]
+        keys, counts = np.unique(
+            (padded[:-2][same] * base + padded[1:-1][same]) * base + padded[2:][same],
+            return_counts=True,
+        )
+        for key, count in zip(keys.tolist(), counts.tolist()):
+            ctx = (names[key // (base * base)], names[key // base % base])
+            nxt = names[key % base]
+            self.trigram_counts[ctx][nxt] += count
+            self.trigram_context_counts[ctx] += count
+        self.is_trained = True
+
     def get_interpolated_probability(self, context: Tuple[str, str], token: str) -> float:
         p1 = self.unigram_counts[token] / self.total_unigrams if self.total_unigrams > 0 else 0
         ctx_count = self.bigram_context_counts[context[1]]
@@ -166,17 +260,38 @@ class TrigramLanguageModel:
         p3 = self.trigram_counts[context][token] / tri_count if tri_count > 0 else 0
         return self.lambda1 * p1 + self.lambda2 * p2 + self.lambda3 * p3
 
-    def sample_next_token(self, context: Tuple[str, str], temperature: float = 1.0) -> str:
-        probs = {}
-        for token in self.vocabulary:
-            p = self.get_interpolated_probability(context, token)
-            if p > 0:
-                probs[token] = p ** (1.0 / temperature)
-        if not probs:
-            return random.choice(list(self.vocabulary))
-        total = sum(probs.values())
-        probs = {k: v / total for k, v in probs.items()}
-        return random.choices(list(probs.keys()), weights=list(probs.values()))[0]
+    def _vocab_index(self) -> Tuple[List[str], Dict[str, int], np.ndarray]:
+        """Sorted vocabulary, token ids and unigram probabilities; rebuilt after more training."""
+        key = (len(self.vocabulary), self.total_unigrams)
+        if self._index is None or self._index[0] != key:
+            vocab = sorted(self.vocabulary)
+            total = self.total_unigrams or 1
+            unigram_probs = np.array([self.unigram_counts[t] / total for t in vocab], dtype=np.float64)
+            self._index = (key, vocab, {t: i for i, t in enumerate(vocab)}, unigram_probs)
+        return self._index[1:]
+
+    @property
+    def vocab(self) -> List[str]:
+        return self._vocab_index()[0]
+
+    @property
+    def token_to_id(self) -> Dict[str, int]:
+        return self._vocab_index()[1]
+
+    def next_token_weights(self, context: Tuple[str, str]) -> np.ndarray:
+        """Interpolated probability of every token in `vocab` after `context`."""
+        vocab, token_to_id, unigram_probs = self._vocab_index()
+        weights = self.lambda1 * unigram_probs
+        ctx_count = self.bigram_context_counts.get(context[1], 0)
+        if ctx_count > 0:
+            for token, count in self.bigram_counts.get(context[1], {}).items():
+                if token in token_to_id:
+                    weights[token_to_id[token]] += self.lambda2 * (count / ctx_count)
+        tri_count = self.trigram_context_counts.get(context, 0)
+        if tri_count > 0:
+            for token, count in self.trigram_counts.get(context, {}).items():
+                weights[token_to_id[token]] += self.lambda3 * (count / tri_count)
+        return weights
 
 
 class UrduStoryGenerator:
@@ -185,24 +300,53 @@ class UrduStoryGenerator:
     def __init__(self, model: TrigramLanguageModel):
         self.model = model
 
-    def generate(self, prefix: str = "", max_length: int = 1000, temperature: float = 0.8) -> str:
+    def _prefix_tokens(self, prefix: str) -> List[str]:
         tokenizer = self.model.tokenizer
         if prefix and tokenizer:
-            tokens = tokenizer.tokenize(prefix)
+            return tokenizer.tokenize(prefix)
         elif prefix:
-            tokens = prefix.split()
-        else:
-            tokens = []
-
-        padded = [START_TOKEN, START_TOKEN] + tokens
-        for _ in range(max_length):
-            ctx = (padded[-2], padded[-1])
-            nxt = self.model.sample_next_token(ctx, temperature)
+            return prefix.split()
+        return []
+
+    def sample_tokens(self, prefix_tokens: List[str], max_length: int = 1000,
+                      temperature: float = 0.8, max_sentences: Optional[int] = None,
+                      max_paragraphs: Optional[int] = None, stop_tokens: Optional[List[str]] = None,
+                      min_length: int = 0, constraints=None) -> Iterator[str]:
+        """
+        Yield sampled tokens one at a time. Generation stops after <EOT>, after
+        max_length tokens, after any token in stop_tokens, or once max_sentences
+        <EOS> or max_paragraphs <EOP> tokens have been sampled. <EOT> is masked
+        out of the sampling distribution for the first min_length tokens.
+        `constraints` (constraints.TokenConstraints) bans and boosts tokens and
+        keeps banned words out of the story.
+        """
+        # Models of other orders (NGramLanguageModel) take order - 1 context tokens
+        n = getattr(self.model, 'order', 3) - 1
+        padded = [START_TOKEN] * n + list(prefix_tokens)
+        stops = {EOT_TOKEN}.union(stop_tokens or ())
+        no_eot = {EOT_TOKEN}
+        state = constraints.start(prefix_tokens) if constraints is not None else None
+        sentences = paragraphs = 0
+        for i in range(max_length):
+            ctx = tuple(padded[len(padded) - n:])
+            mask = state.mask(final=i == max_length - 1) if state else None
+            nxt = self.model.sample_next_token(ctx, temperature, no_eot if i < min_length else None, mask)
+            if state:
+                state.advance(nxt)
             padded.append(nxt)
-            if nxt == EOT_TOKEN:
+            yield nxt
+            if nxt == EOS_TOKEN:
+                sentences += 1
+            elif nxt == EOP_TOKEN:
+                paragraphs += 1
+            if (nxt in stops
+                    or (max_sentences and sentences >= max_sentences)
+                    or (max_paragraphs and paragraphs >= max_paragraphs)):
                 break
 
-        output_tokens = padded[2:]
+    def render(self, output_tokens: List[str]) -> str:
+        """Detokenize and clean special tokens for display."""
+        tokenizer = self.model.tokenizer
         if tokenizer:
             text = tokenizer.detokenize(output_tokens)
         else:
@@ -218,13 +362,69 @@ class UrduStoryGenerator:
             text = text.replace('\n\n\n', '\n\n')
         return text.strip()
 
+    @staticmethod
+    def token_text(token: str) -> str:
+        """Display text of a single token, used when streaming."""
+        if token == EOS_TOKEN:
+            return ' '
+        if token == EOP_TOKEN:
+            return '\n\n'
+        if token in SPECIAL_TOKENS:
+            return ''
+        if token.startswith('▁'):
+            return ' ' + token[1:]
+        return token
+
+    def generate(self, prefix: str = "", max_length: int = 1000, temperature: float = 0.8,
+                 max_sentences: Optional[int] = None, max_paragraphs: Optional[int] = None,
+                 stop_tokens: Optional[List[str]] = None, min_length: int = 0, constraints=None) -> str:
+        tokens = self._prefix_tokens(prefix)
+        generated = list(self.sample_tokens(tokens, max_length, temperature, max_sentences,
+                                            max_paragraphs, stop_tokens, min_length, constraints))
+        return self.render(tokens + generated)
+
+    def generate_stream(self, prefix: str = "", max_length: int = 1000, temperature: float = 0.8,
+                        max_sentences: Optional[int] = None, max_paragraphs: Optional[int] = None,
+                        stop_tokens: Optional[List[str]] = None, min_length: int = 0,
+                        constraints=None) -> Iterator[str]:
+        """Yield the display text of each generated token (the prefix is not repeated)."""
+        tokens = self.sample_tokens(self._prefix_tokens(prefix), max_length, temperature,
+                                    max_sentences, max_paragraphs, stop_tokens, min_length, constraints)
+        for token in tokens:
+            text = self.token_text(token)
+            if text:
+                yield text
+
+
+def save_model(model: TrigramLanguageModel, path: str):
+    """Pickle a trained model in the format StoryGeneratorAPI loads."""
+    model_data = {
+        'lambda1': model.lambda1,
+        'lambda2': model.lambda2,
+        'lambda3': model.lambda3,
+        'unigram_counts': dict(model.unigram_counts),
+        'bigram_counts': {k: dict(v) for k, v in model.bigram_counts.items()},
+        'trigram_counts': {k: dict(v) for k, v in model.trigram_counts.items()},
+        'total_unigrams': model.total_unigrams,
+        'bigram_context_counts': dict(model.bigram_context_counts),
+        'trigram_context_counts': dict(model.trigram_context_counts),
+        'vocabulary': model.vocabulary,
+    }
+    with open(path, 'wb') as f:
+        pickle.dump(model_data, f)
+
 
 class StoryGeneratorAPI:
     """API interface for FastAPI integration."""
 
-    def __init__(self, model_path: str = None):
+    def __init__(self, model_path: str = None, shared: bool = False):
         self.bpe_tokenizer = BPETokenizer()
-        if model_path and os.path.exists(model_path):
+        if model_path and os.path.exists(model_path) and shared:
+            # Count tables are memory-mapped and shared by every worker process
+            from mapped_model import load_shared_model
+            self.model = load_shared_model(model_path)
+            self.model.tokenizer = self.bpe_tokenizer
+        elif model_path and os.path.exists(model_path):
             self.model = self._load_model(model_path)
         else:
             self.model = TrigramLanguageModel()
@@ -250,13 +450,39 @@ class StoryGeneratorAPI:
         model.tokenizer = self.bpe_tokenizer
         return model
 
-    def generate(self, prefix: str = "", max_length: int = 1000, temperature: float = 0.8) -> dict:
+    def compile_constraints(self, banned_tokens: Optional[List[str]] = None,
+                            banned_words: Optional[List[str]] = None,
+                            boosts: Optional[Dict[str, float]] = None):
+        """Compile per-request bans and boosts against the model vocabulary (None if there are none)."""
+        if not (banned_tokens or banned_words or boosts):
+            return None
+        from constraints import TokenConstraints
+        return TokenConstraints(self.model.vocab, self.model.token_to_id,
+                                banned_tokens or (), banned_words or (), boosts)
+
+    def generate(self, prefix: str = "", max_length: int = 1000, temperature: float = 0.8,
+                 max_sentences: Optional[int] = None, max_paragraphs: Optional[int] = None,
+                 stop_tokens: Optional[List[str]] = None, min_length: int = 0,
+                 banned_tokens: Optional[List[str]] = None, banned_words: Optional[List[str]] = None,
+                 boosts: Optional[Dict[str, float]] = None) -> dict:
         try:
-            story = self.generator.generate(prefix, max_length, temperature)
+            constraints = self.compile_constraints(banned_tokens, banned_words, boosts)
+            story = self.generator.generate(prefix, max_length, temperature, max_sentences,
+                                            max_paragraphs, stop_tokens, min_length, constraints)
             return {"success": True, "story": story, "prefix": prefix}
         except Exception as e:
             return {"success": False, "error": str(e)}
 
+    def generate_stream(self, prefix: str = "", max_length: int = 1000, temperature: float = 0.8,
+                        max_sentences: Optional[int] = None, max_paragraphs: Optional[int] = None,
+                        stop_tokens: Optional[List[str]] = None, min_length: int = 0,
+                        banned_tokens: Optional[List[str]] = None, banned_words: Optional[List[str]] = None,
+                        boosts: Optional[Dict[str, float]] = None) -> Iterator[str]:
+        """Stream generated text piece by piece; errors propagate to the caller."""
+        constraints = self.compile_constraints(banned_tokens, banned_words, boosts)
+        return self.generator.generate_stream(prefix, max_length, temperature, max_sentences,
+                                              max_paragraphs, stop_tokens, min_length, constraints)
+
 
 if __name__ == "__main__":
     api = StoryGeneratorAPI(model_path="trigram_model.pkl")
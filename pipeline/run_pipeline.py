@@ -0,0 +1,404 @@
+"""
+End-to-end data pipeline for the Urdu Story Generator.
+
+Runs scraping, preprocessing, near-duplicate removal, BPE training, corpus
+encoding, trigram training, the memory-mapped export and the corpus overlap
+index as one DAG. Every stage is fingerprinted from its
+configuration and the content of its inputs; a stage whose fingerprint matches
+the last successful run (and whose outputs are unchanged) is reused from cache.
+Stages whose dependencies are done run in parallel.
+
+Usage:
+    # Build everything that is out of date (scraping is off unless enabled in the config)
+    python pipeline/run_pipeline.py
+
+    # Show what would run without running it
+    python pipeline/run_pipeline.py --dry-run
+
+    # Use another config, force a stage (and everything downstream of it)
+    python pipeline/run_pipeline.py --config my_config.json --force bpe
+
+    # Build only up to a stage
+    python pipeline/run_pipeline.py --target encode
+"""
+
+import os
+import sys
+import json
+import time
+import hashlib
+import argparse
+import threading
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+from dataclasses import dataclass, field
+from typing import Callable, Dict, List, Optional
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+DEFAULT_CONFIG = os.path.join(ROOT, 'pipeline', 'config.json')
+DEFAULT_STATE = os.path.join(ROOT, 'pipeline', '.cache', 'state.json')
+
+# Bump to invalidate every cached stage after changing how stages are fingerprinted
+STATE_VERSION = 1
+
+
+# ============================================
+# CONTENT FINGERPRINTS
+# ============================================
+
+class FileHasher:
+    """
+    Content hashes of files and directory trees. A file whose size and mtime
+    match the cached entry is not read again, so fingerprinting an unchanged
+    corpus costs one stat per file.
+    """
+
+    def __init__(self, cache: Optional[dict] = None):
+        self.cache = cache if cache is not None else {}
+        self.lock = threading.Lock()
+
+    def file(self, path: str) -> str:
+        st = os.stat(path)
+        key = os.path.abspath(path)
+        with self.lock:
+            cached = self.cache.get(key)
+        if cached and cached[0] == st.st_size and cached[1] == st.st_mtime_ns:
+            return cached[2]
+        h = hashlib.sha256()
+        with open(path, 'rb') as f:
+            for block in iter(lambda: f.read(1 << 20), b''):
+                h.update(block)
+        digest = h.hexdigest()
+        with self.lock:
+            self.cache[key] = [st.st_size, st.st_mtime_ns, digest]
+        return digest
+
+    def path(self, path: str) -> str:
+        """Hash of a file, or of every file below a directory (names included)."""
+        if not os.path.exists(path):
+            return 'missing'
+        if os.path.isfile(path):
+            return self.file(path)
+        h = hashlib.sha256()
+        for dirpath, dirnames, filenames in os.walk(path):
+            dirnames[:] = sorted(d for d in dirnames if not d.startswith('.'))
+            for name in sorted(filenames):
+                if name.startswith('.') or name.endswith('.lock'):
+                    continue
+                full = os.path.join(dirpath, name)
+                h.update(os.path.relpath(full, path).encode('utf-8'))
+                h.update(self.file(full).encode('ascii'))
+        return h.hexdigest()
+
+
+# ============================================
+# DAG
+# ============================================
+
+@dataclass
+class Stage:
+    name: str
+    run: Callable[[dict], None]
+    deps: List[str] = field(default_factory=list)
+    inputs: List[str] = field(default_factory=list)
+    outputs: List[str] = field(default_factory=list)
+    version: int = 1
+    enabled: bool = True
+
+
+@dataclass
+class StageResult:
+    name: str
+    status: str            # ran | cached | skipped | failed | blocked | pending
+    seconds: float = 0.0
+    error: Optional[str] = None
+
+
+class Pipeline:
+    """Runs stages in dependency order with caching and parallelism."""
+
+    def __init__(self, stages: List[Stage], state_path: str = DEFAULT_STATE, workers: int = 4):
+        self.stages = {s.name: s for s in stages}
+        for stage in stages:
+            for dep in stage.deps:
+                if dep not in self.stages:
+                    raise ValueError(f"stage '{stage.name}' depends on unknown stage '{dep}'")
+        self.order = self._topological_order()
+        self.state_path = state_path
+        self.workers = workers
+        self.state = self._load_state()
+        self.hasher = FileHasher(self.state.setdefault('files', {}))
+
+    def _topological_order(self) -> List[str]:
+        order, visiting, done = [], set(), set()
+
+        def visit(name):
+            if name in done:
+                return
+            if name in visiting:
+                raise ValueError(f"dependency cycle through '{name}'")
+            visiting.add(name)
+            for dep in self.stages[name].deps:
+                visit(dep)
+            visiting.discard(name)
+            done.add(name)
+            order.append(name)
+
+        for name in self.stages:
+            visit(name)
+        return order
+
+    def _load_state(self) -> dict:
+        try:
+            with open(self.state_path, 'r', encoding='utf-8') as f:
+                state = json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return {'version': STATE_VERSION, 'stages': {}, 'files': {}}
+        if state.get('version') != STATE_VERSION:
+            return {'version': STATE_VERSION, 'stages': {}, 'files': {}}
+        return state
+
+    def _save_state(self) -> None:
+        os.makedirs(os.path.dirname(self.state_path), exist_ok=True)
+        tmp = self.state_path + '.tmp'
+        with open(tmp, 'w', encoding='utf-8') as f:
+            json.dump(self.state, f, indent=1, sort_keys=True)
+        os.replace(tmp, self.state_path)
+
+    def downstream(self, names) -> set:
+        """The given stages plus every stage that depends on them."""
+        result = set(names)
+        for name in self.order:
+            if any(dep in result for dep in self.stages[name].deps):
+                result.add(name)
+        return result
+
+    def upstream(self, names) -> set:
+        result, stack = set(), list(names)
+        while stack:
+            name = stack.pop()
+            if name not in result:
+                result.add(name)
+                stack.extend(self.stages[name].deps)
+        return result
+
+    def fingerprint(self, stage: Stage, config: dict) -> str:
+        h = hashlib.sha256()
+        h.update(json.dumps({'stage': stage.name, 'version': stage.version,
+                             'config': config.get(stage.name, {})}, sort_keys=True).encode('utf-8'))
+        for path in stage.inputs:
+            h.update(os.path.relpath(path, ROOT).encode('utf-8'))
+            h.update(self.hasher.path(path).encode('ascii'))
+        return h.hexdigest()
+
+    def outputs_fingerprint(self, stage: Stage) -> str:
+        h = hashlib.sha256()
+        for path in stage.outputs:
+            h.update(self.hasher.path(path).encode('ascii'))
+        return h.hexdigest()
+
+    def is_cached(self, stage: Stage, fingerprint: str) -> bool:
+        record = self.state['stages'].get(stage.name)
+        return (record is not None
+                and record.get('fingerprint') == fingerprint
+                and record.get('outputs') == self.outputs_fingerprint(stage))
+
+    def _execute(self, stage: Stage, config: dict, forced: bool, dry_run: bool) -> StageResult:
+        start = time.perf_counter()
+        fingerprint = self.fingerprint(stage, config)
+        if not forced and self.is_cached(stage, fingerprint):
+            return StageResult(stage.name, 'cached', time.perf_counter() - start)
+        if dry_run:
+            return StageResult(stage.name, 'pending', time.perf_counter() - start)
+        stage.run(config.get(stage.name, {}))
+        self.state['stages'][stage.name] = {
+            'fingerprint': fingerprint,
+            'outputs': self.outputs_fingerprint(stage),
+            'finished': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        }
+        return StageResult(stage.name, 'ran', time.perf_counter() - start)
+
+    def run(self, config: dict, force=(), targets=None, dry_run: bool = False) -> Dict[str, StageResult]:
+        selected = self.upstream(targets) if targets else set(self.order)
+        forced = self.downstream(force)
+        results: Dict[str, StageResult] = {}
+        running = {}
+
+        with ThreadPoolExecutor(max_workers=self.workers) as pool:
+            while True:
+                for name in self.order:
+                    if name in results or name in running.values() or name not in selected:
+                        continue
+                    stage = self.stages[name]
+                    dep_status = [results.get(d) for d in stage.deps]
+                    if any(r is None for r in dep_status):
+                        continue
+                    if any(r.status in ('failed', 'blocked') for r in dep_status):
+                        results[name] = StageResult(name, 'blocked')
+                        continue
+                    if not stage.enabled:
+                        results[name] = StageResult(name, 'skipped')
+                        continue
+                    # In a dry run nothing downstream of a pending stage can be judged
+                    if dry_run and any(r.status == 'pending' for r in dep_status):
+                        results[name] = StageResult(name, 'pending')
+                        continue
+                    future = pool.submit(self._execute, stage, config, name in forced, dry_run)
+                    running[future] = name
+
+                if not running:
+                    break
+                finished, _ = wait(list(running), return_when=FIRST_COMPLETED)
+                for future in finished:
+                    name = running.pop(future)
+                    try:
+                        results[name] = future.result()
+                    except Exception as e:
+                        results[name] = StageResult(name, 'failed', error=f"{type(e).__name__}: {e}")
+                if not dry_run:
+                    self._save_state()
+
+        return {name: results[name] for name in self.order if name in results}
+
+
+# ============================================
+# STAGES
+# ============================================
+
+def _import_from(folder: str):
+    path = os.path.join(ROOT, folder)
+    if path not in sys.path:
+        sys.path.insert(0, path)
+
+
+def build_stages(config: dict) -> List[Stage]:
+    scraped = os.path.join(ROOT, 'Scraping', 'Documents')
+    preprocessed = os.path.join(ROOT, 'PreProcessing', 'Preprocessed_documents')
+    dedup_report = os.path.join(ROOT, 'PreProcessing', 'dedup_report.json')
+    dedup_excluded = os.path.join(ROOT, 'PreProcessing', 'dedup_excluded.json')
+    vocab = os.path.join(ROOT, 'Tokenization', 'vocab.json')
+    merges = os.path.join(ROOT, 'Tokenization', 'merges.txt')
+    encoded_words = os.path.join(ROOT, 'Tokenization', 'encoded_dataset.txt')
+    store = os.path.join(ROOT, 'Tokenization', 'corpus')
+    model = os.path.join(ROOT, 'models', 'trigram_model.pkl')
+    mapped = os.path.join(ROOT, 'models', 'trigram_model.mmap')
+    overlap = os.path.join(ROOT, 'Tokenization', 'overlap_index')
+
+    def scrape(cfg):
+        _import_from('Scraping')
+        from urdupoint import Scrape_Data
+        Scrape_Data(os.path.join(ROOT, 'Scraping'), workers=cfg.get('workers', 8),
+                    rate=cfg.get('rate'), browser_fallback=cfg.get('browser_fallback', True))
+
+    def preprocess(cfg):
+        _import_from('PreProcessing')
+        from preprocessing import process_files
+        process_files(workers=cfg.get('workers'), verbose=False)
+
+    def dedup(cfg):
+        _import_from('PreProcessing')
+        from dedup import deduplicate, DEFAULT_THRESHOLD, DEFAULT_NUM_PERM, DEFAULT_SHINGLE
+        deduplicate(preprocessed, dedup_report, threshold=cfg.get('threshold', DEFAULT_THRESHOLD),
+                    num_perm=cfg.get('num_perm', DEFAULT_NUM_PERM), shingle=cfg.get('shingle', DEFAULT_SHINGLE),
+                    workers=cfg.get('workers'), verbose=False, excluded_file=dedup_excluded)
+
+    def excluded():
+        _import_from('PreProcessing')
+        from dedup import load_excluded
+        return load_excluded(dedup_excluded)
+
+    def bpe(cfg):
+        import io
+        import contextlib
+        _import_from('Tokenization')
+        import BPE
+        with contextlib.redirect_stdout(io.StringIO()):
+            vocab_set, merge_list, word_freqs = BPE.train_bpe(cfg.get('vocab_size', 250),
+                                                              corpus=BPE.load_dataset(preprocessed, exclude=excluded()))
+        out_dir = os.path.join(ROOT, 'Tokenization')
+        BPE.save_results(vocab_set, merge_list, out_dir)
+        BPE.save_encoded_dataset(word_freqs, out_dir)
+
+    def encode(cfg):
+        _import_from('Tokenization')
+        from corpus_store import build_store
+        build_store(preprocessed, store, exclude=excluded(), workers=cfg.get('workers'), verbose=False)
+
+    def train(cfg):
+        _import_from('models')
+        _import_from('Tokenization')
+        from trigram_model import TrigramLanguageModel, save_model
+        from corpus_store import CorpusStore
+        lm = TrigramLanguageModel(cfg.get('lambda1', 0.1), cfg.get('lambda2', 0.3), cfg.get('lambda3', 0.6))
+        lm.train_from_store(CorpusStore.open(store))
+        save_model(lm, model)
+
+    def export_mmap(cfg):
+        _import_from('models')
+        from mapped_model import load_shared_model
+        load_shared_model(model, mapped)
+
+    def overlap_index(cfg):
+        _import_from('Tokenization')
+        from overlap_index import build_index, DEFAULT_WINDOW
+        build_index(store, overlap, window=cfg.get('window', DEFAULT_WINDOW), workers=cfg.get('workers'),
+                    verbose=False)
+
+    return [
+        Stage('scrape', scrape, inputs=[os.path.join(ROOT, 'Scraping', 'Stories_Urls.csv')],
+              outputs=[scraped], enabled=config.get('scrape', {}).get('enabled', False)),
+        Stage('preprocess', preprocess, deps=['scrape'], inputs=[scraped], outputs=[preprocessed]),
+        Stage('dedup', dedup, deps=['preprocess'], inputs=[preprocessed], outputs=[dedup_report, dedup_excluded]),
+        # Only the exclusion list feeds later stages; the report's timings would force a retrain
+        Stage('bpe', bpe, deps=['preprocess', 'dedup'], inputs=[preprocessed, dedup_excluded],
+              outputs=[vocab, merges, encoded_words]),
+        Stage('encode', encode, deps=['preprocess', 'dedup', 'bpe'],
+              inputs=[preprocessed, dedup_excluded, vocab, merges], outputs=[store]),
+        Stage('train', train, deps=['encode'], inputs=[store], outputs=[model]),
+        Stage('export_mmap', export_mmap, deps=['train'], inputs=[model], outputs=[mapped]),
+        Stage('overlap_index', overlap_index, deps=['encode'], inputs=[store], outputs=[overlap]),
+    ]
+
+
+def load_config(path: str) -> dict:
+    if not os.path.exists(path):
+        return {}
+    with open(path, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+def print_summary(results: Dict[str, StageResult], elapsed: float) -> None:
+    print(f"{'stage':<14} {'status':<9} {'seconds':>9}")
+    print('-' * 34)
+    for r in results.values():
+        print(f"{r.name:<14} {r.status:<9} {r.seconds:>9.2f}")
+        if r.error:
+            print(f"    {r.error}")
+    print('-' * 34)
+    print(f"{'total':<24} {elapsed:>9.2f}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Run the Urdu Story Generator data pipeline")
+    parser.add_argument('--config', default=DEFAULT_CONFIG)
+    parser.add_argument('--state', default=DEFAULT_STATE)
+    parser.add_argument('--target', action='append', help='Only build up to this stage (repeatable)')
+    parser.add_argument('--force', action='append', default=[], help='Rerun this stage and its dependents')
+    parser.add_argument('--workers', type=int, default=4, help='Stages run in parallel')
+    parser.add_argument('--dry-run', action='store_true', help='Report what would run')
+    args = parser.parse_args(argv)
+
+    start = time.perf_counter()
+    config = load_config(args.config)
+    pipeline = Pipeline(build_stages(config), args.state, args.workers)
+    for name in (args.target or []) + args.force:
+        if name not in pipeline.stages:
+            parser.error(f"unknown stage '{name}' (stages: {', '.join(pipeline.order)})")
+
+    results = pipeline.run(config, force=args.force, targets=args.target, dry_run=args.dry_run)
+    print_summary(results, time.perf_counter() - start)
+    if any(r.status in ('failed', 'blocked') for r in results.values()):
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
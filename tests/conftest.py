@@ -0,0 +1,50 @@
+"""
+Shared corpus and model builders for the model tests.
+"""
+
+import sys
+import os
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'models'))
+
+from trigram_model import BPETokenizer, TrigramLanguageModel, save_model
+
+CORPUS = [
+    "ایک دن ایک لڑکا گیا۔ <EOS> <EOP> <EOT>",
+    "وہ بہت خوش تھا۔ <EOS> اس نے کہا۔ <EOS> <EOP> <EOT>",
+    "ایک دن وہ بہت خوش تھا۔ <EOS> <EOT>",
+]
+
+
+@pytest.fixture
+def corpus():
+    return list(CORPUS)
+
+
+@pytest.fixture
+def tokenizer():
+    return BPETokenizer()
+
+
+@pytest.fixture
+def train(tokenizer):
+    """Train any model on CORPUS and return it."""
+    def _train(model):
+        model.train(CORPUS, tokenizer)
+        return model
+    return _train
+
+
+@pytest.fixture
+def trained_model(train):
+    return train(TrigramLanguageModel())
+
+
+@pytest.fixture
+def model_path(tmp_path, trained_model):
+    """Pickle of trained_model, as StoryGeneratorAPI loads it."""
+    path = str(tmp_path / "model.pkl")
+    save_model(trained_model, path)
+    return path
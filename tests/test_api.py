@@ -5,6 +5,7 @@ Run with:  pytest tests/ -v
 
 import sys
 import os
+import random
 
 # Ensure the backend and models directories are on the path
 sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'backend'))
@@ -12,6 +13,8 @@ sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'models'))
 
 from fastapi.testclient import TestClient
 from app import app
+from memory_report import model_memory_report
+from trigram_model import TrigramLanguageModel
 
 client = TestClient(app)
 
@@ -60,6 +63,32 @@ def test_generate_validation():
     assert response.status_code == 422
 
 
+# ── POST /generate (structural stop conditions) ──────
+def test_generate_stops_after_paragraphs():
+    response = client.post("/generate", json={"max_length": 5000, "max_paragraphs": 1, "min_length": 5})
+    assert response.status_code == 200
+    assert "\n\n" not in response.json()["story"]
+
+    assert client.post("/generate", json={"max_sentences": 0}).status_code == 422
+
+
+# ── Stop conditions end sampling early; min_length masks <EOT> ─
+def test_sample_tokens_stop_conditions():
+    from app import api_instance
+    generator = api_instance.generator
+    for seed in range(5):
+        random.seed(seed)
+        tokens = list(generator.sample_tokens([], 5000, 0.8, max_sentences=3))
+        assert tokens.count("<EOS>") <= 3
+        assert tokens[-1] in ("<EOS>", "<EOT>")
+
+        tokens = list(generator.sample_tokens([], 5000, 0.8, stop_tokens=["<EOP>"]))
+        assert tokens.count("<EOP>") <= 1 and tokens[-1] in ("<EOP>", "<EOT>")
+
+        tokens = list(generator.sample_tokens([], 40, 2.0, min_length=40))
+        assert len(tokens) == 40 and "<EOT>" not in tokens
+
+
 # ── GET /model-info ───────────────────────────────────
 def test_model_info():
     response = client.get("/model-info")
@@ -68,3 +97,38 @@ def test_model_info():
     assert "vocabulary_size" in data
     assert "is_trained" in data
     assert data["model_type"] is not None
+
+
+# ── GET /debug/memory ─────────────────────────────────
+def test_debug_memory_disabled_by_default(monkeypatch):
+    monkeypatch.delenv("DEBUG_MEMORY", raising=False)
+    assert client.get("/debug/memory").status_code == 404
+
+
+def test_debug_memory(monkeypatch):
+    monkeypatch.setenv("DEBUG_MEMORY", "1")
+    response = client.get("/debug/memory")
+    assert response.status_code == 200
+    data = response.json()
+    assert data["structures"]["trigram_counts"]["entries"] > 0
+    assert data["total_bytes"] > 0
+    assert "3" in data["avg_bytes_per_ngram"]
+
+
+def test_memory_report_includes_sampling_cache(trained_model):
+    assert "token_to_id" not in model_memory_report(TrigramLanguageModel())["structures"]
+    vocab = trained_model.vocab
+    structures = model_memory_report(trained_model)["structures"]
+    assert structures["vocab"]["entries"] == structures["token_to_id"]["entries"] == len(vocab)
+    assert structures["unigram_probs"]["bytes"] > 0
+
+
+# ── GET /debug/memory with tracemalloc ────────────────
+def test_debug_memory_tracemalloc(monkeypatch):
+    monkeypatch.setenv("DEBUG_MEMORY", "1")
+    client.get("/debug/memory", params={"tracemalloc": True})
+    response = client.get("/debug/memory", params={"tracemalloc": True, "top": 3, "stop": True})
+    assert response.status_code == 200
+    snapshot = response.json()["tracemalloc"]
+    assert snapshot["tracing"] is True
+    assert len(snapshot["top"]) <= 3
@@ -0,0 +1,140 @@
+"""
+Tests for the ASGI entry point used in the Docker image (backend/asgi.py).
+Run with:  pytest tests/ -v
+"""
+
+import sys
+import os
+import json
+import re
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from fastapi.testclient import TestClient
+from backend.asgi import app
+
+client = TestClient(app)
+
+
+# ── GET /generate ─────────────────────────────────────
+def test_generate_get():
+    response = client.get("/generate", params={"prefix": "ایک دن", "max_length": 20})
+    assert response.status_code == 200
+    assert response.json()["success"] is True
+
+
+# ── GET /generate with stop conditions ────────────────
+def test_generate_get_stop_conditions():
+    response = client.get("/generate", params={"max_length": 5000, "max_paragraphs": 1,
+                                               "stop_tokens": ["<EOP>", "<EOT>"]})
+    assert response.status_code == 200
+    assert "\n\n" not in response.json()["story"]
+
+
+# ── POST /generate with banned words ──────────────────
+def test_generate_post_banned_words():
+    response = client.post("/generate", json={"max_length": 300, "banned_words": ["نے", "کہا"],
+                                              "boosts": {"▁بادشاہ": 1.0}})
+    assert response.status_code == 200
+    story = response.json()["story"]
+    assert not re.search(r"(?<!\w)(نے|کہا)(?!\w)", story)
+
+
+# ── GET /stream ───────────────────────────────────────
+def test_stream_emits_json_chunks_and_done():
+    response = client.get("/stream", params={"max_length": 20})
+    assert response.status_code == 200
+    events = [e for e in response.text.split("\n\n") if e]
+    chunks = [json.loads(e[len("data: "):]) for e in events if e.startswith("data: ")]
+    assert chunks and all(isinstance(c, str) for c in chunks)
+    assert events[-1].startswith("event: done")
+
+
+# ── /ws: multiplexed streams with credit and cancel ──
+def test_ws_multiplexes_streams():
+    with client.websocket_connect("/ws") as ws:
+        ws.send_json({"type": "start", "id": "a", "max_length": 5, "credit": 100})
+        ws.send_json({"type": "start", "id": "b", "max_length": 5, "credit": 100})
+        done = set()
+        chunks = {"a": 0, "b": 0}
+        while done != {"a", "b"}:
+            message = ws.receive_json()
+            if message["type"] == "chunk":
+                chunks[message["id"]] += 1
+            elif message["type"] == "done":
+                assert message["reason"] == "finished"
+                done.add(message["id"])
+        assert 0 < chunks["a"] <= 5 and 0 < chunks["b"] <= 5
+
+
+def test_ws_flow_control_pauses_and_cancel_stops():
+    with client.websocket_connect("/ws") as ws:
+        ws.send_json({"type": "start", "id": "s", "max_length": 1000, "credit": 2})
+        assert ws.receive_json()["type"] == "chunk"
+        assert ws.receive_json()["type"] == "chunk"
+        # Out of credit: the next message must be the pong, not another chunk
+        ws.send_json({"type": "ping"})
+        assert ws.receive_json() == {"type": "pong"}
+
+        ws.send_json({"type": "credit", "id": "s", "n": 1})
+        assert ws.receive_json()["type"] == "chunk"
+        ws.send_json({"type": "cancel", "id": "s"})
+        assert ws.receive_json() == {"type": "done", "id": "s", "reason": "cancelled"}
+        ws.send_json({"type": "credit", "id": "s", "n": 5})
+        assert ws.receive_json()["type"] == "error"
+
+
+# ── Malformed options are rejected with 400 ───────────
+def test_invalid_options_return_400():
+    responses = [
+        client.post("/generate", json={"max_sentences": "abc"}),
+        client.post("/generate", json={"max_sentences": 0}),
+        client.get("/generate", params={"max_paragraphs": -1}),
+        client.get("/stream", params={"min_length": -5}),
+        client.get("/generate", params={"boosts": "foo"}),
+        client.get("/stream", params={"boosts": "foo"}),
+    ]
+    for response in responses:
+        assert response.status_code == 400
+        assert response.json()["success"] is False
+
+
+# ── Bad messages are answered with errors, other streams keep going ───────
+def test_ws_rejects_bad_messages_without_closing():
+    with client.websocket_connect("/ws") as ws:
+        ws.send_json({"type": "start", "id": "s", "max_length": 1000, "credit": 1})
+        assert ws.receive_json()["type"] == "chunk"
+        for bad in ([1], "x", {"type": "credit", "id": "s", "n": "x"}, {"type": "credit", "id": "s", "n": -5},
+                    {"type": "credit", "id": "s", "n": 1.5}, {"type": "credit", "id": "s", "n": True},
+                    {"type": "start", "id": "t", "credit": -1}, {"type": "cancel", "id": [1]}):
+            ws.send_json(bad)
+            assert ws.receive_json()["type"] == "error"
+        ws.send_json({"type": "credit", "id": "s", "n": 1})
+        message = ws.receive_json()
+        assert message["type"] == "chunk" and message["id"] == "s"
+
+
+# ── A restarted id keeps its own credit and cancel handling ───────
+def test_ws_restart_same_id_after_cancel():
+    with client.websocket_connect("/ws") as ws:
+        for _ in range(3):
+            ws.send_json({"type": "start", "id": "a", "max_length": 1000, "credit": 1})
+            assert ws.receive_json()["type"] == "chunk"
+            ws.send_json({"type": "cancel", "id": "a"})
+            assert ws.receive_json() == {"type": "done", "id": "a", "reason": "cancelled"}
+        ws.send_json({"type": "start", "id": "a", "max_length": 1000, "credit": 1})
+        assert ws.receive_json()["type"] == "chunk"
+        ws.send_json({"type": "credit", "id": "a", "n": 1})
+        assert ws.receive_json()["type"] == "chunk"
+
+
+# ── A start rejected for bad constraints leaves its id free ───────
+def test_ws_bad_boost_is_rejected_and_id_reusable():
+    with client.websocket_connect("/ws") as ws:
+        ws.send_json({"type": "start", "id": "b", "boosts": {"▁بہت": "x"}})
+        assert ws.receive_json()["type"] == "error"
+        ws.send_json({"type": "start", "id": "b", "max_length": 5, "boosts": {"▁بہت": 1000}})
+        message = ws.receive_json()
+        while message["type"] == "chunk":
+            message = ws.receive_json()
+        assert message == {"type": "done", "id": "b", "reason": "finished"}
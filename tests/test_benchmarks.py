@@ -0,0 +1,46 @@
+"""
+Tests for the benchmark result comparison.
+Run with:  pytest tests/ -v
+"""
+
+import sys
+import os
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'benchmarks'))
+
+from run_benchmarks import compare_results, meta_mismatches, metric
+
+
+def _report(**values):
+    return {"results": {name: m for name, m in values.items()}}
+
+
+# ── Slower timings are flagged ────────────────────────
+def test_compare_flags_slower_timing():
+    baseline = _report(t=metric(1.0, "s"))
+    current = _report(t=metric(1.5, "s"))
+    rows = compare_results(baseline, current, threshold=0.15)
+    assert rows[0]["regressed"] is True
+
+
+# ── Lower throughput is flagged, higher is not ───────
+def test_compare_respects_direction():
+    baseline = _report(up=metric(100.0, "tokens/s", "higher"), down=metric(100.0, "tokens/s", "higher"))
+    current = _report(up=metric(150.0, "tokens/s", "higher"), down=metric(50.0, "tokens/s", "higher"))
+    rows = {r["metric"]: r for r in compare_results(baseline, current)}
+    assert rows["up"]["regressed"] is False
+    assert rows["down"]["regressed"] is True
+
+
+# ── Metrics missing from the baseline are skipped ────
+def test_compare_skips_new_metrics():
+    rows = compare_results(_report(), _report(new=metric(1.0, "s")))
+    assert rows == []
+
+
+# ── Runs with different parameters are not comparable ─
+def test_meta_mismatches():
+    meta = {"docs": 100, "repeat": 3, "samples": 300, "requests": 20, "max_length": 100, "vocab_size": 250}
+    baseline = {"meta": dict(meta, timestamp="a"), "results": {}}
+    assert meta_mismatches(baseline, {"meta": dict(meta, timestamp="b")}) == []
+    assert meta_mismatches(baseline, {"meta": dict(meta, docs=10)}) == ["docs: 100 != 10"]
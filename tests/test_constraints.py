@@ -0,0 +1,82 @@
+"""
+Tests for banned-token, banned-word and boost constraints.
+Run with:  pytest tests/ -v
+"""
+
+import sys
+import os
+import re
+import random
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'models'))
+
+from trigram_model import UrduStoryGenerator, EOT_TOKEN, sample_from_weights
+from ngram_model import NGramLanguageModel
+from constraints import TokenConstraints
+
+
+# ── Banned words are blocked however the tokens split them ───────
+def test_banned_word_blocked_across_token_splits():
+    vocab = ["▁ب", "ری", "▁بر", "ی", "▁بری", "▁بات", "۔", "<EOS>", "<EOT>", "▁بریانی"]
+    constraints = TokenConstraints(vocab, {t: i for i, t in enumerate(vocab)}, banned_words=["بری"])
+    for prefix in (["▁ب"], ["▁بر"]):
+        state = constraints.start(prefix)
+        mask = state.mask()
+        completions = [t for t in vocab if mask[vocab.index(t)] > 0]
+        state.advance("ری" if prefix == ["▁ب"] else "ی")
+        blocked = [t for i, t in enumerate(vocab) if state.mask()[i] == 0]
+        # The word itself may be continued, but not ended
+        assert "۔" in blocked and "<EOS>" in blocked and "▁بات" in blocked
+        assert "ری" in completions and "ی" in completions
+    # A longer word starting with the banned one is fine
+    assert constraints.start(["▁بریانی"]).mask().all()
+    # Ending the story right after the word is blocked too
+    assert constraints.start().mask(final=True)[vocab.index("▁بری")] == 0
+
+
+# ── Generated stories never contain banned words or tokens ───────
+def test_generation_respects_constraints(train, trained_model):
+    for model in (trained_model, train(NGramLanguageModel(order=3))):
+        generator = UrduStoryGenerator(model)
+        constraints = TokenConstraints(model.vocab, model.token_to_id,
+                                       banned_tokens=["▁وہ"], banned_words=["خوش", "ایک دن"])
+        for seed in range(20):
+            random.seed(seed)
+            tokens = list(generator.sample_tokens([], 40, 1.5, constraints=constraints))
+            story = generator.render(tokens)
+            assert "▁وہ" not in tokens
+            assert not re.search(r"(?<!\w)(خوش|ایک دن)(?!\w)", story)
+
+
+# ── Boosts scale weights after temperature ───────
+def test_boost_and_suppress_in_sampler(trained_model):
+    model = trained_model
+    constraints = TokenConstraints(model.vocab, model.token_to_id, boosts={"▁بہت": 1000.0})
+    assert np.isfinite(constraints.factors).all()
+    random.seed(0)
+    samples = [model.sample_next_token(("<START>", "<START>"), 1.0, mask=constraints.factors) for _ in range(20)]
+    assert samples == ["▁بہت"] * 20
+
+    only_eot = np.zeros(len(model.vocab))
+    only_eot[model.token_to_id[EOT_TOKEN]] = 1.0
+    # Every token is masked or suppressed: sampling still returns a token instead of failing
+    assert model.sample_next_token(("<START>", "<START>"), 1.0, {EOT_TOKEN}, only_eot) in model.vocab
+
+
+# ── A ban covering every continuation is never broken ───────
+def test_ban_covering_every_continuation(trained_model):
+    vocab = ["▁ایک", "▁دن", "▁وہ", EOT_TOKEN]
+    token_to_id = {t: i for i, t in enumerate(vocab)}
+    weights = np.array([2.0, 1.0, 0.0, 0.0])
+    constraints = TokenConstraints(vocab, token_to_id, banned_tokens=["▁ایک", "▁دن"])
+    random.seed(0)
+    samples = {sample_from_weights(weights, vocab, token_to_id, mask=constraints.factors) for _ in range(50)}
+    assert samples <= {"▁وہ", EOT_TOKEN}
+    # Nothing allowed at all: the story ends instead of sampling a banned token
+    model = trained_model
+    banned = TokenConstraints(model.vocab, model.token_to_id, banned_tokens=model.vocab)
+    assert model.sample_next_token(("<START>", "<START>"), 1.0, mask=banned.factors) == EOT_TOKEN
+    story = list(UrduStoryGenerator(model).sample_tokens([], 40, 1.0, constraints=banned))
+    assert story == [EOT_TOKEN]
@@ -0,0 +1,79 @@
+"""
+Tests for the pre-tokenized corpus store and store-based training.
+Run with:  pytest tests/ -v
+"""
+
+import sys
+import os
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'models'))
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'Tokenization'))
+
+from trigram_model import BPETokenizer, TrigramLanguageModel
+from corpus_store import build_store
+
+DOCS = {
+    "doc1.txt": "ایک دن ایک لڑکا گیا۔ <EOS> <EOP> <EOT>",
+    "doc2.txt": "وہ بہت خوش تھا۔ <EOS> اس نے کہا۔ <EOS> <EOP> <EOT>",
+    "doc3.txt": "",
+}
+
+
+def _write_docs(folder, docs):
+    folder.mkdir(exist_ok=True)
+    for name, text in docs.items():
+        (folder / name).write_text(text, encoding="utf-8")
+
+
+# ── Store round-trips the tokenizer output ───────────
+def test_store_matches_tokenizer(tmp_path):
+    _write_docs(tmp_path / "docs", DOCS)
+    store = build_store(str(tmp_path / "docs"), str(tmp_path / "store"), workers=1, verbose=False)
+    tokenizer = BPETokenizer()
+    assert store.names == sorted(DOCS)
+    for i, name in enumerate(store.names):
+        assert store.document_tokens(i) == tokenizer.tokenize(DOCS[name])
+
+
+# ── Vectorized training gives the same counts ────────
+def test_train_from_store_matches_train(tmp_path):
+    _write_docs(tmp_path / "docs", DOCS)
+    store = build_store(str(tmp_path / "docs"), str(tmp_path / "store"), workers=1, verbose=False)
+
+    expected = TrigramLanguageModel()
+    expected.train([DOCS[n] for n in sorted(DOCS)])
+    model = TrigramLanguageModel()
+    model.train_from_store(store)
+
+    assert model.unigram_counts == expected.unigram_counts
+    assert model.total_unigrams == expected.total_unigrams
+    assert model.vocabulary == expected.vocabulary
+    assert dict(model.bigram_counts) == dict(expected.bigram_counts)
+    assert dict(model.trigram_counts) == dict(expected.trigram_counts)
+    assert model.trigram_context_counts == expected.trigram_context_counts
+
+
+# ── New documents are appended, changed ones rebuild ─
+def test_incremental_update(tmp_path):
+    docs = tmp_path / "docs"
+    _write_docs(docs, DOCS)
+    first = build_store(str(docs), str(tmp_path / "store"), workers=1, verbose=False)
+    first_ids = first.document(0).tolist()
+
+    _write_docs(docs, {"doc4.txt": "نیا دن۔ <EOS> <EOT>"})
+    second = build_store(str(docs), str(tmp_path / "store"), workers=1, verbose=False)
+    assert second.names == sorted(DOCS) + ["doc4.txt"]
+    assert second.document(0).tolist() == first_ids
+    assert second.document_tokens(3) == BPETokenizer().tokenize("نیا دن۔ <EOS> <EOT>")
+
+    _write_docs(docs, {"doc1.txt": "بدلا ہوا۔ <EOS> <EOT>"})
+    third = build_store(str(docs), str(tmp_path / "store"), workers=1, verbose=False)
+    assert third.document_tokens(0) == BPETokenizer().tokenize("بدلا ہوا۔ <EOS> <EOT>")
+    assert len(third) == 4
+
+
+# ── Images without PreProcessing's code exclude nothing ──
+def test_default_exclude_without_dedup_module(monkeypatch):
+    from BPE import DATA_FOLDER, default_exclude
+    monkeypatch.setitem(sys.modules, "dedup", None)
+    assert default_exclude(DATA_FOLDER) == []
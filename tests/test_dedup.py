@@ -0,0 +1,83 @@
+"""
+Tests for MinHash/LSH near-duplicate removal.
+Run with:  pytest tests/ -v
+"""
+
+import sys
+import os
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'PreProcessing'))
+
+import dedup
+from dedup import deduplicate, excluded_for, load_excluded, lsh_params
+
+STORY = ("ایک دن ایک لڑکا جنگل میں گیا۔ <EOS> وہاں اس نے ایک بڑا شیر دیکھا۔ <EOS> "
+         "شیر درخت کے نیچے سو رہا تھا اور لڑکا ڈر کر واپس گاؤں کی طرف بھاگا۔ <EOS> <EOP> "
+         "گاؤں پہنچ کر اس نے سب کو شیر کے بارے میں بتایا۔ <EOS> <EOP> <EOT>")
+OTHER = ("بادشاہ نے اپنے وزیر کو دربار میں بلایا اور پوچھا کہ ملک کا حال کیسا ہے۔ <EOS> "
+         "وزیر نے کہا کہ رعایا خوش ہے اور فصلیں اچھی ہوئی ہیں۔ <EOS> <EOP> <EOT>")
+
+
+def _run(tmp_path, docs, **kwargs):
+    folder = tmp_path / "docs"
+    folder.mkdir(exist_ok=True)
+    for name, text in docs.items():
+        (folder / name).write_text(text, encoding="utf-8")
+    excluded_file = str(tmp_path / "excluded.json")
+    report = deduplicate(str(folder), str(tmp_path / "report.json"), workers=1, verbose=False,
+                         excluded_file=excluded_file, **kwargs)
+    return report, excluded_file
+
+
+# ── Exact and near copies are removed ─────────────────
+def test_removes_exact_and_near_duplicates(tmp_path):
+    near = STORY.replace("<EOP> <EOT>", "وہ بہت خوش ہوا۔ <EOS> <EOP> <EOT>")
+    report, excluded_file = _run(tmp_path, {"a.txt": STORY, "b.txt": OTHER, "c.txt": STORY, "d.txt": near})
+    # The longest version of the story is kept
+    assert sorted(e["document"] for e in report["removed"]) == ["a.txt", "c.txt"]
+    assert {e["duplicate_of"] for e in report["removed"]} == {"d.txt"}
+    assert report["kept"] == 2
+    assert sorted(load_excluded(excluded_file)) == ["a.txt", "c.txt"]
+
+
+def test_distinct_documents_are_kept(tmp_path):
+    report, excluded_file = _run(tmp_path, {"a.txt": STORY, "b.txt": OTHER, "empty.txt": "", "e2.txt": ""})
+    assert report["removed"] == []
+    assert load_excluded(excluded_file) == []
+
+
+def test_threshold_controls_removal(tmp_path):
+    half = " ".join(STORY.split()[:len(STORY.split()) // 2]) + " <EOT>"
+    assert len(_run(tmp_path, {"a.txt": STORY, "b.txt": half}, threshold=0.3)[0]["removed"]) == 1
+    assert _run(tmp_path, {"a.txt": STORY, "b.txt": half}, threshold=0.9)[0]["removed"] == []
+
+
+def test_lsh_params_stay_below_threshold():
+    for threshold in (0.5, 0.8, 0.9):
+        bands, rows = lsh_params(threshold, 128)
+        assert bands * rows <= 128
+        assert (1 / bands) ** (1 / rows) <= threshold
+
+
+def test_missing_report_excludes_nothing(tmp_path):
+    assert load_excluded(str(tmp_path / "none.json")) == []
+
+
+# ── Exclusion list only changes with the outcome ──────
+def test_excluded_list_ignores_timing_and_parameters(tmp_path):
+    docs = {"a.txt": STORY, "b.txt": OTHER, "c.txt": STORY}
+    excluded_file = _run(tmp_path, docs)[1]
+    with open(excluded_file, "rb") as f:
+        first = f.read()
+    _run(tmp_path, docs, num_perm=64)
+    with open(excluded_file, "rb") as f:
+        assert f.read() == first
+    assert load_excluded(excluded_file) == ["c.txt"]
+
+
+# ── Default exclusions only apply to the preprocessed folder ──
+def test_excluded_for_default_folder_only(tmp_path, monkeypatch):
+    excluded_file = _run(tmp_path, {"a.txt": STORY, "c.txt": STORY})[1]
+    monkeypatch.setattr(dedup, "excluded_path", excluded_file)
+    assert excluded_for(dedup.output_folder) == ["c.txt"]
+    assert excluded_for(str(tmp_path / "docs")) == []
@@ -0,0 +1,55 @@
+"""
+Tests for the load-generation harness's request mix and summary.
+Run with:  pytest tests/ -v
+"""
+
+import sys
+import os
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'benchmarks'))
+
+from loadgen import RequestResult, parse_mix, summarize
+
+
+# ── Request mix is parsed into normalized weights ─────
+def test_parse_mix_normalizes_weights():
+    assert parse_mix("generate_post=3, stream=1") == {"generate_post": 0.75, "stream": 0.25}
+    # A kind without a weight counts once; empty parts are ignored
+    assert parse_mix("generate_get,,stream=3") == {"generate_get": 0.25, "stream": 0.75}
+
+
+def test_parse_mix_rejects_bad_specs():
+    with pytest.raises(ValueError):
+        parse_mix("generate_post=1,upload=2")
+    with pytest.raises(ValueError):
+        parse_mix("stream=0")
+
+
+# ── Summary counts errors and reports percentiles ─────
+def test_summarize_latencies_and_errors():
+    results = [
+        RequestResult("generate_post", 0.0, latency, True) for latency in (0.1, 0.2, 0.3, 0.4)
+    ] + [
+        RequestResult("stream", 0.0, 0.5, True, ttfc=0.05),
+        RequestResult("stream", 0.0, 1.0, False, error="HTTP 500"),
+    ]
+    report = summarize(results, elapsed=2.0)
+    overall = report["overall"]
+    assert overall["requests"] == 6 and overall["errors"] == 1
+    assert overall["error_rate"] == pytest.approx(1 / 6)
+    assert overall["throughput_rps"] == pytest.approx(2.5)
+    assert overall["latency_ms"]["p50"] == pytest.approx(300.0)
+    assert overall["latency_ms"]["p99"] == pytest.approx(500.0)
+    assert overall["ttfc_ms"]["p50"] == pytest.approx(50.0)
+    assert set(report["by_kind"]) == {"generate_post", "stream"}
+    assert "ttfc_ms" not in report["by_kind"]["generate_post"]
+    assert report["errors"] == {"HTTP 500": 1}
+
+
+def test_summarize_without_successes():
+    report = summarize([RequestResult("generate_get", 0.0, 1.0, False, error="timeout")], elapsed=0.0)
+    overall = report["overall"]
+    assert overall["error_rate"] == 1.0 and overall["throughput_rps"] == 0.0
+    assert overall["latency_ms"] == {"mean": None, "p50": None, "p95": None, "p99": None}
@@ -0,0 +1,31 @@
+"""
+Tests for the memory-mapped model used by multi-worker serving.
+Run with:  pytest tests/ -v
+"""
+
+import sys
+import os
+import random
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'models'))
+
+from trigram_model import StoryGeneratorAPI, START_TOKEN
+from mapped_model import load_shared_model
+
+
+# ── Export happens once, later loads attach ──────────
+def test_shared_model_is_reused(model_path):
+    first = load_shared_model(model_path)
+    meta = os.path.join(first.path, "meta.json")
+    mtime = os.path.getmtime(meta)
+    second = load_shared_model(model_path)
+    assert os.path.getmtime(meta) == mtime
+    random.seed(0)
+    assert second.sample_next_token((START_TOKEN, START_TOKEN), 0.8) in second.vocabulary
+
+
+# ── API generates in shared mode ──────────────────────
+def test_api_shared_mode(model_path):
+    api = StoryGeneratorAPI(model_path=model_path, shared=True)
+    result = api.generate(prefix="ایک دن", max_length=20)
+    assert result["success"] is True
@@ -0,0 +1,44 @@
+"""
+Tests that the alternative model implementations give the same next-token
+probabilities as TrigramLanguageModel when trained on the same corpus.
+Run with:  pytest tests/ -v
+"""
+
+import sys
+import os
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'models'))
+
+from conftest import CORPUS
+from mapped_model import load_shared_model
+from sketch_model import SketchTrigramModel
+from ngram_model import NGramLanguageModel
+
+
+def _mapped(train, model_path):
+    return load_shared_model(model_path)
+
+
+def _sketch(train, model_path):
+    # With room to spare, the sketches hold every count exactly
+    model = SketchTrigramModel(memory_mb=1)
+    model.train(iter(CORPUS), batch_tokens=8)
+    return model
+
+
+def _ngram(train, model_path):
+    return train(NGramLanguageModel(order=3, smoothing="interpolate"))
+
+
+@pytest.mark.parametrize("build", [_mapped, _sketch, _ngram], ids=["mapped", "sketch", "ngram"])
+def test_probabilities_match_exact(build, train, trained_model, model_path):
+    model = build(train, model_path)
+    assert model.vocabulary == trained_model.vocabulary
+    contexts = list(trained_model.trigram_counts) + [("▁نامعلوم", "▁لفظ")]
+    for ctx in contexts:
+        weights = model.next_token_weights(ctx)
+        for token in trained_model.vocabulary:
+            expected = trained_model.get_interpolated_probability(ctx, token)
+            assert abs(weights[model.token_to_id[token]] - expected) < 1e-12
@@ -0,0 +1,36 @@
+"""
+Tests for the array-based N-gram model.
+Run with:  pytest tests/ -v
+"""
+
+import sys
+import os
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'models'))
+
+from trigram_model import UrduStoryGenerator, START_TOKEN
+from ngram_model import NGramLanguageModel
+
+
+# ── Stupid backoff samples from the longest observed context ───────
+def test_backoff_uses_longest_observed_context(train, corpus):
+    model = train(NGramLanguageModel(order=4))
+    tokens = model.tokenizer.tokenize(corpus[1])
+    context = tuple(tokens[:3])
+    weights = model.next_token_weights(context)
+    assert weights[model.token_to_id[tokens[3]]] == 1.0
+    assert weights.sum() == 1.0
+    assert model.get_probability(context, tokens[3]) == 1.0
+
+    # Unseen 3-token context: score backs off one order and is scaled by alpha
+    unseen = ("▁نامعلوم",) + context[1:]
+    assert model.get_probability(unseen, tokens[3]) == model.alpha * 1.0
+    assert model.get_probability((START_TOKEN,) * 3, "▁نامعلوم") == 0.0
+
+
+# ── The generator pads and slices context to the model's order ───────
+def test_generator_with_other_orders(train):
+    for order in (1, 2, 5):
+        model = train(NGramLanguageModel(order=order))
+        story = UrduStoryGenerator(model).generate("ایک دن", max_length=30)
+        assert story.startswith("ایک دن")
@@ -0,0 +1,79 @@
+"""
+Tests for the hashed window index used for memorization checks.
+Run with:  pytest tests/ -v
+"""
+
+import sys
+import os
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'models'))
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'Tokenization'))
+
+from trigram_model import BPETokenizer
+from corpus_store import build_store
+from overlap_index import OverlapIndex, build_index, shared_index
+
+DOCS = {
+    "doc1.txt": "ایک دن ایک لڑکا جنگل میں گیا اور اس نے ایک شیر دیکھا۔ <EOS> <EOP> <EOT>",
+    "doc2.txt": "وہ بہت خوش تھا۔ <EOS> اس نے اپنی ماں سے کہا کہ وہ کل بازار جائے گا۔ <EOS> <EOP> <EOT>",
+    "doc3.txt": "بادشاہ نے اپنے وزیر کو بلایا اور پوچھا۔ <EOS> <EOP> <EOT>",
+}
+
+
+def _build(tmp_path, docs=DOCS, window=8):
+    folder = tmp_path / "docs"
+    folder.mkdir(exist_ok=True)
+    for name, text in docs.items():
+        (folder / name).write_text(text, encoding="utf-8")
+    build_store(str(folder), str(tmp_path / "store"), workers=1, verbose=False)
+    return build_index(str(tmp_path / "store"), str(tmp_path / "index"), window=window, workers=1, verbose=False)
+
+
+# ── Copied spans are found ───────────────────────────
+def test_finds_copied_span(tmp_path):
+    index = _build(tmp_path)
+    tokenizer = BPETokenizer()
+    copied = "اس نے اپنی ماں سے کہا کہ وہ کل بازار"
+    match = index.check_text("پھر " + copied + " چلا", tokenizer)
+    assert match["document"] == "doc2.txt"
+    assert match["length"] >= len(tokenizer.tokenize(copied)) - 1
+    assert copied.split()[1] in match["text"]
+    assert 0 < match["fraction"] <= 1
+
+
+def test_novel_text_has_no_overlap(tmp_path):
+    index = _build(tmp_path)
+    match = index.check_text("سورج غروب ہوا تو پرندے گھونسلوں کو لوٹے", BPETokenizer())
+    assert match["length"] == 0
+
+
+def test_story_shorter_than_window(tmp_path):
+    index = _build(tmp_path)
+    assert index.longest_overlap(["▁ایک"])["length"] == 0
+
+
+# ── Index is tied to the store it was built from ─────
+def test_open_rejects_stale_store(tmp_path):
+    _build(tmp_path)
+    assert OverlapIndex.open(str(tmp_path / "index"), str(tmp_path / "store")).window == 8
+    (tmp_path / "docs" / "doc4.txt").write_text("نئی کہانی یہاں شروع ہوتی ہے۔ <EOS> <EOT>", encoding="utf-8")
+    build_store(str(tmp_path / "docs"), str(tmp_path / "store"), workers=1, verbose=False)
+    with pytest.raises(ValueError):
+        OverlapIndex.open(str(tmp_path / "index"), str(tmp_path / "store"))
+
+
+def test_shared_index_notices_rebuilds(tmp_path):
+    _build(tmp_path)
+    index_dir, store_dir = str(tmp_path / "index"), str(tmp_path / "store")
+    first = shared_index(index_dir, store_dir)
+    assert shared_index(index_dir, store_dir) is first
+
+    (tmp_path / "docs" / "doc4.txt").write_text("نئی کہانی یہاں شروع ہوتی ہے۔ <EOS> <EOT>", encoding="utf-8")
+    build_store(str(tmp_path / "docs"), store_dir, workers=1, verbose=False)
+    with pytest.raises(ValueError):
+        shared_index(index_dir, store_dir)
+    build_index(store_dir, index_dir, workers=1, verbose=False)
+    rebuilt = shared_index(index_dir, store_dir)
+    assert rebuilt is not first and "doc4.txt" in rebuilt.names
@@ -0,0 +1,86 @@
+"""
+Tests for the pipeline orchestrator's caching and scheduling.
+Run with:  pytest tests/ -v
+"""
+
+import sys
+import os
+import threading
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'pipeline'))
+
+from run_pipeline import Pipeline, Stage
+
+
+def _toy_pipeline(tmp_path, calls, barrier=None):
+    src = tmp_path / "src.txt"
+    a_out, b_out, c_out = tmp_path / "a.txt", tmp_path / "b.txt", tmp_path / "c.txt"
+
+    def stage_fn(name, inputs, output):
+        def run(cfg):
+            calls.append(name)
+            if barrier is not None and name in ("b", "c"):
+                barrier.wait(timeout=5)
+            text = "".join(p.read_text() for p in inputs)
+            output.write_text(f"{name}:{cfg.get('suffix', '')}:{text}")
+        return run
+
+    stages = [
+        Stage("a", stage_fn("a", [src], a_out), inputs=[str(src)], outputs=[str(a_out)]),
+        Stage("b", stage_fn("b", [a_out], b_out), deps=["a"], inputs=[str(a_out)], outputs=[str(b_out)]),
+        Stage("c", stage_fn("c", [a_out], c_out), deps=["a"], inputs=[str(a_out)], outputs=[str(c_out)]),
+    ]
+    return Pipeline(stages, str(tmp_path / "state.json"), workers=2)
+
+
+# ── Unchanged inputs reuse the cache ──────────────────
+def test_noop_rebuild_is_cached(tmp_path):
+    (tmp_path / "src.txt").write_text("x")
+    calls = []
+    first = _toy_pipeline(tmp_path, calls).run({})
+    assert {r.status for r in first.values()} == {"ran"}
+
+    calls.clear()
+    second = _toy_pipeline(tmp_path, calls).run({})
+    assert calls == []
+    assert {r.status for r in second.values()} == {"cached"}
+
+
+# ── Config changes rerun only downstream stages ──────
+def test_config_change_reruns_downstream_only(tmp_path):
+    (tmp_path / "src.txt").write_text("x")
+    calls = []
+    _toy_pipeline(tmp_path, calls).run({})
+
+    calls.clear()
+    results = _toy_pipeline(tmp_path, calls).run({"b": {"suffix": "new"}})
+    assert calls == ["b"]
+    assert results["a"].status == "cached" and results["c"].status == "cached"
+
+    calls.clear()
+    (tmp_path / "src.txt").write_text("changed")
+    _toy_pipeline(tmp_path, calls).run({"b": {"suffix": "new"}})
+    assert sorted(calls) == ["a", "b", "c"]
+
+
+# ── Independent stages run in parallel ───────────────
+def test_independent_stages_run_concurrently(tmp_path):
+    (tmp_path / "src.txt").write_text("x")
+    # b and c both wait on the barrier, so this only finishes if they overlap
+    barrier = threading.Barrier(2)
+    results = _toy_pipeline(tmp_path, [], barrier).run({})
+    assert all(r.status == "ran" for r in results.values())
+
+
+# ── Failures block dependents ─────────────────────────
+def test_failure_blocks_dependents(tmp_path):
+    def boom(cfg):
+        raise RuntimeError("boom")
+
+    stages = [
+        Stage("a", boom, outputs=[str(tmp_path / "a.txt")]),
+        Stage("b", lambda cfg: None, deps=["a"]),
+    ]
+    results = Pipeline(stages, str(tmp_path / "state.json")).run({})
+    assert results["a"].status == "failed" and "boom" in results["a"].error
+    assert results["b"].status == "blocked"
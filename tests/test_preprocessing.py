@@ -0,0 +1,84 @@
+"""
+Tests for the incremental preprocessing pipeline.
+Run with:  pytest tests/ -v
+"""
+
+import sys
+import os
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'PreProcessing'))
+
+from preprocessing import preprocess_text, process_files
+
+STORY = "مصنف کا نام\nایک دن ایک لڑکا گیا۔ وہ خوش تھا!\n\nدوسرا پیراگراف ہے۔"
+
+
+def _write(path, text):
+    with open(path, "w", encoding="utf-8") as f:
+        f.write(text)
+
+
+def _run(tmp_path, **kwargs):
+    return process_files(str(tmp_path / "in"), str(tmp_path / "out"),
+                         str(tmp_path / "manifest.json"), verbose=False, **kwargs)
+
+
+# ── Special tokens are inserted ───────────────────────
+def test_preprocess_text_adds_special_tokens():
+    text = preprocess_text(STORY)
+    assert "مصنف" not in text
+    assert text.count("<EOS>") == 3
+    assert text.count("<EOP>") == 2
+    assert text.endswith("<EOT>")
+
+
+# ── Unchanged documents are skipped on re-run ─────────
+def test_process_files_is_incremental(tmp_path):
+    (tmp_path / "in").mkdir()
+    _write(tmp_path / "in" / "doc1.txt", STORY)
+    _write(tmp_path / "in" / "doc2.txt", STORY + "\n\nمزید متن۔")
+
+    first = _run(tmp_path, workers=2)
+    assert first["processed"] == 2
+    assert (tmp_path / "out" / "doc1.txt").read_text(encoding="utf-8") == preprocess_text(STORY)
+
+    second = _run(tmp_path)
+    assert second["processed"] == 0 and second["skipped"] == 2
+
+    _write(tmp_path / "in" / "doc3.txt", STORY)
+    _write(tmp_path / "in" / "doc1.txt", STORY + "\n\nنیا۔")
+    third = _run(tmp_path)
+    assert sorted(third["timings"]) == ["doc1.txt", "doc3.txt"]
+
+
+# ── Outputs of deleted inputs are removed ─────────────
+def test_process_files_removes_stale_outputs(tmp_path):
+    (tmp_path / "in").mkdir()
+    _write(tmp_path / "in" / "doc1.txt", STORY)
+    _run(tmp_path)
+    os.remove(tmp_path / "in" / "doc1.txt")
+    summary = _run(tmp_path)
+    assert summary["removed"] == ["doc1.txt"]
+    assert not (tmp_path / "out" / "doc1.txt").exists()
+
+
+def test_forced_run_removes_orphaned_outputs(tmp_path):
+    (tmp_path / "in").mkdir()
+    _write(tmp_path / "in" / "doc1.txt", STORY)
+    _write(tmp_path / "in" / "doc2.txt", STORY)
+    _run(tmp_path)
+    os.remove(tmp_path / "in" / "doc1.txt")
+    os.remove(tmp_path / "manifest.json")
+    _write(tmp_path / "out" / "orphan.txt", "<EOT>")
+    summary = _run(tmp_path, force=True)
+    assert summary["removed"] == ["doc1.txt", "orphan.txt"]
+    assert sorted(os.listdir(tmp_path / "out")) == ["doc2.txt"]
+
+
+# ── Relative paths work everywhere ────────────────────
+def test_manifest_as_bare_filename(tmp_path, monkeypatch):
+    (tmp_path / "in").mkdir()
+    _write(tmp_path / "in" / "doc1.txt", STORY)
+    monkeypatch.chdir(tmp_path)
+    assert process_files("in", "out", "m.json", verbose=False)["processed"] == 1
+    assert process_files("in", "out", "m.json", verbose=False)["skipped"] == 1
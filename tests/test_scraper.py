@@ -0,0 +1,80 @@
+"""
+Tests for the scraping fetch engine against a local stand-in HTTP server.
+Run with:  pytest tests/ -v
+"""
+
+import sys
+import os
+import threading
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'Scraping'))
+
+from urdupoint import ScrapeEngine, Extract_Story_Text
+
+PAGE = "<html><body><div class='txt_detail'>مصنف<br>کہانی نمبر {n}</div></body></html>"
+
+
+class _Handler(BaseHTTPRequestHandler):
+    hits = {}
+
+    def do_GET(self):
+        _Handler.hits[self.path] = _Handler.hits.get(self.path, 0) + 1
+        if self.path == "/flaky" and _Handler.hits[self.path] == 1:
+            self.send_response(503)
+            self.end_headers()
+            return
+        if self.path == "/missing":
+            self.send_response(404)
+            self.end_headers()
+            return
+        body = PAGE.format(n=self.path.strip("/")).encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "text/html; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def server():
+    _Handler.hits = {}
+    httpd = ThreadingHTTPServer(("127.0.0.1", 0), _Handler)
+    thread = threading.Thread(target=httpd.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{httpd.server_port}"
+    httpd.shutdown()
+
+
+def _engine(tmp_path):
+    return ScrapeEngine(str(tmp_path / "Documents"), str(tmp_path / "checkpoint.txt"),
+                        workers=4, backoff=0.01, browser_fallback=False)
+
+
+# ── Story body extraction ─────────────────────────────
+def test_extract_story_text():
+    assert Extract_Story_Text(PAGE.format(n=1)) == "مصنف\nکہانی نمبر 1"
+    assert Extract_Story_Text("<html><body>nothing</body></html>") is None
+
+
+# ── Fetch, retry, checkpoint and resume ───────────────
+def test_engine_scrapes_retries_and_resumes(server, tmp_path):
+    urls = [(i, f"{server}/{i}") for i in range(1, 6)] + [(6, f"{server}/flaky"), (7, f"{server}/missing")]
+
+    engine = _engine(tmp_path)
+    stats = engine.run(urls)
+    engine.close()
+    assert stats["fetched"] == 6 and stats["failed"] == 1 and stats["retries"] == 1
+    assert (tmp_path / "Documents" / "doc3.txt").read_text(encoding="utf-8") == "مصنف\nکہانی نمبر 3"
+    assert not list((tmp_path / "Documents").glob(".tmp-*"))
+
+    engine = _engine(tmp_path)
+    stats = engine.run(urls)
+    engine.close()
+    assert stats["skipped"] == 6 and stats["fetched"] == 0
+    assert _Handler.hits["/1"] == 1
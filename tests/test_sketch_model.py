@@ -0,0 +1,41 @@
+"""
+Tests for bounded-memory sketch training.
+Run with:  pytest tests/ -v
+"""
+
+import sys
+import os
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'models'))
+
+from trigram_model import UrduStoryGenerator
+from sketch_model import CountMinSketch, SketchTrigramModel, iter_documents, perplexity
+
+
+# ── Count-min estimates never undercount ───────
+def test_count_min_upper_bound():
+    rng = np.random.default_rng(1)
+    keys, counts = np.unique(rng.integers(0, 1 << 40, size=5000), return_counts=True)
+    sketch = CountMinSketch(width=256)
+    for half in (slice(0, len(keys), 2), slice(1, len(keys), 2)):
+        sketch.add(keys[half], counts[half])
+    assert (sketch.query(keys) >= counts).all()
+
+
+# ── A tiny sketch still scores, samples and keeps unseen tokens at zero ───────
+def test_small_sketch_scores_and_samples(tmp_path, corpus, trained_model):
+    for i, doc in enumerate(corpus):
+        (tmp_path / f"doc{i}.txt").write_text(doc, encoding="utf-8")
+    sketch = SketchTrigramModel(memory_mb=0.0005)
+    sketch.train(iter_documents(str(tmp_path)))
+    assert sketch.nbytes < 2048
+
+    docs = [trained_model.tokenizer.tokenize(d) for d in corpus]
+    assert perplexity(sketch, docs)["skipped"] == 0
+    assert perplexity(sketch, docs)["perplexity"] >= 1.0
+    assert perplexity(trained_model, docs)["tokens"] == sum(len(d) for d in docs)
+
+    story = UrduStoryGenerator(sketch).generate("ایک دن", max_length=20)
+    assert story.startswith("ایک دن")